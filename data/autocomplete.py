@@ -0,0 +1,162 @@
+"""Автодополнение названий мест и туров активного города.
+
+Индекс держится в памяти и рассчитан на подсказки при каждом нажатии:
+    - все названия склеены в одну строку через "\\0" (без отдельного
+      объекта str на название);
+    - начало каждого слова — смещение в этой строке, смещения лежат в
+      array, отсортированном по тексту от этого места до конца названия;
+    - префикс ищется bisect'ом по этому массиву, ответ — O(log n + limit).
+Так "кремл" найдёт «Московский Кремль», а 100 тысяч названий занимают
+несколько мегабайт.
+
+Основной индекс неизменяем и строится целиком (в фоне, см.
+DataManager.build_autocomplete_index). Переименования, добавления и
+удаления попадают в небольшую «дельту» поверх него; когда она
+разрастается, индекс перестраивают.
+"""
+import re
+import threading
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+
+_WORD = re.compile(r"\w+")
+
+
+def fold(text):
+    """Ключ сравнения: нижний регистр, ё = е."""
+    return text.lower().replace("ё", "е")
+
+
+def _word_starts(title):
+    return [match.start() for match in _WORD.finditer(title)]
+
+
+class PrefixIndex:
+    """Неизменяемый индекс: entries — (kind, id, title)."""
+
+    def __init__(self, entries):
+        titles = []
+        # Вид записи — номер в self._kind_names, по байту на запись
+        self._kind_names = []
+        self._kinds = bytearray()
+        self._ids = array("q")
+        for kind, ref_id, title in entries:
+            if not title:
+                continue
+            if kind not in self._kind_names:
+                self._kind_names.append(kind)
+            titles.append(title.replace("\0", " "))
+            self._kinds.append(self._kind_names.index(kind))
+            self._ids.append(ref_id)
+        self._text = "\0".join(titles) + "\0"
+        self._starts = array("I")
+        positions = array("I")
+        offset = 0
+        for title in titles:
+            self._starts.append(offset)
+            positions.extend(offset + start for start in _word_starts(title))
+            offset += len(title) + 1
+        # Ключи сортировки режем из заранее приведённого текста; если fold
+        # меняет длину строки (редкие символы), смещения не совпадут — тогда
+        # приводим каждый ключ отдельно
+        folded = fold(self._text)
+        if len(folded) == len(self._text):
+            key = lambda position: folded[position:folded.index("\0", position)]
+        else:
+            key = lambda position: fold(self._text[position:self._text.index("\0", position)])
+        self._positions = array("I", sorted(positions, key=key))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _key(self, position, length):
+        return fold(self._text[position:position + length].split("\0", 1)[0])
+
+    def _entry(self, position):
+        index = bisect_right(self._starts, position) - 1
+        start = self._starts[index]
+        title = self._text[start:self._text.index("\0", start)]
+        return self._kind_names[self._kinds[index]], self._ids[index], title
+
+    def complete(self, prefix, limit, skip=()):
+        """До limit названий (kind, id, title), где какое-то слово начинается с prefix.
+
+        Порядок — по алфавиту начиная с совпавшего слова. Записи из skip
+        (множество (kind, id)) пропускаются.
+        """
+        prefix = fold(prefix)
+        length = len(prefix)
+        found = []
+        seen = set()
+        first = bisect_left(self._positions, prefix, key=lambda position: self._key(position, length))
+        for i in range(first, len(self._positions)):
+            position = self._positions[i]
+            if self._key(position, length) != prefix:
+                break
+            kind, ref_id, title = self._entry(position)
+            if (kind, ref_id) in seen or (kind, ref_id) in skip:
+                continue
+            seen.add((kind, ref_id))
+            suffix = self._text[position:self._text.index("\0", position)]
+            found.append((fold(suffix), kind, ref_id, title))
+            if len(found) >= limit:
+                break
+        return found
+
+
+class AutocompleteIndex:
+    """PrefixIndex города и языка плюс дельта изменений после построения.
+
+    Все методы потокобезопасны: изменения приходят из потока записи, а
+    подсказки запрашивает UI-поток.
+    """
+
+    def __init__(self, city_id, lang, entries):
+        self.city_id = city_id
+        self.lang = lang
+        self._base = PrefixIndex(entries)
+        self._lock = threading.Lock()
+        # Записи основного индекса, которые изменены или удалены
+        self._hidden = set()
+        # Новые и переименованные: (kind, id) -> title, и их слова для bisect
+        self._added = {}
+        self._added_keys = []
+
+    def __len__(self):
+        return len(self._base) - len(self._hidden) + len(self._added)
+
+    @property
+    def delta_size(self):
+        return len(self._hidden) + len(self._added)
+
+    def update(self, kind, ref_id, title):
+        """Новое название записи; title=None — запись удалена (или не из этого города)."""
+        key = (kind, ref_id)
+        with self._lock:
+            self._hidden.add(key)
+            old = self._added.pop(key, None)
+            if old is not None:
+                self._added_keys = [item for item in self._added_keys if (item[1], item[2]) != key]
+            if title:
+                self._added[key] = title
+                for start in _word_starts(title):
+                    insort(self._added_keys, (fold(title[start:]), kind, ref_id))
+
+    def complete(self, prefix, limit=8):
+        """До limit подсказок (kind, id, title) для prefix."""
+        if not prefix or limit <= 0:
+            return []
+        with self._lock:
+            found = self._base.complete(prefix, limit, skip=self._hidden)
+            folded = fold(prefix)
+            seen = set()
+            for i in range(bisect_left(self._added_keys, (folded,)), len(self._added_keys)):
+                key, kind, ref_id = self._added_keys[i]
+                if not key.startswith(folded) or len(seen) >= limit:
+                    break
+                if (kind, ref_id) not in seen:
+                    seen.add((kind, ref_id))
+                    found.append((key, kind, ref_id, self._added[(kind, ref_id)]))
+        found.sort(key=lambda item: item[0])
+        return [(kind, ref_id, title) for _key, kind, ref_id, title in found[:limit]]
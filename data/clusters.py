@@ -0,0 +1,151 @@
+"""Кластеры мест для карты: сетки по уровням масштаба.
+
+Координаты переводятся в проекцию Web Mercator (как у тайлов карты), мир
+на масштабе z делится на квадраты по CELL_PX пикселей экрана. Ячейка
+масштаба z ровно покрывает четыре ячейки масштаба z + 1, поэтому сетки
+строятся снизу вверх: самая мелкая — по точкам, каждая следующая — по
+ячейкам предыдущей. В ячейке хранятся число мест, суммы координат
+(центр кластера — среднее) и XOR id мест: когда место в ячейке одно,
+XOR и есть его id, так что списки мест по ячейкам не нужны.
+
+Кластеры области экрана — просмотр ячеек этой области в сетке её
+масштаба, O(число ячеек на экране) независимо от числа мест. Перенос
+одного места меняет по ячейке на каждом уровне.
+"""
+import math
+import threading
+
+
+# Размер ячейки в пикселях экрана и наибольший масштаб, на котором места
+# ещё собираются в кластеры (крупнее — каждое место отдельным маркером)
+CELL_PX = 64
+MAX_CLUSTER_ZOOM = 16
+TILE_SIZE = 256
+# Ограничение широты в Web Mercator
+MAX_LATITUDE = 85.05112878
+
+
+def mercator(lat, lon):
+    """(x, y) в долях мира от 0 до 1; y растёт к югу, как на тайлах."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    x = (lon + 180.0) / 360.0
+    y = 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+    return x, min(max(y, 0.0), 1.0)
+
+
+def _cells_per_side(zoom):
+    return (TILE_SIZE << zoom) // CELL_PX
+
+
+class ClusterIndex:
+    """Сетки кластеров по масштабам 0..max_zoom; points — (id, lat, lon).
+
+    Методы потокобезопасны: запросы идут из потока маркеров карты, а
+    изменения — из UI-потока.
+    """
+
+    def __init__(self, points, max_zoom=MAX_CLUSTER_ZOOM):
+        self.max_zoom = max_zoom
+        self._lock = threading.Lock()
+        # id -> (lat, lon, ячейка самого мелкого уровня)
+        self._points = {}
+        # Уровень масштаба -> {(cx, cy): [число, сумма lat, сумма lon, XOR id]}
+        self._levels = [dict() for _ in range(max_zoom + 1)]
+        finest = self._levels[max_zoom]
+        for place_id, lat, lon in points:
+            cell = self._cell(lat, lon)
+            self._points[place_id] = (lat, lon, cell)
+            stats = finest.get(cell)
+            if stats is None:
+                finest[cell] = [1, lat, lon, place_id]
+            else:
+                stats[0] += 1
+                stats[1] += lat
+                stats[2] += lon
+                stats[3] ^= place_id
+        for zoom in range(max_zoom - 1, -1, -1):
+            coarse = self._levels[zoom]
+            for (cx, cy), (count, sum_lat, sum_lon, ids) in self._levels[zoom + 1].items():
+                stats = coarse.get((cx >> 1, cy >> 1))
+                if stats is None:
+                    coarse[(cx >> 1, cy >> 1)] = [count, sum_lat, sum_lon, ids]
+                else:
+                    stats[0] += count
+                    stats[1] += sum_lat
+                    stats[2] += sum_lon
+                    stats[3] ^= ids
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, lat, lon):
+        side = _cells_per_side(self.max_zoom)
+        x, y = mercator(lat, lon)
+        return min(int(x * side), side - 1), min(int(y * side), side - 1)
+
+    def update(self, place_id, lat, lon):
+        """Новые координаты места; lat или lon None — место убрано с карты."""
+        with self._lock:
+            old = self._points.pop(place_id, None)
+            if old is not None:
+                old_lat, old_lon, cell = old
+                self._change(cell, -1, -old_lat, -old_lon, place_id)
+            if lat is None or lon is None:
+                return
+            cell = self._cell(lat, lon)
+            self._points[place_id] = (lat, lon, cell)
+            self._change(cell, 1, lat, lon, place_id)
+
+    def _change(self, cell, count, lat, lon, place_id):
+        cx, cy = cell
+        for zoom in range(self.max_zoom, -1, -1):
+            level = self._levels[zoom]
+            stats = level.setdefault((cx, cy), [0, 0.0, 0.0, 0])
+            stats[0] += count
+            stats[1] += lat
+            stats[2] += lon
+            stats[3] ^= place_id
+            if stats[0] <= 0:
+                del level[(cx, cy)]
+            cx >>= 1
+            cy >>= 1
+
+    def clusters(self, min_lat, min_lon, max_lat, max_lon, zoom):
+        """Кластеры области на масштабе zoom: [(lat, lon, число, id или None)].
+
+        Для ячейки с одним местом — его точные координаты и id, для
+        остальных — центр кластера и id None. zoom больше max_zoom
+        считается равным max_zoom.
+        """
+        zoom = max(0, min(int(zoom), self.max_zoom))
+        side = _cells_per_side(zoom)
+        x0, y1 = mercator(min_lat, min_lon)
+        x1, y0 = mercator(max_lat, max_lon)
+        cx0, cx1 = int(x0 * side), min(int(x1 * side), side - 1)
+        cy0, cy1 = int(y0 * side), min(int(y1 * side), side - 1)
+        result = []
+        with self._lock:
+            level = self._levels[zoom]
+            if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > len(level):
+                # Область больше занятых ячеек (мелкий масштаб) — проще пройти их
+                cells = [
+                    (cell, stats)
+                    for cell, stats in level.items()
+                    if cx0 <= cell[0] <= cx1 and cy0 <= cell[1] <= cy1
+                ]
+            else:
+                cells = []
+                for cx in range(cx0, cx1 + 1):
+                    for cy in range(cy0, cy1 + 1):
+                        stats = level.get((cx, cy))
+                        if stats is not None:
+                            cells.append(((cx, cy), stats))
+            for _cell, (count, sum_lat, sum_lon, ids) in cells:
+                if count == 1:
+                    # Единственное место: XOR id ячейки — его id
+                    lat, lon, _cell = self._points[ids]
+                    result.append((lat, lon, 1, ids))
+                else:
+                    result.append((sum_lat / count, sum_lon / count, count, None))
+        return result
@@ -1,38 +1,368 @@
+import functools
 import json
 import os
 import sqlite3
 import hashlib
-from threading import Lock
+from threading import Lock, RLock, Thread, get_ident
+
+from data.importer import (
+    INSERT_PLACE_SQL,
+    INSERT_TOUR_POINT_SQL,
+    INSERT_TOUR_SQL,
+    BulkImporter,
+    place_params,
+    tour_params,
+)
+from data.autocomplete import AutocompleteIndex
+from data.fuzzy import (
+    KIND_PLACE,
+    KIND_TOUR,
+    fuzzy_matches,
+    rebuild_fuzzy_index,
+    refresh_places,
+    refresh_tours,
+)
+from data.json_stream import find_data_file, iter_records
+from data.listing import SORT_ORDERS, SORT_RATING, localized_column, sort_expression
+from data.migrations import apply_migrations
+from data.query_cache import QueryCache
+from data.records import Place, SearchHit, Tour, TourPoint, column_index
+from data.search import (
+    PLACE_NAME_COLUMNS,
+    PLACE_WEIGHTS,
+    TOUR_WEIGHTS,
+    match_expression,
+    place_search_columns,
+)
+from data.spatial import (
+    HALF_CIRCUMFERENCE_M,
+    NearbyWindow,
+    bbox_condition,
+    haversine_m,
+    points_near,
+    rebuild_spatial_index,
+    refresh_spatial,
+)
+from data.storage import PROFILE_DEFAULT, PROFILES, ReaderPool, configure_writer
+from data.write_queue import WriteQueue
 
 
 DB_NAME = "cityguide.db"
 PLACES_JSON = os.path.join(os.path.dirname(__file__), "places.json")
 TOURS_JSON = os.path.join(os.path.dirname(__file__), "tours.json")
 
+# Поиск туров по названиям мест их точек: сколько лучших мест учитывать
+# и во сколько раз такое совпадение слабее совпадения в названии тура
+TOUR_POINT_MATCHES = 200
+TOUR_POINT_WEIGHT = 0.5
+
+# Сколько изменённых названий держать поверх индекса автодополнения,
+# прежде чем перестроить его целиком
+AUTOCOMPLETE_MAX_DELTA = 2000
+AUTOCOMPLETE_COLUMNS = {"kind": 0, "id": 1, "title": 2}
+
+# Размер страницы get_places_page по умолчанию
+PLACES_PAGE_LIMIT = 40
+
+# Сколько мест отдаёт get_place_cards, когда запрос найден только нечётким поиском
+FUZZY_CARDS_LIMIT = 50
+
+# Сколько мест отдаёт get_places_in_bbox по умолчанию (лучшие по рейтингу)
+BBOX_PLACES_LIMIT = 500
+
+# nearest_places: мест по умолчанию, начальный радиус поиска и наименьший
+# запас окна вокруг точки на её перемещение (data/spatial.py, NearbyWindow)
+NEAREST_PLACES_K = 20
+NEARBY_START_RADIUS_M = 500
+NEARBY_MIN_MARGIN_M = 200
+
+# Первая картинка из JSON-массива image_urls; битый JSON даёт NULL, а не ошибку запроса
+FIRST_IMAGE_SQL = "CASE WHEN json_valid({0}) THEN json_extract({0}, '$[0]') END"
+
+
+def place_card_columns(lang):
+    """Только то, что показывает карточка в списке мест, без полных описаний."""
+    return f"""id, {localized_column("name", lang)}, {localized_column("short_desc", lang)},
+    category, rating, price, hours, address,
+    {FIRST_IMAGE_SQL.format("image_urls")} AS first_image"""
+
+
+def place_map_columns(lang):
+    """Поля места для маркера на карте: координаты, название, категория, рейтинг."""
+    return f"""id, {localized_column("name", lang)}, category, rating, lat, lon"""
+
+
+def place_detail_columns(lang):
+    """Все поля места для экрана просмотра, тексты уже на языке lang."""
+    return f"""id, {localized_column("name", lang)}, {localized_column("short_desc", lang)},
+    {localized_column("description", lang)},
+    category, lat, lon, address, phone, website, price, hours, rating,
+    image_urls, city_id"""
+
+
+def _serialized_write(method=None, *, queueable=True, tables=()):
+    """Выполняет изменяющий метод под блокировкой писателя одной транзакцией.
+
+    Вложенные вызовы (например, insert_place внутри download_city_data)
+    попадают в транзакцию внешнего метода: фиксация происходит один раз при
+    выходе из самого внешнего вызова, при ошибке всё откатывается.
+
+    Если включена очередь записи, queueable-методы не выполняются сразу, а
+    возвращают Future (см. data/write_queue.py). Методы, результат или
+    исключения которых нужны вызывающему коду сразу, помечаются
+    queueable=False и перед выполнением дожидаются очереди. Вызов изнутри
+    другого изменяющего метода того же потока выполняется сразу.
+
+    tables — таблицы, которые метод меняет: после фиксации их версии в
+    кэше запросов увеличиваются (см. data/query_cache.py).
+    """
+    if method is None:
+        return functools.partial(_serialized_write, queueable=queueable, tables=tables)
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        write_queue = self._write_queue
+        if write_queue is not None and not self._holds_write_lock() and not write_queue.in_writer_thread():
+            if queueable:
+                return write_queue.submit(functools.partial(wrapper, self, *args, **kwargs), tables)
+            write_queue.flush()
+        with self._write_lock:
+            self._enter_write()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception:
+                self._written_tables.update(tables)
+                self._leave_write()
+                if self._write_depth == 0:
+                    self.conn.rollback()
+                    # Сбрасываем и после отката: в профиле default чтение идёт
+                    # через то же соединение и могло закэшировать незафиксированное
+                    self._bump_written_tables()
+                raise
+            self._written_tables.update(tables)
+            self._leave_write()
+            if self._write_depth == 0:
+                self.conn.commit()
+                self._bump_written_tables()
+            return result
+
+    return wrapper
+
+
+def _cached(*tables):
+    """Кэширует результат геттера по имени метода и аргументам.
+
+    tables — таблицы, из которых читает метод; запись кэша живёт, пока
+    ни одна из них не изменилась через DataManager. Очереди записи геттер
+    дожидается, только если в ней есть изменения этих таблиц.
+    """
+
+    def decorate(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            self._wait_for_queued_writes(tables)
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = self.query_cache.get(key, tables)
+            if not found:
+                stamp = self.query_cache.stamp(tables)
+                value = method(self, *args, **kwargs)
+                self.query_cache.put(key, stamp, value)
+            return _copy_result(value)
+
+        return wrapper
+
+    return decorate
+
+
+def _copy_result(value):
+    # Записи (data/records.py) неизменяемы и отдаются как есть; списки и
+    # словари копируются, чтобы сортировка на экране не портила кэш
+    if isinstance(value, list):
+        return [dict(item) if isinstance(item, dict) else item for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, tuple):
+        return tuple(_copy_result(item) for item in value)
+    return value
+
 
 class DataManager:
     _instance = None
     _lock = Lock()
 
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, storage_profile=PROFILE_DEFAULT, write_queue=False):
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), DB_NAME)
+        if storage_profile not in PROFILES:
+            raise ValueError(f"unknown storage profile: {storage_profile}")
         self.db_path = db_path
+        self.storage_profile = storage_profile
+        # Единственное пишущее соединение; в профиле default через него же
+        # читает и UI-поток — тот, что создал DataManager
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self._create_tables()
-        self._ensure_tour_points_images_column()
-        self._ensure_city_schema()
-        self._ensure_cities_loaded()
-        self._ensure_places_loaded()
-        self._ensure_tours_loaded()
+        self._owner_thread = get_ident()
+        self._write_lock = RLock()
+        self._write_depth = 0
+        # Поток, выполняющий сейчас изменяющий метод (держит _write_lock)
+        self._write_owner = None
+        self._write_queue = None
+        self._written_tables = set()
+        self.query_cache = QueryCache()
+        # Активный город в памяти: (метка актуальности, dict или None), см. get_active_city
+        self._active_city = None
+        self._cities_generation = 0
+        # Автодополнение (data/autocomplete.py): индекс, поток построения и
+        # изменённые названия, которые применяются к индексу после фиксации
+        self._autocomplete = None
+        self._autocomplete_lang = "ru"
+        self._autocomplete_lock = Lock()
+        self._autocomplete_thread = None
+        self._autocomplete_requested = 0
+        self._names_changed = set()
+        self._names_reload = False
+        # Места вокруг последней точки nearest_places (data/spatial.py, NearbyWindow)
+        self._nearby_window = None
+        configure_writer(self.conn, storage_profile)
+        # Схема и начальные данные создаются миграциями один раз; на уже
+        # актуальной базе здесь выполняется только чтение PRAGMA user_version.
+        apply_migrations(self)
+        # Read-only соединения по потокам: в WAL-профиле для всех читателей,
+        # в default — для фоновых потоков (см. data/storage.py)
+        self._readers = ReaderPool(self.db_path)
+        # Групповая фиксация изменений фоновым потоком (по умолчанию выключена)
+        self._write_queue = WriteQueue(self._run_write_batch) if write_queue else None
 
     @classmethod
-    def get_instance(cls):
+    def get_instance(cls, storage_profile=None, write_queue=False):
+        """Возвращает общий DataManager.
+
+        storage_profile и write_queue учитываются только при первом вызове,
+        когда объект создаётся (см. data/storage.py и data/write_queue.py).
+        """
         with cls._lock:
             if cls._instance is None:
-                cls._instance = DataManager()
+                cls._instance = DataManager(
+                    storage_profile=storage_profile or PROFILE_DEFAULT,
+                    write_queue=write_queue,
+                )
         return cls._instance
 
+    def _reader(self, *tables):
+        """Соединение для чтения: своё read-only на каждый поток.
+
+        Исключения — UI-поток в профиле default и изменяющий метод, который
+        читает внутри своей транзакции: они читают через self.conn.
+
+        tables — таблицы, которые будут прочитаны: если в очереди записи есть
+        их изменения, сначала дожидаемся фиксации, чтобы чтение видело уже
+        сделанное пользователем. Геттеры с @_cached ждут в декораторе.
+        """
+        if tables:
+            self._wait_for_queued_writes(tables)
+        if self._holds_write_lock():
+            return self.conn
+        if self.storage_profile == PROFILE_DEFAULT and get_ident() == self._owner_thread:
+            return self.conn
+        return self._readers.get()
+
+    def interrupt_reads(self, thread):
+        """Прерывает запрос, который фоновый поток thread выполняет сейчас.
+
+        В потоке запрос завершится sqlite3.OperationalError; используется
+        для отмены устаревшего поиска (utils/search_controller.py).
+        """
+        self._readers.interrupt(thread)
+
+    def _wait_for_queued_writes(self, tables=None):
+        """Ждёт фиксации операций очереди, меняющих tables (None — любых).
+
+        Изнутри изменяющего метода не ждёт: поток-писатель ждал бы
+        _write_lock, который держит этот поток.
+        """
+        write_queue = self._write_queue
+        if write_queue is None or not write_queue.pending or self._holds_write_lock():
+            return
+        if tables is None or write_queue.touches(tables):
+            write_queue.flush(tables=tables)
+
+    def _holds_write_lock(self):
+        return self._write_owner == get_ident()
+
+    def _enter_write(self):
+        # Вызывается под _write_lock
+        if self._write_depth == 0:
+            self._write_owner = get_ident()
+        self._write_depth += 1
+
+    def _leave_write(self):
+        self._write_depth -= 1
+        if self._write_depth == 0:
+            self._write_owner = None
+
+    def _bump_written_tables(self):
+        """После фиксации (или отката) сбрасывает кэш по изменённым таблицам."""
+        if self._written_tables:
+            self.query_cache.bump(self._written_tables)
+            self._written_tables.clear()
+        if self._names_changed or self._names_reload:
+            self._sync_autocomplete()
+
+    def _refresh_names(self, kind, ids):
+        """Обновляет индексы названий после изменения строк ids места/тура.
+
+        Нечёткий индекс — сразу, в той же транзакции; автодополнение — после
+        фиксации (_sync_autocomplete), по тому, что в итоге оказалось в базе.
+        """
+        (refresh_places if kind == KIND_PLACE else refresh_tours)(self.conn, ids)
+        self._names_changed.update((kind, ref_id) for ref_id in ids)
+
+    def _run_write_batch(self, batch):
+        """Выполняет пачку операций очереди записи одной транзакцией.
+
+        Каждая операция изолирована SAVEPOINT: ошибка одной откатывает только
+        её и попадает в её Future, остальные фиксируются.
+        """
+        with self._write_lock:
+            self._enter_write()
+            try:
+                if not self.conn.in_transaction:
+                    self.conn.execute("BEGIN")
+                results = []
+                for work, future in batch:
+                    self.conn.execute("SAVEPOINT queued_write")
+                    try:
+                        results.append((future, work(), None))
+                        self.conn.execute("RELEASE queued_write")
+                    except Exception as exc:
+                        self.conn.execute("ROLLBACK TO queued_write")
+                        self.conn.execute("RELEASE queued_write")
+                        results.append((future, None, exc))
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
+            finally:
+                self._bump_written_tables()
+                self._leave_write()
+        for future, result, exc in results:
+            if exc is not None:
+                future.set_exception(exc)
+            else:
+                future.set_result(result)
+
+    def flush(self, timeout=None):
+        """Дожидается фиксации всех изменений из очереди записи (например, при выходе)."""
+        if self._write_queue is None:
+            return True
+        return self._write_queue.flush(timeout)
+
+    def close(self):
+        if self._write_queue is not None:
+            self._write_queue.close()
+        self._readers.close_all()
+        with self._write_lock:
+            self.conn.close()
+
     def _create_tables(self):
         cur = self.conn.cursor()
         cur.execute(
@@ -176,7 +506,9 @@ class DataManager:
             pass
         self.conn.commit()
 
+    def _ensure_admin_user(self):
         # Если таблица пользователей пуста, создаём встроенного администратора
+        cur = self.conn.cursor()
         cur.execute("SELECT COUNT(*) FROM users")
         count = cur.fetchone()[0]
         if count == 0:
@@ -206,6 +538,7 @@ class DataManager:
 
     # ===== Админ: базовое редактирование туров =====
 
+    @_serialized_write(queueable=False, tables=("tours",))
     def insert_tour_quick(self, city_id=1):
         """Создаёт простой черновик тура для админки и возвращает его id."""
         cur = self.conn.cursor()
@@ -223,9 +556,10 @@ class DataManager:
                 None,
             ),
         )
-        self.conn.commit()
+        self._refresh_names(KIND_TOUR, [cur.lastrowid])
         return cur.lastrowid
 
+    @_serialized_write(tables=("tours",))
     def update_tour_basic(
         self,
         tour_id,
@@ -255,46 +589,52 @@ class DataManager:
                 tour_id,
             ),
         )
-        self.conn.commit()
+        self._refresh_names(KIND_TOUR, [tour_id])
 
-    def download_city_data(self, city_id):
+    @_serialized_write(queueable=False)
+    def download_city_data(self, city_id, progress=None):
         """Загружает/обновляет данные для указанного города из JSON-файлов.
 
         Ожидается, что в папке data будут файлы вида:
         - places_<city_id>.json
         - tours_<city_id>.json
+        (или их вариант JSON Lines: places_<city_id>.jsonl, tours_<city_id>.jsonl)
+        и, если есть, пакет тайлов карты tiles_<city_id>.mbtiles
+        (data/tile_packs.py) — его карта читает на месте, без копирования.
         Каждый элемент в этих файлах имеет ту же структуру, что и базовые
         places.json/tours.json, city_id подставляется автоматически.
+        Файлы читаются потоково, пачками, поэтому память не растёт с размером
+        города. progress передаётся в bulk_import.
         """
         base_dir = os.path.dirname(__file__)
-        places_path = os.path.join(base_dir, f"places_{city_id}.json")
-        tours_path = os.path.join(base_dir, f"tours_{city_id}.json")
-
-        # Загрузка мест города, если есть файл
-        if os.path.exists(places_path):
-            with open(places_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for place in data:
-                place_with_city = dict(place)
-                place_with_city["city_id"] = city_id
-                self.insert_place(place_with_city)
-
-        # Загрузка туров города, если есть файл
-        if os.path.exists(tours_path):
-            with open(tours_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for tour in data:
-                tour_with_city = dict(tour)
-                tour_with_city["city_id"] = city_id
-                self.insert_tour_with_points(tour_with_city)
-
-        # Помечаем город как скачанный
+        places_path = find_data_file(base_dir, f"places_{city_id}")
+        tours_path = find_data_file(base_dir, f"tours_{city_id}")
+
+        places = iter_records(places_path) if places_path else ()
+        tours = iter_records(tours_path) if tours_path else ()
+        # Места и туры города одной транзакцией, city_id подставляется при нормализации
+        self.bulk_import(places, tours, city_id=city_id, progress=progress)
+
+        self.mark_city_downloaded(city_id)
+
+    @_serialized_write(queueable=False, tables=("cities",))
+    def mark_city_downloaded(self, city_id):
+        """Помечает город как скачанный."""
         cur = self.conn.cursor()
         cur.execute(
             "UPDATE cities SET is_downloaded = 1 WHERE id = ?",
             (city_id,),
         )
-        self.conn.commit()
+        self._invalidate_active_city()
+
+    def get_downloaded_cities(self):
+        """Скачанные города с координатами центра: [(id, center_lat, center_lon)]."""
+        cur = self._reader("cities").cursor()
+        cur.execute(
+            "SELECT id, center_lat, center_lon FROM cities "
+            "WHERE is_downloaded = 1 AND center_lat IS NOT NULL AND center_lon IS NOT NULL"
+        )
+        return cur.fetchall()
 
     def _ensure_city_schema(self):
         cur = self.conn.cursor()
@@ -365,15 +705,33 @@ class DataManager:
             self.conn.commit()
 
     def get_active_city(self):
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM cities WHERE is_active = 1 LIMIT 1")
-        row = cur.fetchone()
-        if not row:
-            return None
-        columns = [c[0] for c in cur.description]
-        return dict(zip(columns, row))
+        """Активный город из памяти; запрос к cities — только если он мог измениться.
 
+        Кэш сбрасывают изменения cities через этот DataManager
+        (_invalidate_active_city), а изменения из другого соединения или
+        процесса видны по PRAGMA data_version соединения для чтения.
+        """
+        conn = self._reader("cities")
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        stamp = (id(conn), version, self._cities_generation)
+        cached = self._active_city
+        if cached is None or cached[0] != stamp:
+            cur = conn.cursor()
+            cur.execute("SELECT * FROM cities WHERE is_active = 1 LIMIT 1")
+            row = cur.fetchone()
+            city = dict(zip([c[0] for c in cur.description], row)) if row else None
+            cached = self._active_city = (stamp, city)
+        # Копия, чтобы вызывающий код не мог испортить закэшированное значение
+        return dict(cached[1]) if cached[1] is not None else None
+
+    def _invalidate_active_city(self):
+        self._cities_generation += 1
+
+    @_serialized_write(tables=("cities", "user_cities"))
     def set_active_city(self, city_id, user_id=1):
+        self._invalidate_active_city()
+        # Индекс автодополнения нового города строится в фоне после фиксации
+        self._names_reload = True
         cur = self.conn.cursor()
         cur.execute("UPDATE cities SET is_active = 0")
         cur.execute("UPDATE cities SET is_active = 1 WHERE id = ?", (city_id,))
@@ -390,8 +748,8 @@ class DataManager:
                 "INSERT INTO user_cities (user_id, city_id, downloaded_at, is_current) VALUES (?, ?, ?, 1)",
                 (user_id, city_id, ""),
             )
-        self.conn.commit()
 
+    @_serialized_write(queueable=False, tables=("cities",))
     def add_city(
         self,
         name: str,
@@ -418,9 +776,10 @@ class DataManager:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
             (name, country, center_lat, center_lon, int(is_downloaded), int(download_size), "", int(is_active)),
         )
-        self.conn.commit()
+        self._invalidate_active_city()
         return cur.lastrowid
 
+    @_serialized_write(tables=("cities", "user_cities"))
     def delete_city(self, city_id: int):
         """Удаляет город и связанные записи из user_cities.
 
@@ -433,32 +792,24 @@ class DataManager:
         except Exception:
             pass
         cur.execute("DELETE FROM cities WHERE id = ?", (city_id,))
-        self.conn.commit()
+        self._invalidate_active_city()
+        self._names_reload = True
 
     def _ensure_places_loaded(self):
         cur = self.conn.cursor()
         cur.execute("SELECT COUNT(*) FROM places")
         count = cur.fetchone()[0]
         if count == 0 and os.path.exists(PLACES_JSON):
-            with open(PLACES_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for place in data:
-                place_with_city = dict(place)
-                place_with_city.setdefault("city_id", 1)
-                self.insert_place(place_with_city)
+            self.bulk_import(places=iter_records(PLACES_JSON))
 
     def _ensure_tours_loaded(self):
         cur = self.conn.cursor()
         cur.execute("SELECT COUNT(*) FROM tours")
         count = cur.fetchone()[0]
         if count == 0 and os.path.exists(TOURS_JSON):
-            with open(TOURS_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for tour in data:
-                tour_with_city = dict(tour)
-                tour_with_city.setdefault("city_id", 1)
-                self.insert_tour_with_points(tour_with_city)
+            self.bulk_import(tours=iter_records(TOURS_JSON))
 
+    @_serialized_write(queueable=False, tables=("places",))
     def reload_places_from_json(self):
         """Полностью перезагружает таблицу places из базового файла places.json.
 
@@ -466,86 +817,580 @@ class DataManager:
         """
         cur = self.conn.cursor()
         cur.execute("DELETE FROM places")
-        self.conn.commit()
 
         if os.path.exists(PLACES_JSON):
-            with open(PLACES_JSON, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            for place in data:
-                place_with_city = dict(place)
-                place_with_city.setdefault("city_id", 1)
-                self.insert_place(place_with_city)
+            self.bulk_import(places=iter_records(PLACES_JSON))
+        # Убирает из нечёткого и пространственного индексов удалённые выше места
+        rebuild_fuzzy_index(self.conn, kinds=(KIND_PLACE,))
+        rebuild_spatial_index(self.conn)
+
+    @_serialized_write(queueable=False, tables=("places", "tours", "tour_points"))
+    def bulk_import(self, places=(), tours=(), city_id=None, chunk_size=None, progress=None, defer_indexes=None):
+        """Массовая загрузка мест и туров (см. data/importer.py).
+
+        places/tours — любые итерируемые наборы записей в формате JSON-файлов.
+        Если city_id задан, он подставляется во все записи, иначе берётся из
+        записи (по умолчанию 1). Некорректные записи пропускаются.
+        Возвращает статистику: количество мест, туров, точек, пропущенных
+        записей и время загрузки. defer_indexes — см. BulkImporter: по
+        умолчанию индексы снимаются, только если загрузка большая по
+        сравнению с тем, что уже есть в базе.
+        """
+        if self._autocomplete is not None:
+            self._names_reload = True
+        importer = BulkImporter(
+            self.conn,
+            # Во вложенном вызове фиксирует внешний метод, пачками не коммитим
+            chunk_size=chunk_size if self._write_depth == 1 else None,
+            progress=progress,
+            defer_indexes=defer_indexes,
+        )
+        return importer.run(places, tours, city_id=city_id)
 
+    @_serialized_write(tables=("places",))
     def insert_place(self, place):
         cur = self.conn.cursor()
-        cur.execute(
-            """INSERT OR REPLACE INTO places
-            (id, name, name_ru, name_en, category,
-             description, description_ru, description_en,
-             short_desc, short_desc_ru, short_desc_en,
-             lat, lon, address, phone,
-             website, price, hours, rating, image_urls, city_id)
-            VALUES (:id, :name, :name_ru, :name_en, :category,
-                    :description, :description_ru, :description_en,
-                    :short_desc, :short_desc_ru, :short_desc_en,
-                    :lat, :lon, :address, :phone,
-                    :website, :price, :hours, :rating, :image_urls, :city_id)
-            """,
-            {
-                "id": place.get("id"),
-                # Базовое имя для совместимости и ru/en-колонки для локализации
-                "name": place.get("name")
-                or place.get("name_ru")
-                or place.get("name_en"),
-                "name_ru": place.get("name_ru") or place.get("name"),
-                "name_en": place.get("name_en"),
-                "category": place.get("category"),
-                "description": place.get("description")
-                or place.get("description_ru"),
-                "description_ru": place.get("description_ru")
-                or place.get("description"),
-                "description_en": place.get("description_en"),
-                "short_desc": place.get("short_desc")
-                or place.get("short_desc_ru"),
-                "short_desc_ru": place.get("short_desc_ru")
-                or place.get("short_desc"),
-                "short_desc_en": place.get("short_desc_en"),
-                "lat": place.get("lat"),
-                "lon": place.get("lon"),
-                "address": place.get("address"),
-                "phone": place.get("phone"),
-                "website": place.get("website"),
-                "price": place.get("price"),
-                "hours": place.get("hours"),
-                "rating": place.get("rating"),
-                "image_urls": json.dumps(place.get("image_urls", []), ensure_ascii=False),
-                "city_id": place.get("city_id", 1),
-            },
-        )
-        self.conn.commit()
+        params = place_params(place)
+        cur.execute(INSERT_PLACE_SQL, params)
+        place_id = params["id"] if params["id"] is not None else cur.lastrowid
+        self._refresh_names(KIND_PLACE, [place_id])
+        refresh_spatial(self.conn, [place_id])
 
+    @_cached("places", "cities")
     def get_all_places(self):
         city = self.get_active_city()
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         if city:
             cur.execute("SELECT * FROM places WHERE city_id = ?", (city["id"],))
         else:
             cur.execute("SELECT * FROM places")
-        columns = [c[0] for c in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
+        return Place.fetch_all(cur)
+
+    @_cached("places", "cities")
+    def get_place_cards(self, category=None, query=None, lang="ru"):
+        """Места активного города для списка: только поля карточки.
+
+        name и short_desc уже выбраны для языка lang (см. localized_column),
+        first_image — первая ссылка из image_urls. category и query
+        (слова или начала слов из названия и описаний, через places_fts)
+        фильтруют в SQL, так что описания в память не попадают. Полная
+        запись места — get_place.
+        """
+        city = self.get_active_city()
+        where = []
+        params = []
+        if city:
+            where.append("city_id = ?")
+            params.append(city["id"])
+        if category:
+            where.append("category = ?")
+            params.append(category)
+        match = match_expression(query, place_search_columns(lang))
+        if match:
+            where.append("id IN (SELECT rowid FROM places_fts WHERE places_fts MATCH ?)")
+            params.append(match)
+        sql = f"SELECT {place_card_columns(lang)} FROM places"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cur = self._reader().cursor()
+        cur.execute(sql, params)
+        places = Place.fetch_all(cur)
+        if match and not places:
+            places = self._fuzzy_place_cards(query, city["id"] if city else None, category, lang)
+        return places
+
+    @_cached("places", "cities")
+    def get_places_page(
+        self,
+        city_id=None,
+        category=None,
+        query=None,
+        sort=SORT_RATING,
+        after_key=None,
+        limit=PLACES_PAGE_LIMIT,
+        lang="ru",
+    ):
+        """Страница списка мест: фильтры, сортировка и пагинация в SQLite.
+
+        Возвращает (места, next_key). Места — карточки как в get_place_cards
+        плюс sort_key; sort — "rating" (по убыванию) или "name". Следующую
+        страницу даёт повторный вызов с after_key=next_key; next_key=None —
+        страниц больше нет. Пагинация по ключу (sort_key, id), а не OFFSET:
+        каждая страница — короткий проход по индексу из data/listing.py,
+        сколько бы мест ни было в городе. city_id=None — активный город.
+        Если query ничего не нашёл полнотекстовым поиском, первая страница —
+        нечёткие совпадения по названию, без продолжения.
+        """
+        if city_id is None:
+            city = self.get_active_city()
+            city_id = city["id"] if city else None
+        key = sort_expression(sort, lang)
+        where = []
+        params = []
+        if city_id is not None:
+            where.append("city_id = ?")
+            params.append(city_id)
+        if category:
+            where.append("category = ?")
+            params.append(category)
+        match = match_expression(query, place_search_columns(lang))
+        if match:
+            where.append("id IN (SELECT rowid FROM places_fts WHERE places_fts MATCH ?)")
+            params.append(match)
+        if after_key is not None:
+            last_value, last_id = after_key
+            # Первое условие задаёт диапазон по индексу, второе отсекает уже показанное
+            if SORT_ORDERS[sort] == "DESC":
+                where.append(f"{key} <= ? AND ({key} < ? OR id > ?)")
+            else:
+                where.append(f"{key} >= ? AND ({key} > ? OR id > ?)")
+            params += [last_value, last_value, last_id]
+        sql = f"SELECT {place_card_columns(lang)}, {key} AS sort_key FROM places"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {key} {SORT_ORDERS[sort]}, id LIMIT ?"
+        cur = self._reader().cursor()
+        cur.execute(sql, params + [limit + 1])
+        places = Place.fetch_all(cur)
+        if match and not places and after_key is None:
+            return self._fuzzy_place_cards(query, city_id, category, lang), None
+        if len(places) <= limit:
+            return places, None
+        places = places[:limit]
+        return places, (places[-1]["sort_key"], places[-1]["id"])
+
+    @_cached("places", "cities")
+    def get_category_counts(self, query=None, lang="ru", city_id=None):
+        """Число мест по категориям для кнопок фильтров: {категория: число}.
+
+        Под ключом "" — всего мест. Считается одним GROUP BY по индексу
+        (city_id, category, ...) с тем же поиском query, что и в
+        get_places_page, но без фильтра по категории, чтобы на каждой кнопке
+        было видно, сколько мест она покажет. city_id=None — активный город.
+        """
+        if city_id is None:
+            city = self.get_active_city()
+            city_id = city["id"] if city else None
+        where = []
+        params = []
+        if city_id is not None:
+            where.append("city_id = ?")
+            params.append(city_id)
+        match = match_expression(query, place_search_columns(lang))
+        if match:
+            where.append("id IN (SELECT rowid FROM places_fts WHERE places_fts MATCH ?)")
+            params.append(match)
+        sql = "SELECT category, COUNT(*) FROM places"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        cur = self._reader().cursor()
+        cur.execute(sql + " GROUP BY category", params)
+        counts = {category or "": count for category, count in cur.fetchall()}
+        if match and not counts:
+            # Список покажет нечёткие совпадения — считаем их
+            for place in self._fuzzy_place_cards(query, city_id, None, lang):
+                category = place["category"] or ""
+                counts[category] = counts.get(category, 0) + 1
+        counts[""] = sum(counts.values())
+        return counts
+
+    def _bbox_condition(self, min_lat, min_lon, max_lat, max_lon, category, city_id):
+        if city_id is None:
+            city = self.get_active_city()
+            city_id = city["id"] if city else None
+        return bbox_condition(min_lat, min_lon, max_lat, max_lon, city_id, category)
+
+    def get_places_in_bbox(
+        self,
+        min_lat,
+        min_lon,
+        max_lat,
+        max_lon,
+        category=None,
+        city_id=None,
+        limit=BBOX_PLACES_LIMIT,
+        lang="ru",
+    ):
+        """Места внутри прямоугольника карты: id, name, category, rating, lat, lon.
+
+        Отбор, фильтры и выбор лучших по рейтингу (если мест больше limit)
+        выполняются по R*Tree (data/spatial.py): время зависит от числа мест
+        в области, а не в городе, и из places читаются только возвращаемые
+        строки. limit=None — все места области. city_id=None — активный
+        город. Не кэшируется: при прокрутке карты область каждый раз новая
+        и только вытесняла бы полезные записи кэша.
+        """
+        condition, params = self._bbox_condition(min_lat, min_lon, max_lat, max_lon, category, city_id)
+        ids = f"SELECT r.id FROM place_rtree r WHERE {condition}"
+        if limit is not None:
+            ids += " ORDER BY IFNULL(r.rating, 0) DESC, r.id LIMIT ?"
+            params.append(limit)
+        cur = self._reader("places").cursor()
+        cur.execute(
+            f"SELECT {place_map_columns(lang)} FROM places WHERE id IN ({ids}) ORDER BY IFNULL(rating, 0) DESC, id",
+            params,
+        )
+        return Place.fetch_all(cur)
+
+    def count_places_in_bbox(self, min_lat, min_lon, max_lat, max_lon, category=None, city_id=None):
+        """Число мест внутри прямоугольника, с теми же фильтрами, что get_places_in_bbox."""
+        condition, params = self._bbox_condition(min_lat, min_lon, max_lat, max_lon, category, city_id)
+        cur = self._reader("places").cursor()
+        cur.execute(f"SELECT COUNT(*) FROM place_rtree r WHERE {condition}", params)
+        return cur.fetchone()[0]
+
+    def nearest_places(
+        self,
+        lat,
+        lon,
+        k=NEAREST_PLACES_K,
+        category=None,
+        max_distance_m=None,
+        city_id=None,
+        lang="ru",
+    ):
+        """k ближайших к точке мест по возрастанию расстояния.
+
+        Места — карточки как в get_places_page плюс lat, lon и distance_m
+        (метры по поверхности Земли). max_distance_m — не дальше этого
+        расстояния (мест может быть меньше k). city_id=None — активный
+        город. Кандидаты берутся из R*Tree (data/spatial.py) и хранятся
+        окном вокруг точки с запасом, так что повторные запросы для
+        движущейся точки считаются в памяти, пока она не выйдет за запас
+        окна; изменение places через DataManager окно сбрасывает.
+        """
+        if k <= 0:
+            return []
+        if city_id is None:
+            city = self.get_active_city()
+            city_id = city["id"] if city else None
+        key = (city_id, category or None)
+        stamp = self.query_cache.stamp(("places",))
+        window = self._nearby_window
+        found = None
+        if window is not None and window.key == key and window.stamp == stamp:
+            found = window.nearest(lat, lon, k, max_distance_m)
+        if found is None:
+            window = self._load_nearby_window(lat, lon, k, key, stamp, max_distance_m)
+            self._nearby_window = window
+            found = window.nearest(lat, lon, k, max_distance_m)
+        if not found:
+            return []
+        distances = {place_id: distance for distance, place_id in found}
+        marks = ", ".join("?" * len(distances))
+        cur = self._reader("places").cursor()
+        cur.execute(
+            f"SELECT {place_card_columns(lang)}, lat, lon FROM places WHERE id IN ({marks})",
+            list(distances),
+        )
+        columns = column_index(cur)
+        columns["distance_m"] = len(columns)
+        places = [Place(columns, row + (distances[row[0]],)) for row in cur.fetchall()]
+        places.sort(key=lambda place: (place["distance_m"], place["id"]))
+        return places
+
+    def _load_nearby_window(self, lat, lon, k, key, stamp, max_distance_m):
+        """NearbyWindow вокруг точки с k ближайшими местами и запасом на перемещение.
+
+        Радиус начинается с половины прошлого окна (плотность мест рядом
+        обычно та же) и удваивается, пока в круге не наберётся k мест или он
+        не дойдёт до max_distance_m. Окно читается с радиусом вдвое больше
+        расстояния до k-го места (запас — не меньше NEARBY_MIN_MARGIN_M).
+        """
+        city_id, category = key
+        conn = self._reader("places")
+        previous = self._nearby_window
+        radius = NEARBY_START_RADIUS_M
+        if previous is not None and previous.key == key:
+            radius = max(previous.radius_m / 2, NEARBY_START_RADIUS_M)
+        while True:
+            if max_distance_m is not None:
+                radius = min(radius, max_distance_m)
+            points = points_near(conn, lat, lon, radius, city_id, category)
+            distances = [haversine_m(lat, lon, point_lat, point_lon) for _id, point_lat, point_lon in points]
+            within = sorted(distance for distance in distances if distance <= radius)
+            if (
+                len(within) >= k
+                or radius >= HALF_CIRCUMFERENCE_M
+                or (max_distance_m is not None and radius >= max_distance_m)
+            ):
+                break
+            radius *= 2
+        needed = within[k - 1] if len(within) >= k else radius
+        window_radius = needed + max(needed, NEARBY_MIN_MARGIN_M)
+        if window_radius > radius:
+            points = points_near(conn, lat, lon, window_radius, city_id, category)
+        else:
+            window_radius = radius
+        return NearbyWindow(key, stamp, lat, lon, window_radius, points)
+
+    def get_place_points(self, city_id=None, category=None):
+        """(id, lat, lon) всех мест города с координатами — для индекса кластеров карты.
+
+        Только три колонки кортежами, без записей Place: для города в сотни
+        тысяч мест это заметно быстрее и компактнее. city_id=None — активный
+        город.
+        """
+        if city_id is None:
+            city = self.get_active_city()
+            city_id = city["id"] if city else None
+        where = ["lat IS NOT NULL", "lon IS NOT NULL"]
+        params = []
+        if city_id is not None:
+            where.append("city_id = ?")
+            params.append(city_id)
+        if category:
+            where.append("category = ?")
+            params.append(category)
+        cur = self._reader("places").cursor()
+        cur.execute(f"SELECT id, lat, lon FROM places WHERE {' AND '.join(where)}", params)
+        return cur.fetchall()
+
+    def _fuzzy_place_cards(self, query, city_id, category, lang):
+        """Карточки мест, похожих на query по названию, лучшие первыми."""
+        matches = fuzzy_matches(
+            self._reader(),
+            query,
+            city_id=city_id,
+            kinds=(KIND_PLACE,),
+            limit=FUZZY_CARDS_LIMIT,
+        )
+        if not matches:
+            return []
+        order = {ref_id: position for position, (_kind, ref_id, _similarity) in enumerate(matches)}
+        sql = f"SELECT {place_card_columns(lang)} FROM places WHERE id IN ({', '.join('?' * len(order))})"
+        params = list(order)
+        if category:
+            sql += " AND category = ?"
+            params.append(category)
+        cur = self._reader().cursor()
+        cur.execute(sql, params)
+        return sorted(Place.fetch_all(cur), key=lambda place: order[place["id"]])
+
+    @_cached("places", "tours", "tour_points", "cities")
+    def search(self, query, lang="ru", limit=20, offset=0, kinds=("place", "tour")):
+        """Полнотекстовый поиск мест и туров активного города, одним списком.
+
+        Возвращает SearchHit (kind, id, title, snippet, rank), лучшие первыми:
+        rank — bm25 (меньше — лучше), совпадения в названии весят больше,
+        чем в описании. В snippet найденные слова выделены [b]...[/b]
+        (разметка Kivy). Места ищутся по текстам на языке lang, туры — по
+        названию, описанию и названиям мест своих точек (такое совпадение
+        весит TOUR_POINT_WEIGHT от обычного, в snippet — название места).
+        limit/offset — страница общего списка; из каждой таблицы читается
+        не больше offset + limit строк.
+        """
+        hits = []
+        city = self.get_active_city()
+        cur = self._reader().cursor()
+        window = offset + limit
+        if "place" in kinds:
+            match = match_expression(query, place_search_columns(lang))
+            if match:
+                sql = f"""SELECT 'place' AS kind, p.id AS id,
+                        {localized_column("name", lang, table="p", alias="title")},
+                        snippet(places_fts, -1, '[b]', '[/b]', '…', 12) AS snippet,
+                        bm25(places_fts, {", ".join(map(str, PLACE_WEIGHTS))}) AS rank
+                    FROM places_fts JOIN places p ON p.id = places_fts.rowid
+                    WHERE places_fts MATCH ?"""
+                params = [match]
+                if city:
+                    sql += " AND p.city_id = ?"
+                    params.append(city["id"])
+                cur.execute(sql + " ORDER BY rank LIMIT ?", params + [window])
+                hits.extend(SearchHit.fetch_all(cur))
+        if "tour" in kinds:
+            tours = {}
+            match = match_expression(query)
+            if match:
+                sql = f"""SELECT 'tour' AS kind, t.id AS id, t.title AS title,
+                        snippet(tours_fts, -1, '[b]', '[/b]', '…', 12) AS snippet,
+                        bm25(tours_fts, {", ".join(map(str, TOUR_WEIGHTS))}) AS rank
+                    FROM tours_fts JOIN tours t ON t.id = tours_fts.rowid
+                    WHERE tours_fts MATCH ?"""
+                params = [match]
+                if city:
+                    sql += " AND t.city_id = ?"
+                    params.append(city["id"])
+                cur.execute(sql + " ORDER BY rank LIMIT ?", params + [window])
+                tours.update((hit["id"], hit) for hit in SearchHit.fetch_all(cur))
+            match = match_expression(query, PLACE_NAME_COLUMNS)
+            if match:
+                # LIMIT во вложенном запросе обязателен: без него SQLite встраивает
+                # его в GROUP BY, а bm25 в агрегате использовать нельзя.
+                # MIN() с «голой» колонкой берёт название места из той же строки.
+                sql = f"""SELECT 'tour' AS kind, t.id AS id, t.title AS title,
+                        {localized_column("name", lang, table="p", alias="snippet")},
+                        MIN(m.rank) * {TOUR_POINT_WEIGHT} AS rank
+                    FROM (
+                        SELECT rowid AS place_id, bm25(places_fts) AS rank
+                        FROM places_fts WHERE places_fts MATCH ?
+                        ORDER BY rank LIMIT ?
+                    ) m
+                    JOIN tour_points tp ON tp.place_id = m.place_id
+                    JOIN tours t ON t.id = tp.tour_id
+                    JOIN places p ON p.id = m.place_id"""
+                params = [match, TOUR_POINT_MATCHES]
+                if city:
+                    sql += " WHERE t.city_id = ?"
+                    params.append(city["id"])
+                cur.execute(sql + " GROUP BY t.id ORDER BY rank LIMIT ?", params + [window])
+                for hit in SearchHit.fetch_all(cur):
+                    found = tours.get(hit["id"])
+                    if found is None or hit["rank"] < found["rank"]:
+                        tours[hit["id"]] = hit
+            hits.extend(tours.values())
+        if not hits:
+            # Опечатка или транслит ("krasnaya ploshad") — ищем по похожести названий
+            return self.fuzzy_search(query, lang=lang, limit=window, kinds=kinds)[offset:]
+        hits.sort(key=lambda hit: hit["rank"])
+        return hits[offset:window]
+
+    @_cached("places", "tours", "cities")
+    def fuzzy_search(self, query, lang="ru", limit=10, kinds=(KIND_PLACE, KIND_TOUR)):
+        """Нечёткий поиск мест и туров активного города по названию.
+
+        Находит названия с опечатками и написанные другим алфавитом
+        ("krasnaya ploshad" -> «Красная площадь»), см. data/fuzzy.py.
+        Возвращает SearchHit как search: snippet пустой, rank = -похожесть
+        (меньше — лучше, как у bm25).
+        """
+        city = self.get_active_city()
+        conn = self._reader()
+        matches = fuzzy_matches(
+            conn, query, city_id=city["id"] if city else None, kinds=tuple(kinds), limit=limit
+        )
+        titles = {}
+        for kind, table, title in (
+            (KIND_PLACE, "places", localized_column("name", lang, alias="title")),
+            (KIND_TOUR, "tours", "title"),
+        ):
+            ids = [ref_id for match_kind, ref_id, _similarity in matches if match_kind == kind]
+            if ids:
+                rows = conn.execute(
+                    f"SELECT id, {title} FROM {table} WHERE id IN ({', '.join('?' * len(ids))})", ids
+                )
+                titles.update(((kind, ref_id), value) for ref_id, value in rows)
+        columns = {"kind": 0, "id": 1, "title": 2, "snippet": 3, "rank": 4}
+        return [
+            SearchHit(columns, (kind, ref_id, titles.get((kind, ref_id), ""), "", -similarity))
+            for kind, ref_id, similarity in matches
+        ]
+
+    # --- Autocomplete ---
+
+    def autocomplete(self, prefix, limit=8, lang="ru"):
+        """Мгновенные подсказки по началу слова в названиях мест и туров.
+
+        Возвращает SearchHit (kind, id, title) из индекса в памяти
+        (data/autocomplete.py), без обращения к базе. Пока индекс для
+        активного города и языка lang строится, возвращает пустой список.
+        """
+        index = self._autocomplete
+        city = self.get_active_city()
+        city_id = city["id"] if city else None
+        if index is None or index.city_id != city_id or index.lang != lang:
+            if self._autocomplete_thread is None:
+                self.build_autocomplete_index(lang)
+            return []
+        return [SearchHit(AUTOCOMPLETE_COLUMNS, hit) for hit in index.complete(prefix, limit)]
+
+    def build_autocomplete_index(self, lang=None):
+        """Строит индекс автодополнения активного города в фоновом потоке.
+
+        Повторный вызов во время построения не запускает второй поток:
+        текущий просто построит индекс ещё раз. Возвращает поток.
+        """
+        with self._autocomplete_lock:
+            if lang:
+                self._autocomplete_lang = lang
+            self._autocomplete_requested += 1
+            if self._autocomplete_thread is None:
+                self._autocomplete_thread = Thread(
+                    target=self._build_autocomplete, name="autocomplete", daemon=True
+                )
+                self._autocomplete_thread.start()
+            return self._autocomplete_thread
+
+    def _build_autocomplete(self):
+        while True:
+            with self._autocomplete_lock:
+                requested = self._autocomplete_requested
+                lang = self._autocomplete_lang
+            try:
+                city_id, entries = self._autocomplete_entries(lang)
+                index = AutocompleteIndex(city_id, lang, entries)
+            except Exception:
+                index = None
+            with self._autocomplete_lock:
+                if index is not None:
+                    self._autocomplete = index
+                if self._autocomplete_requested == requested:
+                    self._autocomplete_thread = None
+                    return
+
+    def _autocomplete_entries(self, lang):
+        """(id активного города, [(kind, id, title)]) из одного снимка базы.
+
+        Читает через read-only соединение потока построения одной
+        транзакцией: в индекс попадает только зафиксированное, а то, что
+        зафиксируют позже, _sync_autocomplete применит перестройкой.
+        """
+        conn = self._readers.get()
+        conn.execute("BEGIN")
+        try:
+            row = conn.execute("SELECT id FROM cities WHERE is_active = 1 LIMIT 1").fetchone()
+            city_id = row[0] if row else None
+            where = " WHERE city_id = ?" if city_id is not None else ""
+            params = (city_id,) if city_id is not None else ()
+            entries = conn.execute(
+                f"SELECT 'place', id, {localized_column('name', lang)} FROM places{where}", params
+            ).fetchall()
+            entries += conn.execute(f"SELECT 'tour', id, title FROM tours{where}", params).fetchall()
+        finally:
+            conn.rollback()
+        return city_id, entries
+
+    def _sync_autocomplete(self):
+        """Применяет к индексу автодополнения изменения, зафиксированные в базе."""
+        changed = self._names_changed
+        reload = self._names_reload
+        self._names_changed = set()
+        self._names_reload = False
+        index = self._autocomplete
+        if reload or (
+            index is not None
+            and (self._autocomplete_thread is not None or index.delta_size + len(changed) > AUTOCOMPLETE_MAX_DELTA)
+        ):
+            # Строящийся сейчас индекс мог не увидеть этих изменений — строим заново
+            self.build_autocomplete_index()
+            return
+        if index is None:
+            return
+        for kind, ref_id in changed:
+            if kind == KIND_PLACE:
+                sql = f"SELECT city_id, {localized_column('name', index.lang)} FROM places WHERE id = ?"
+            else:
+                sql = "SELECT city_id, title FROM tours WHERE id = ?"
+            row = self.conn.execute(sql, (ref_id,)).fetchone()
+            if row is not None and (index.city_id is None or row[0] == index.city_id):
+                index.update(kind, ref_id, row[1])
+            else:
+                index.update(kind, ref_id, None)
 
     # --- Reviews ---
 
+    @_serialized_write(tables=("reviews",))
     def add_review(self, place_id, rating, comment, user_id=1, created_at=""):
         cur = self.conn.cursor()
         cur.execute(
             "INSERT INTO reviews (place_id, user_id, rating, comment, created_at) VALUES (?, ?, ?, ?, ?)",
             (place_id, user_id, rating, comment, created_at),
         )
-        self.conn.commit()
 
+    @_cached("reviews")
     def get_reviews_for_place(self, place_id):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute(
             "SELECT id, place_id, user_id, rating, comment, created_at FROM reviews WHERE place_id = ? ORDER BY id DESC",
             (place_id,),
@@ -553,18 +1398,20 @@ class DataManager:
         columns = [c[0] for c in cur.description]
         return [dict(zip(columns, row)) for row in cur.fetchall()]
 
+    @_serialized_write(tables=("tours", "tour_points", "user_tours"))
     def delete_tour(self, tour_id):
         """Удаляет экскурсию и связанные с ней точки и прогресс пользователя."""
         cur = self.conn.cursor()
         cur.execute("DELETE FROM tour_points WHERE tour_id = ?", (tour_id,))
         cur.execute("DELETE FROM user_tours WHERE tour_id = ?", (tour_id,))
         cur.execute("DELETE FROM tours WHERE id = ?", (tour_id,))
-        self.conn.commit()
+        self._refresh_names(KIND_TOUR, [tour_id])
 
     # --- User tour progress ---
 
+    @_cached("user_tours")
     def get_user_tour_progress(self, tour_id, user_id=1):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute(
             "SELECT user_id, tour_id, progress, current_point, started_at, completed_at, rating_user FROM user_tours WHERE user_id = ? AND tour_id = ?",
             (user_id, tour_id),
@@ -575,6 +1422,7 @@ class DataManager:
         columns = [c[0] for c in cur.description]
         return dict(zip(columns, row))
 
+    @_serialized_write(tables=("user_tours",))
     def upsert_user_tour_progress(
         self,
         tour_id,
@@ -599,67 +1447,45 @@ class DataManager:
             """,
             (user_id, tour_id, progress, current_point, started_at, completed_at, rating_user),
         )
-        self.conn.commit()
 
     # --- Tours ---
 
+    @_serialized_write(tables=("tours", "tour_points"))
     def insert_tour_with_points(self, tour):
         cur = self.conn.cursor()
-        cur.execute(
-            """INSERT OR REPLACE INTO tours
-            (id, title, description, theme, duration, distance, cover_image,
-             audio_intro, is_linear, rating, price, author_id, city_id)
-            VALUES (:id, :title, :description, :theme, :duration, :distance,
-                    :cover_image, :audio_intro, :is_linear, :rating, :price,
-                    :author_id, :city_id)
-            """,
-            {
-                "id": tour.get("id"),
-                "title": tour.get("title"),
-                "description": tour.get("description"),
-                "theme": tour.get("theme"),
-                "duration": tour.get("duration"),
-                "distance": tour.get("distance"),
-                "cover_image": tour.get("cover_image"),
-                "audio_intro": tour.get("audio_intro"),
-                "is_linear": tour.get("is_linear", 1),
-                "rating": tour.get("rating"),
-                "price": tour.get("price"),
-                "author_id": tour.get("author_id"),
-                "city_id": tour.get("city_id", 1),
-            },
-        )
+        cur.execute(INSERT_TOUR_SQL, tour_params(tour))
+        tour_id = tour.get("id") if tour.get("id") is not None else cur.lastrowid
         # точки тура
         points = tour.get("points", [])
         for point in points:
             cur.execute(
-                """INSERT INTO tour_points
-                (tour_id, place_id, order_index, audio_story, quiz_question)
-                VALUES (?, ?, ?, ?, ?)""",
+                INSERT_TOUR_POINT_SQL,
                 (
                     tour.get("id"),
                     point.get("place_id"),
                     point.get("order_index"),
                     point.get("audio_story", ""),
                     point.get("quiz_question", ""),
+                    json.dumps(point.get("image_urls", []) or [], ensure_ascii=False),
                 ),
             )
-        self.conn.commit()
+        self._refresh_names(KIND_TOUR, [tour_id])
 
+    @_cached("tours", "cities")
     def get_all_tours(self):
         city = self.get_active_city()
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         if city:
             cur.execute("SELECT * FROM tours WHERE city_id = ?", (city["id"],))
         else:
             cur.execute("SELECT * FROM tours")
-        columns = [c[0] for c in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
+        return Tour.fetch_all(cur)
 
+    @_cached("tours", "user_tours", "cities")
     def get_all_tours_with_progress(self, user_id=1):
         """Возвращает список туров и прогресс пользователя по каждому из них."""
         city = self.get_active_city()
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         if city:
             cur.execute(
                 """SELECT t.*, ut.progress, ut.current_point, ut.completed_at
@@ -677,27 +1503,55 @@ class DataManager:
                     ON t.id = ut.tour_id AND ut.user_id = ?""",
                 (user_id,),
             )
-        columns = [c[0] for c in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
+        return Tour.fetch_all(cur)
+
+    @_cached("tours", "tour_points", "places", "user_tours", "cities")
+    def get_tour_cards(self, user_id=1):
+        """Туры активного города для списка: поля карточки и прогресс.
+
+        first_image — обложка тура или первое фото места первой точки,
+        points_count — число точек маршрута; оба считаются в том же запросе.
+        Полная запись тура — get_tour.
+        """
+        city = self.get_active_city()
+        first_point_image = FIRST_IMAGE_SQL.format("p.image_urls")
+        sql = f"""SELECT t.id, t.title, t.theme, t.rating, t.price, t.duration, t.distance,
+                ut.progress, ut.current_point, ut.completed_at,
+                COALESCE(
+                    NULLIF(t.cover_image, ''),
+                    (SELECT {first_point_image}
+                     FROM tour_points tp JOIN places p ON p.id = tp.place_id
+                     WHERE tp.tour_id = t.id
+                     ORDER BY tp.order_index LIMIT 1)
+                ) AS first_image,
+                (SELECT COUNT(*) FROM tour_points tp WHERE tp.tour_id = t.id) AS points_count
+            FROM tours t
+            LEFT JOIN user_tours ut
+                ON t.id = ut.tour_id AND ut.user_id = ?"""
+        params = [user_id]
+        if city:
+            sql += " WHERE t.city_id = ?"
+            params.append(city["id"])
+        cur = self._reader().cursor()
+        cur.execute(sql, params)
+        return Tour.fetch_all(cur)
 
+    @_cached("tours")
     def get_tour(self, tour_id):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute("SELECT * FROM tours WHERE id = ?", (tour_id,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        columns = [c[0] for c in cur.description]
-        return dict(zip(columns, row))
+        return Tour.fetch_one(cur)
 
+    @_cached("tour_points")
     def get_points_for_tour(self, tour_id):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute(
             "SELECT tour_id, place_id, order_index, audio_story, quiz_question, image_urls FROM tour_points WHERE tour_id = ? ORDER BY order_index",
             (tour_id,),
         )
-        columns = [c[0] for c in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
+        return TourPoint.fetch_all(cur)
 
+    @_serialized_write(tables=("tour_points",))
     def set_tour_points(self, tour_id, points):
         """Перезаписывает список точек для указанной экскурсии.
 
@@ -727,19 +1581,22 @@ class DataManager:
                     ),
                 )
 
-        self.conn.commit()
+    @_cached("places")
+    def get_place(self, place_id, lang=None):
+        """Запись места целиком.
 
-    def get_place(self, place_id):
-        cur = self.conn.cursor()
-        cur.execute("SELECT * FROM places WHERE id = ?", (place_id,))
-        row = cur.fetchone()
-        if not row:
-            return None
-        columns = [c[0] for c in cur.description]
-        return dict(zip(columns, row))
+        Если передан lang, вместо колонок name/short_desc/description со всеми
+        переводами возвращаются только строки на этом языке — для экрана
+        просмотра. Без lang (редактирование) — все колонки как есть.
+        """
+        cur = self._reader().cursor()
+        columns = place_detail_columns(lang) if lang else "*"
+        cur.execute(f"SELECT {columns} FROM places WHERE id = ?", (place_id,))
+        return Place.fetch_one(cur)
 
     # --- Admin helpers ---
 
+    @_serialized_write(tables=("places", "tour_points", "favorites", "reviews"))
     def delete_place(self, place_id):
         """Удаляет место и связанные с ним данные (избранное, отзывы, точки туров)."""
         cur = self.conn.cursor()
@@ -748,8 +1605,10 @@ class DataManager:
         cur.execute("DELETE FROM favorites WHERE place_id = ?", (place_id,))
         cur.execute("DELETE FROM reviews WHERE place_id = ?", (place_id,))
         cur.execute("DELETE FROM places WHERE id = ?", (place_id,))
-        self.conn.commit()
+        self._refresh_names(KIND_PLACE, [place_id])
+        refresh_spatial(self.conn, [place_id])
 
+    @_serialized_write(tables=("places",))
     def update_place_basic(self, place_id, name, short_desc, description, address):
         cur = self.conn.cursor()
         cur.execute(
@@ -765,8 +1624,9 @@ class DataManager:
                 place_id,
             ),
         )
-        self.conn.commit()
+        self._refresh_names(KIND_PLACE, [place_id])
 
+    @_serialized_write(tables=("places",))
     def update_place_images(self, place_id, image_urls):
         """Обновляет список фотографий места (image_urls) для админ-редактора.
 
@@ -785,48 +1645,49 @@ class DataManager:
             "UPDATE places SET image_urls = ? WHERE id = ?",
             (data, place_id),
         )
-        self.conn.commit()
 
+    @_serialized_write(tables=("places",))
     def update_place_coords(self, place_id, lat, lon):
         """Обновляет координаты места (lat/lon)."""
         cur = self.conn.cursor()
         cur.execute("UPDATE places SET lat = ?, lon = ? WHERE id = ?", (lat, lon, place_id))
-        self.conn.commit()
+        refresh_spatial(self.conn, [place_id])
 
+    @_serialized_write(tables=("favorites",))
     def add_favorite(self, place_id, user_id=1):
         cur = self.conn.cursor()
         cur.execute(
-            "INSERT INTO favorites (user_id, place_id) VALUES (?, ?)",
+            "INSERT OR IGNORE INTO favorites (user_id, place_id) VALUES (?, ?)",
             (user_id, place_id),
         )
-        self.conn.commit()
 
+    @_serialized_write(tables=("favorites",))
     def remove_favorite(self, place_id, user_id=1):
         cur = self.conn.cursor()
         cur.execute(
             "DELETE FROM favorites WHERE user_id = ? AND place_id = ?",
             (user_id, place_id),
         )
-        self.conn.commit()
 
+    @_cached("favorites")
     def is_favorite(self, place_id, user_id=1):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute(
             "SELECT 1 FROM favorites WHERE user_id = ? AND place_id = ?",
             (user_id, place_id),
         )
         return cur.fetchone() is not None
 
+    @_cached("places", "favorites")
     def get_favorite_places(self, user_id=1):
-        cur = self.conn.cursor()
+        cur = self._reader().cursor()
         cur.execute(
             """SELECT p.* FROM places p
             JOIN favorites f ON p.id = f.place_id
             WHERE f.user_id = ?""",
             (user_id,),
         )
-        columns = [c[0] for c in cur.description]
-        return [dict(zip(columns, row)) for row in cur.fetchall()]
+        return Place.fetch_all(cur)
 
     # --- Users (многопользовательская модель) ---
 
@@ -835,14 +1696,14 @@ class DataManager:
 
         Пароли не возвращаем по соображениям безопасности.
         """
-        cur = self.conn.cursor()
+        cur = self._reader("users").cursor()
         cur.execute("SELECT id, username, role FROM users ORDER BY id")
         columns = [c[0] for c in cur.description]
         return [dict(zip(columns, row)) for row in cur.fetchall()]
 
     def get_user_by_username(self, username: str):
         """Возвращает пользователя по логину или None."""
-        cur = self.conn.cursor()
+        cur = self._reader("users").cursor()
         cur.execute("SELECT * FROM users WHERE username = ?", (username,))
         row = cur.fetchone()
         if not row:
@@ -850,6 +1711,7 @@ class DataManager:
         columns = [c[0] for c in cur.description]
         return dict(zip(columns, row))
 
+    @_serialized_write(queueable=False, tables=("users",))
     def create_user(
         self,
         username: str,
@@ -882,14 +1744,26 @@ class DataManager:
             "INSERT INTO users (username, password_hash, role, first_name, last_name, email, secret_word) VALUES (?, ?, ?, ?, ?, ?, ?)",
             (username, password_hash, role, first_name, last_name, email, secret_word),
         )
-        self.conn.commit()
         return cur.lastrowid
 
-    def update_user(self, user_id: int, username: str, password_plain: str = None, role: str = None):
+    @_serialized_write(queueable=False, tables=("users",))
+    def update_user(
+        self,
+        user_id: int,
+        username: str,
+        password_plain: str = None,
+        role: str = None,
+        first_name: str = None,
+        last_name: str = None,
+        email: str = None,
+        secret_word: str = None,
+    ):
         """Обновляет данные пользователя.
 
         Если password_plain пустой, пароль не меняется.
         Если role не указана, роль не меняем.
+        Поля профиля (first_name, last_name, email, secret_word) меняются,
+        только если переданы.
         """
         username = (username or "").strip()
         if not username:
@@ -919,16 +1793,29 @@ class DataManager:
                     "UPDATE users SET username = ? WHERE id = ?",
                     (username, user_id),
                 )
-        self.conn.commit()
 
+        profile = {
+            "first_name": first_name,
+            "last_name": last_name,
+            "email": email,
+            "secret_word": secret_word,
+        }
+        profile = {column: value for column, value in profile.items() if value is not None}
+        if profile:
+            cur.execute(
+                f"UPDATE users SET {', '.join(f'{column} = ?' for column in profile)} WHERE id = ?",
+                (*profile.values(), user_id),
+            )
+
+    @_serialized_write(tables=("users",))
     def delete_user(self, user_id: int):
         """Удаляет пользователя по id. Встроенного admin (id=1) лучше не трогать."""
         cur = self.conn.cursor()
         cur.execute("DELETE FROM users WHERE id = ?", (user_id,))
-        self.conn.commit()
 
     # --- Сообщения техподдержки ---
 
+    @_serialized_write(tables=("support_messages",))
     def add_support_message(self, user_id: int, is_admin_sender: bool, message: str, created_at: str = ""):
         """Добавляет сообщение в переписку техподдержки.
 
@@ -943,11 +1830,10 @@ class DataManager:
             "INSERT INTO support_messages (user_id, is_admin_sender, message, created_at) VALUES (?, ?, ?, ?)",
             (int(user_id), 1 if is_admin_sender else 0, message, created_at or ""),
         )
-        self.conn.commit()
 
     def get_support_messages_for_user(self, user_id: int):
         """Возвращает все сообщения переписки для указанного пользователя."""
-        cur = self.conn.cursor()
+        cur = self._reader("support_messages").cursor()
         cur.execute(
             "SELECT id, user_id, is_admin_sender, message, created_at FROM support_messages WHERE user_id = ? ORDER BY id",
             (int(user_id),),
@@ -960,7 +1846,7 @@ class DataManager:
 
         Используется в админке для выбора диалога.
         """
-        cur = self.conn.cursor()
+        cur = self._reader("users", "support_messages").cursor()
         cur.execute(
             """
             SELECT u.id AS user_id,
@@ -0,0 +1,245 @@
+"""Нечёткий поиск по названиям мест и туров (триграммы).
+
+Названия на русском и английском приводятся к общей латинской форме
+(транслитерация + упрощение вариантов написания: "shch"/"sch" -> "sh",
+"kh" -> "h", "ja" -> "ya" и т.п.) и раскладываются на триграммы. Так
+"krasnaya ploshad", "красная плошадь" и "Красная площадь" дают почти
+одинаковые наборы триграмм.
+
+Индекс хранится в двух таблицах:
+    fuzzy_names    — запись на место/тур: нормализованный текст и число триграмм;
+    fuzzy_trigrams — триграмма -> (город, вид, id), ключ покрывает поиск.
+Транслитерация делается в Python, поэтому индекс обновляет DataManager
+(refresh_places/refresh_tours после изменения строк), а не триггеры.
+"""
+import math
+import re
+import unicodedata
+from operator import itemgetter
+
+
+KIND_PLACE = "place"
+KIND_TOUR = "tour"
+
+# Минимальная доля триграмм запроса, найденных в названии
+MIN_SIMILARITY = 0.5
+# Сколько кандидатов оценивать точно на одно место в результате
+CANDIDATES_PER_RESULT = 20
+MIN_CANDIDATES = 200
+
+_CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "e",
+    "ж": "zh", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "h", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "",
+    "ы": "y", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+}
+_TRANSLIT = str.maketrans(_CYRILLIC)
+
+# Разные латинские записи одного звука -> одна форма (порядок важен)
+_LATIN_VARIANTS = (
+    ("shch", "sh"),
+    ("sch", "sh"),
+    ("kh", "h"),
+    ("tz", "ts"),
+    ("ja", "ya"),
+    ("ju", "yu"),
+    ("jo", "e"),
+    ("yo", "e"),
+    ("ia", "ya"),
+    ("iy", "y"),
+    ("yy", "y"),
+    ("ij", "y"),
+    ("w", "v"),
+    ("x", "ks"),
+    ("q", "k"),
+)
+
+_VARIANTS = dict(_LATIN_VARIANTS)
+_VARIANT = re.compile("|".join(re.escape(variant) for variant, _common in _LATIN_VARIANTS))
+_NOT_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def normalize(text):
+    """Текст -> нижний регистр, латиница без диакритики, слова через пробел."""
+    text = (text or "").lower().translate(_TRANSLIT)
+    if not text.isascii():
+        # Диакритика отделяется от букв и отбрасывается вместе с прочими не-ASCII символами
+        text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    text = _VARIANT.sub(lambda match: _VARIANTS[match.group()], text)
+    return _NOT_WORD.sub(" ", text).strip()
+
+
+def trigrams(normalized):
+    """Множество триграмм, каждое слово дополнено пробелами как в pg_trgm."""
+    result = set()
+    for word in normalized.split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            result.add(padded[i:i + 3])
+    return result
+
+
+def create_fuzzy_index(conn):
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS fuzzy_names (
+            kind TEXT NOT NULL,
+            ref_id INTEGER NOT NULL,
+            city_id INTEGER,
+            norm TEXT NOT NULL,
+            trigram_count INTEGER NOT NULL,
+            PRIMARY KEY (kind, ref_id)
+        ) WITHOUT ROWID"""
+    )
+    conn.execute(
+        """CREATE TABLE IF NOT EXISTS fuzzy_trigrams (
+            trigram TEXT NOT NULL,
+            city_id INTEGER,
+            kind TEXT NOT NULL,
+            ref_id INTEGER NOT NULL,
+            PRIMARY KEY (trigram, city_id, kind, ref_id)
+        ) WITHOUT ROWID"""
+    )
+    rebuild_fuzzy_index(conn)
+
+
+def fuzzy_index_exists(conn):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'fuzzy_names'"
+    ).fetchone()
+    return row is not None
+
+
+def _place_rows(conn, ids=None):
+    return _select(conn, "SELECT id, city_id, name, name_ru, name_en FROM places WHERE", "id", ids)
+
+
+def _tour_rows(conn, ids=None):
+    return _select(conn, "SELECT id, city_id, title FROM tours WHERE", "id", ids)
+
+
+def _select(conn, sql, column, ids, params=()):
+    """sql — запрос, оканчивающийся на WHERE (с условиями и AND или без них);
+    ids=None — все строки, иначе только с column из ids."""
+    if ids is None:
+        return conn.execute(sql + " 1", params).fetchall()
+    rows = []
+    ids = list(ids)
+    # Не больше 500 параметров на запрос
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ", ".join("?" * len(chunk))
+        rows.extend(conn.execute(f"{sql} {column} IN ({marks})", list(params) + chunk).fetchall())
+    return rows
+
+
+def _remove(conn, kind, ids):
+    rows = _select(conn, "SELECT ref_id, city_id, norm FROM fuzzy_names WHERE kind = ? AND", "ref_id", ids, (kind,))
+    conn.executemany(
+        "DELETE FROM fuzzy_trigrams WHERE trigram = ? AND city_id IS ? AND kind = ? AND ref_id = ?",
+        [(trigram, city_id, kind, ref_id) for ref_id, city_id, norm in rows for trigram in trigrams(norm)],
+    )
+    conn.executemany(
+        "DELETE FROM fuzzy_names WHERE kind = ? AND ref_id = ?",
+        [(kind, ref_id) for ref_id, _city_id, _norm in rows],
+    )
+
+
+def _add(conn, kind, rows):
+    names = []
+    postings = []
+    for ref_id, city_id, *texts in rows:
+        # Повторы (name обычно совпадает с name_ru) не нужны
+        norm = " ".join(dict.fromkeys(n for n in map(normalize, dict.fromkeys(texts)) if n))
+        grams = trigrams(norm)
+        names.append((kind, ref_id, city_id, norm, len(grams)))
+        postings.extend((trigram, city_id, kind, ref_id) for trigram in grams)
+    conn.executemany(
+        "INSERT OR REPLACE INTO fuzzy_names (kind, ref_id, city_id, norm, trigram_count) VALUES (?, ?, ?, ?, ?)",
+        names,
+    )
+    # По порядку триграмм вставка идёт по соседним страницам B-дерева
+    postings.sort(key=itemgetter(0))
+    conn.executemany(
+        "INSERT OR IGNORE INTO fuzzy_trigrams (trigram, city_id, kind, ref_id) VALUES (?, ?, ?, ?)",
+        postings,
+    )
+
+
+def refresh_places(conn, ids):
+    """Переиндексирует места ids по текущим строкам places (удалённые — убирает)."""
+    ids = list(ids)
+    _remove(conn, KIND_PLACE, ids)
+    _add(conn, KIND_PLACE, _place_rows(conn, ids))
+
+
+def refresh_tours(conn, ids):
+    ids = list(ids)
+    _remove(conn, KIND_TOUR, ids)
+    _add(conn, KIND_TOUR, _tour_rows(conn, ids))
+
+
+def rebuild_fuzzy_index(conn, kinds=(KIND_PLACE, KIND_TOUR)):
+    for kind in kinds:
+        conn.execute("DELETE FROM fuzzy_trigrams WHERE kind = ?", (kind,))
+        conn.execute("DELETE FROM fuzzy_names WHERE kind = ?", (kind,))
+        rows = _place_rows(conn) if kind == KIND_PLACE else _tour_rows(conn)
+        _add(conn, kind, rows)
+
+
+def fuzzy_matches(conn, query, city_id=None, kinds=(KIND_PLACE, KIND_TOUR), limit=10):
+    """Лучшие совпадения [(kind, id, similarity)] по убыванию похожести.
+
+    similarity — доля триграмм запроса, найденных в названии (так короткий
+    запрос при наборе находит длинное название); при равенстве выше
+    названия, близкие по длине к запросу (мера Жаккара).
+
+    Чтобы не перебирать длинные списки частых триграмм, кандидаты берутся
+    только по самым редким триграммам запроса: название с похожестью не
+    ниже MIN_SIMILARITY обязано содержать хотя бы одну из них. Лучшие
+    кандидаты затем оцениваются точно по сохранённому тексту.
+    """
+    grams = trigrams(normalize(query))
+    if not grams or not kinds:
+        return []
+    scope = f"kind IN ({', '.join('?' * len(kinds))})"
+    scope_params = list(kinds)
+    if city_id is not None:
+        scope += " AND city_id = ?"
+        scope_params.append(city_id)
+
+    frequency = dict.fromkeys(grams, 0)
+    frequency.update(
+        conn.execute(
+            f"SELECT trigram, COUNT(*) FROM fuzzy_trigrams "
+            f"WHERE trigram IN ({', '.join('?' * len(grams))}) AND {scope} GROUP BY trigram",
+            list(grams) + scope_params,
+        )
+    )
+    required = math.ceil(MIN_SIMILARITY * len(grams))
+    probe = [gram for gram in sorted(grams, key=frequency.get)[: len(grams) - required + 1] if frequency[gram]]
+    if not probe:
+        return []
+    candidates = conn.execute(
+        f"""SELECT n.kind, n.ref_id, n.norm
+        FROM (
+            SELECT kind, ref_id FROM fuzzy_trigrams
+            WHERE trigram IN ({', '.join('?' * len(probe))}) AND {scope}
+            GROUP BY kind, ref_id
+            ORDER BY COUNT(*) DESC
+            LIMIT ?
+        ) c
+        JOIN fuzzy_names n ON n.kind = c.kind AND n.ref_id = c.ref_id""",
+        probe + scope_params + [max(CANDIDATES_PER_RESULT * limit, MIN_CANDIDATES)],
+    ).fetchall()
+
+    scored = []
+    for kind, ref_id, norm in candidates:
+        name_grams = trigrams(norm)
+        shared = len(grams & name_grams)
+        similarity = shared / len(grams)
+        if similarity >= MIN_SIMILARITY:
+            jaccard = shared / len(grams | name_grams)
+            scored.append((similarity, jaccard, kind, ref_id))
+    scored.sort(key=lambda item: (-item[0], -item[1], item[2], item[3]))
+    return [(kind, ref_id, similarity) for similarity, _jaccard, kind, ref_id in scored[:limit]]
@@ -0,0 +1,299 @@
+"""Массовая загрузка мест и туров в базу.
+
+Строки JSON нормализуются один раз (та же логика, что в insert_place и
+insert_tour_with_points), затем вставляются через executemany пачками по
+chunk_size строк. Если загрузка большая по сравнению с тем, что уже
+лежит в таблицах (или таблицы пусты, как при начальной загрузке),
+индексы загружаемых таблиц и триггеры полнотекстового поиска на время
+загрузки снимаются, а в конце строятся заново одним проходом; небольшой
+город в большой базе загружается с живыми индексами. Триграммный индекс названий (data/fuzzy.py) и R*Tree
+координат (data/spatial.py) обновляются после каждой пачки для
+загруженных id.
+"""
+import json
+import time
+from itertools import islice
+
+from data.fuzzy import KIND_PLACE, fuzzy_index_exists, rebuild_fuzzy_index, refresh_places, refresh_tours
+from data.migrations import create_indexes, drop_indexes
+from data.search import (
+    create_search_triggers,
+    drop_search_triggers,
+    rebuild_search_index,
+    search_index_exists,
+)
+from data.spatial import rebuild_spatial_index, refresh_spatial, spatial_index_exists
+
+
+INSERT_PLACE_SQL = """INSERT OR REPLACE INTO places
+    (id, name, name_ru, name_en, category,
+     description, description_ru, description_en,
+     short_desc, short_desc_ru, short_desc_en,
+     lat, lon, address, phone,
+     website, price, hours, rating, image_urls, city_id)
+    VALUES (:id, :name, :name_ru, :name_en, :category,
+            :description, :description_ru, :description_en,
+            :short_desc, :short_desc_ru, :short_desc_en,
+            :lat, :lon, :address, :phone,
+            :website, :price, :hours, :rating, :image_urls, :city_id)
+    """
+
+INSERT_TOUR_SQL = """INSERT OR REPLACE INTO tours
+    (id, title, description, theme, duration, distance, cover_image,
+     audio_intro, is_linear, rating, price, author_id, city_id)
+    VALUES (:id, :title, :description, :theme, :duration, :distance,
+            :cover_image, :audio_intro, :is_linear, :rating, :price,
+            :author_id, :city_id)
+    """
+
+INSERT_TOUR_POINT_SQL = """INSERT INTO tour_points
+    (tour_id, place_id, order_index, audio_story, quiz_question, image_urls)
+    VALUES (?, ?, ?, ?, ?, ?)"""
+
+IMPORT_TABLES = ("places", "tours", "tour_points")
+# Нужен самой загрузке: по нему удаляются старые точки перезаписываемых туров
+KEEP_INDEXES = ("idx_tour_points_tour",)
+# defer_indexes=None: индексы снимаются, когда загружено больше этой доли
+# строк, уже бывших в IMPORT_TABLES. Перестройка в конце проходит по всей
+# таблице, и для маленькой загрузки она дороже обновления индексов по ходу.
+DEFER_INDEXES_SHARE = 0.5
+
+
+def place_params(place):
+    """Параметры INSERT_PLACE_SQL для записи места из JSON."""
+    return {
+        "id": place.get("id"),
+        # Базовое имя для совместимости и ru/en-колонки для локализации
+        "name": place.get("name") or place.get("name_ru") or place.get("name_en"),
+        "name_ru": place.get("name_ru") or place.get("name"),
+        "name_en": place.get("name_en"),
+        "category": place.get("category"),
+        "description": place.get("description") or place.get("description_ru"),
+        "description_ru": place.get("description_ru") or place.get("description"),
+        "description_en": place.get("description_en"),
+        "short_desc": place.get("short_desc") or place.get("short_desc_ru"),
+        "short_desc_ru": place.get("short_desc_ru") or place.get("short_desc"),
+        "short_desc_en": place.get("short_desc_en"),
+        "lat": place.get("lat"),
+        "lon": place.get("lon"),
+        "address": place.get("address"),
+        "phone": place.get("phone"),
+        "website": place.get("website"),
+        "price": place.get("price"),
+        "hours": place.get("hours"),
+        "rating": place.get("rating"),
+        "image_urls": json.dumps(place.get("image_urls", []), ensure_ascii=False),
+        "city_id": place.get("city_id", 1),
+    }
+
+
+def tour_params(tour):
+    """Параметры INSERT_TOUR_SQL для записи тура из JSON."""
+    return {
+        "id": tour.get("id"),
+        "title": tour.get("title"),
+        "description": tour.get("description"),
+        "theme": tour.get("theme"),
+        "duration": tour.get("duration"),
+        "distance": tour.get("distance"),
+        "cover_image": tour.get("cover_image"),
+        "audio_intro": tour.get("audio_intro"),
+        "is_linear": tour.get("is_linear", 1),
+        "rating": tour.get("rating"),
+        "price": tour.get("price"),
+        "author_id": tour.get("author_id"),
+        "city_id": tour.get("city_id", 1),
+    }
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    return float(value)
+
+
+def normalize_place(place, city_id=None):
+    """Проверяет и нормализует место; ValueError, если запись непригодна."""
+    if not isinstance(place, dict):
+        raise ValueError("place must be an object")
+    if city_id is not None:
+        place = dict(place, city_id=city_id)
+    params = place_params(place)
+    if not params["name"]:
+        raise ValueError("place name is required")
+    try:
+        params["lat"] = _to_float(params["lat"])
+        params["lon"] = _to_float(params["lon"])
+        params["rating"] = _to_float(params["rating"])
+    except (TypeError, ValueError):
+        raise ValueError(f"bad numeric field in place {params['id']}")
+    return params
+
+
+def normalize_tour(tour, city_id=None):
+    """Возвращает (параметры тура, строки точек); ValueError для плохих записей."""
+    if not isinstance(tour, dict):
+        raise ValueError("tour must be an object")
+    if city_id is not None:
+        tour = dict(tour, city_id=city_id)
+    params = tour_params(tour)
+    if not params["title"] or params["id"] is None:
+        raise ValueError("tour id and title are required")
+    points = [
+        (
+            params["id"],
+            point.get("place_id"),
+            point.get("order_index"),
+            point.get("audio_story", "") or "",
+            point.get("quiz_question", "") or "",
+            json.dumps(point.get("image_urls", []) or [], ensure_ascii=False),
+        )
+        for point in tour.get("points") or []
+        if isinstance(point, dict)
+    ]
+    return params, points
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class BulkImporter:
+    """Загрузка мест и туров в базу через executemany.
+
+    chunk_size=None — всё одной транзакцией (читатели увидят город целиком
+    или не увидят вовсе); число — фиксация после каждой пачки, что
+    ограничивает размер журнала на очень больших загрузках.
+    progress(rows_done, rows_per_sec) вызывается после каждой пачки.
+
+    defer_indexes=True — снять индексы и триггеры поиска сразу, False —
+    не снимать, None — снять, как только загрузка перерастёт
+    DEFER_INDEXES_SHARE уже имеющихся строк (на пустой базе — сразу).
+    """
+
+    def __init__(self, conn, chunk_size=None, progress=None, defer_indexes=None):
+        self.conn = conn
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.defer_indexes = defer_indexes
+        self.stats = {"places": 0, "tours": 0, "tour_points": 0, "skipped": 0, "seconds": 0.0}
+        self._started = None
+        # Сколько строк загрузить до снятия индексов (None — не снимать)
+        self._defer_after = None
+        self._deferred = False
+        self._deferred_search = False
+        self._fuzzy = False
+        self._spatial = False
+        # Места загружены без id — индексы мест перестраиваются в конце
+        self._rebuild_place_indexes = False
+
+    def run(self, places=(), tours=(), city_id=None):
+        self._started = time.perf_counter()
+        self._defer_after = self._defer_threshold()
+        self._fuzzy = fuzzy_index_exists(self.conn)
+        self._spatial = spatial_index_exists(self.conn)
+        try:
+            batch = self.chunk_size or 1000
+            for chunk in _chunks(places, batch):
+                self._maybe_defer(len(chunk))
+                self._insert_places(chunk, city_id)
+                self._end_chunk()
+            for chunk in _chunks(tours, batch):
+                self._maybe_defer(len(chunk))
+                self._insert_tours(chunk, city_id)
+                self._end_chunk()
+        finally:
+            if self._deferred:
+                create_indexes(self.conn, IMPORT_TABLES)
+            if self._deferred_search:
+                create_search_triggers(self.conn)
+                rebuild_search_index(self.conn)
+            if self._rebuild_place_indexes:
+                if self._fuzzy:
+                    rebuild_fuzzy_index(self.conn, kinds=(KIND_PLACE,))
+                if self._spatial:
+                    rebuild_spatial_index(self.conn)
+        self.stats["seconds"] = time.perf_counter() - self._started
+        return self.stats
+
+    def _defer_threshold(self):
+        if self.defer_indexes is not None:
+            return 0 if self.defer_indexes else None
+        existing = sum(
+            self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in IMPORT_TABLES
+        )
+        return existing * DEFER_INDEXES_SHARE
+
+    def _maybe_defer(self, incoming):
+        """Снимает индексы и триггеры поиска, если с пачкой из incoming строк загрузка станет большой.
+
+        Строки, уже вставленные с живыми индексами, перестройка в конце
+        учтёт так же, как остальные.
+        """
+        if self._deferred or self._defer_after is None:
+            return
+        done = self.stats["places"] + self.stats["tours"] + self.stats["tour_points"]
+        if done + incoming < self._defer_after:
+            return
+        self._deferred = True
+        drop_indexes(self.conn, IMPORT_TABLES, keep=KEEP_INDEXES)
+        # До миграции с FTS (начальная загрузка) поискового индекса ещё нет
+        if search_index_exists(self.conn):
+            self._deferred_search = True
+            drop_search_triggers(self.conn)
+
+    def _insert_places(self, rows, city_id):
+        params = []
+        for place in rows:
+            try:
+                params.append(normalize_place(place, city_id))
+            except ValueError:
+                self.stats["skipped"] += 1
+        self.conn.executemany(INSERT_PLACE_SQL, params)
+        self.stats["places"] += len(params)
+        if (self._fuzzy or self._spatial) and not self._rebuild_place_indexes:
+            ids = [place["id"] for place in params]
+            if None in ids:
+                # id выдаст SQLite, узнать их из executemany нельзя — в конце перестроим
+                self._rebuild_place_indexes = True
+                return
+            if self._fuzzy:
+                refresh_places(self.conn, ids)
+            if self._spatial:
+                refresh_spatial(self.conn, ids)
+
+    def _insert_tours(self, rows, city_id):
+        tours = []
+        points = []
+        for tour in rows:
+            try:
+                params, tour_points = normalize_tour(tour, city_id)
+            except ValueError:
+                self.stats["skipped"] += 1
+                continue
+            tours.append(params)
+            points.extend(tour_points)
+        self.conn.executemany(INSERT_TOUR_SQL, tours)
+        # Повторный импорт заменяет маршрут тура, а не дописывает точки в конец
+        self.conn.executemany(
+            "DELETE FROM tour_points WHERE tour_id = ?",
+            [(params["id"],) for params in tours],
+        )
+        self.conn.executemany(INSERT_TOUR_POINT_SQL, points)
+        self.stats["tours"] += len(tours)
+        if self._fuzzy:
+            refresh_tours(self.conn, [params["id"] for params in tours])
+        self.stats["tour_points"] += len(points)
+
+    def _end_chunk(self):
+        if self.chunk_size:
+            self.conn.commit()
+        if self.progress is not None:
+            done = self.stats["places"] + self.stats["tours"] + self.stats["tour_points"]
+            elapsed = time.perf_counter() - self._started
+            self.progress(done, done / elapsed if elapsed > 0 else 0.0)
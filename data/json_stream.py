@@ -0,0 +1,111 @@
+"""Потоковое чтение больших places_<id>.json / tours_<id>.json.
+
+Файл читается кусками фиксированного размера, элементы массива отдаются по
+одному, поэтому в памяти одновременно находятся только текущий кусок и
+текущая запись — независимо от размера файла. Поддерживается и вариант
+JSON Lines (.jsonl): одна запись на строку.
+"""
+import json
+import os
+
+
+READ_SIZE = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def _skip_whitespace(buf, pos):
+    while pos < len(buf) and buf[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+
+def iter_json_array(fp, read_size=READ_SIZE):
+    """Отдаёт элементы JSON-массива верхнего уровня из текстового потока fp."""
+    buf = fp.read(read_size)
+    # BOM, который иногда оставляют редакторы на Windows
+    pos = 1 if buf[:1] == "\ufeff" else 0
+    pos = _skip_whitespace(buf, pos)
+    while pos >= len(buf) and buf:
+        buf = fp.read(read_size)
+        pos = _skip_whitespace(buf, 0)
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("expected a JSON array")
+    pos += 1
+    expect_value = True
+    eof = False
+
+    while True:
+        pos = _skip_whitespace(buf, pos)
+        if pos >= len(buf):
+            buf = fp.read(read_size)
+            pos = 0
+            if not buf:
+                raise ValueError("unexpected end of JSON array")
+            continue
+
+        char = buf[pos]
+        if char == "]":
+            return
+        if not expect_value:
+            if char != ",":
+                raise ValueError(f"expected ',' or ']' in JSON array, got {char!r}")
+            pos += 1
+            expect_value = True
+            continue
+
+        try:
+            value, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError:
+            value, end = None, -1
+        # Элемент мог быть обрезан границей куска (например, число "-1." от
+        # "-1.5"), поэтому принимаем его, только если за ним видно ',' или ']'
+        complete = False
+        if end >= 0:
+            after = _skip_whitespace(buf, end)
+            complete = after < len(buf) and buf[after] in ",]"
+        if not complete and not eof:
+            chunk = fp.read(read_size)
+            if chunk:
+                buf = buf[pos:] + chunk
+                pos = 0
+            else:
+                eof = True
+            continue
+        if end < 0:
+            raise ValueError("malformed or truncated JSON array element")
+
+        yield value
+        pos = end
+        expect_value = False
+        # Отбрасываем уже разобранную часть, чтобы буфер не рос
+        if pos > read_size:
+            buf = buf[pos:]
+            pos = 0
+
+
+def iter_json_lines(fp):
+    """Отдаёт записи JSON Lines, пустые строки пропускаются."""
+    for line in fp:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_records(path, read_size=READ_SIZE):
+    """Записи из .json (массив) или .jsonl (по одной на строку) файла."""
+    with open(path, "r", encoding="utf-8") as fp:
+        if path.endswith(".jsonl"):
+            yield from iter_json_lines(fp)
+        else:
+            yield from iter_json_array(fp, read_size)
+
+
+def find_data_file(base_dir, stem):
+    """Путь к stem.json или stem.jsonl в base_dir, либо None."""
+    for ext in (".json", ".jsonl"):
+        path = os.path.join(base_dir, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
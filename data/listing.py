@@ -0,0 +1,66 @@
+"""Локализованные колонки мест и сортировки списка мест.
+
+Выражения здесь общие для запросов DataManager и индексов из
+data/migrations.py: индекс по выражению SQLite использует только для
+запроса с тем же выражением, поэтому собирать их нужно в одном месте.
+"""
+
+
+# Категории мест, для которых в интерфейсе есть фильтры
+PLACE_CATEGORIES = ("sight", "food", "museum")
+
+SORT_RATING = "rating"
+SORT_NAME = "name"
+# По расстоянию от текущего положения: не SQL-сортировка, а DataManager.nearest_places
+SORT_NEARBY = "nearby"
+# Сортировка -> порядок; при равных значениях дальше по возрастанию id
+SORT_ORDERS = {SORT_RATING: "DESC", SORT_NAME: "ASC"}
+# Языки, для которых есть индексы сортировки по названию
+LISTING_LANGUAGES = ("ru", "en")
+
+
+def localized_expression(field, lang, table=None):
+    """COALESCE-цепочка для локализованного поля места.
+
+    Для en: field_en, field_ru, field; для остальных языков: field_ru, field.
+    Пустые строки пропускаются так же, как NULL. table — префикс колонок
+    для запросов с JOIN.
+    """
+    prefix = f"{table}." if table else ""
+    variants = [f"{field}_en", f"{field}_ru"] if lang == "en" else [f"{field}_ru"]
+    chain = ", ".join(f"NULLIF({prefix}{column}, '')" for column in variants)
+    return f"COALESCE({chain}, {prefix}{field}, '')"
+
+
+def localized_column(field, lang, table=None, alias=None):
+    """localized_expression с псевдонимом (по умолчанию field)."""
+    return f"{localized_expression(field, lang, table)} AS {alias or field}"
+
+
+def sort_expression(sort, lang):
+    """Ключ сортировки списка мест; ValueError для неизвестной сортировки.
+
+    Места без рейтинга идут как с рейтингом 0 (как раньше при сортировке
+    в Python). Названия сравниваются посимвольно (BINARY): SQLite без ICU
+    не знает регистра кириллицы.
+    """
+    if sort == SORT_RATING:
+        return "IFNULL(rating, 0)"
+    if sort == SORT_NAME:
+        return localized_expression("name", "en" if lang == "en" else "ru")
+    raise ValueError(f"unknown sort: {sort}")
+
+
+def listing_indexes():
+    """Индексы под get_places_page: (имя, таблица, SQL) в формате INDEXES.
+
+    На каждую сортировку (и язык для сортировки по названию) два индекса:
+    город + ключ и город + категория + ключ, оба заканчиваются id, так что
+    страница читается из индекса по порядку, без сортировки.
+    """
+    variants = [(SORT_RATING, "ru", "rating")] + [(SORT_NAME, lang, f"name_{lang}") for lang in LISTING_LANGUAGES]
+    for sort, lang, suffix in variants:
+        key = f"{sort_expression(sort, lang)} {SORT_ORDERS[sort]}"
+        for scope, columns in (("city", "city_id"), ("city_category", "city_id, category")):
+            name = f"idx_places_{scope}_{suffix}"
+            yield name, "places", f"CREATE INDEX IF NOT EXISTS {name} ON places({columns}, {key}, id)"
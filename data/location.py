@@ -0,0 +1,286 @@
+"""Положение пользователя: записанные треки, сглаживание, частота опроса, геозоны.
+
+Здесь только вычисления без Kivy; источники положения (plyer на
+устройстве, проигрывание трека на компьютере) и рассылка подписчикам —
+в utils/location_service.py.
+
+Fix — одно измерение: координаты, точность (радиус в метрах, None —
+неизвестна), скорость в м/с (None — неизвестна) и время в секундах Unix.
+"""
+import csv
+import math
+import os
+from collections import namedtuple
+from datetime import datetime
+from xml.etree import ElementTree
+
+from data.spatial import EARTH_RADIUS_M, haversine_m
+
+
+Fix = namedtuple("Fix", "lat lon accuracy speed time")
+
+# Точность, если источник её не сообщил (типичный GPS телефона на улице)
+DEFAULT_ACCURACY_M = 15.0
+# Насколько резко может меняться скорость (м/с²) — «шум процесса» фильтра
+SMOOTHING_ACCELERATION = 0.5
+# Измерение дальше стольких стандартных отклонений от предсказания — выброс;
+# после стольких выбросов подряд фильтр начинает заново с нового измерения
+GATE_SIGMAS = 3.0
+MAX_REJECTED_FIXES = 3
+# Интервалы опроса источника по скорости: (скорость до, м/с; интервал, с)
+SAMPLING_STEPS = ((0.5, 10.0), (2.5, 3.0), (math.inf, 1.0))
+# Выход из геозоны — на этой доле радиуса дальше входа, чтобы шум
+# координат на границе не давал череду входов и выходов
+GEOFENCE_EXIT_FACTOR = 1.25
+
+
+def read_track(path):
+    """Fix по порядку из трека GPX или CSV (по расширению файла)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".gpx":
+        return read_gpx(path)
+    if ext == ".csv":
+        return read_csv(path)
+    raise ValueError(f"unsupported track format: {ext}")
+
+
+def _parse_time(value):
+    """Секунды Unix из числа или ISO 8601 (в том числе с Z на конце); None — не распознано."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value.strip().replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def _fill_times(points):
+    """Точкам без времени — по секунде после предыдущей (треки, нарисованные вручную)."""
+    fixes = []
+    previous = None
+    for lat, lon, accuracy, speed, moment in points:
+        if moment is None:
+            moment = 0.0 if previous is None else previous + 1.0
+        fixes.append(Fix(lat, lon, accuracy, speed, moment))
+        previous = moment
+    return fixes
+
+
+def read_gpx(path):
+    """Точки трека (trkpt), а если их нет — маршрута (rtept) или путевые точки (wpt)."""
+    found = {"trkpt": [], "rtept": [], "wpt": []}
+    for _event, element in ElementTree.iterparse(path):
+        tag = element.tag.rsplit("}", 1)[-1]
+        if tag not in found:
+            continue
+        moment = accuracy = speed = None
+        for child in element:
+            name = child.tag.rsplit("}", 1)[-1]
+            if name == "time":
+                moment = _parse_time(child.text)
+            elif name == "hdop":
+                # HDOP безразмерный; примерно 5 м на единицу у телефонных приёмников
+                hdop = _float_or_none(child.text)
+                accuracy = hdop * 5.0 if hdop is not None else None
+            elif name == "speed":
+                speed = _float_or_none(child.text)
+        found[tag].append((float(element.get("lat")), float(element.get("lon")), accuracy, speed, moment))
+        element.clear()
+    return _fill_times(found["trkpt"] or found["rtept"] or found["wpt"])
+
+
+# Допустимые названия колонок CSV
+_CSV_COLUMNS = {
+    "lat": ("lat", "latitude"),
+    "lon": ("lon", "lng", "longitude"),
+    "accuracy": ("accuracy", "acc", "hacc"),
+    "speed": ("speed",),
+    "time": ("time", "timestamp", "ts"),
+}
+
+
+def read_csv(path):
+    """CSV с заголовком: lat, lon и необязательные time, accuracy, speed (порядок любой)."""
+    with open(path, newline="", encoding="utf-8") as fp:
+        reader = csv.DictReader(fp)
+        fields = {name.strip().lower(): name for name in reader.fieldnames or ()}
+        columns = {}
+        for key, aliases in _CSV_COLUMNS.items():
+            columns[key] = next((fields[alias] for alias in aliases if alias in fields), None)
+        if columns["lat"] is None or columns["lon"] is None:
+            raise ValueError("CSV track needs lat and lon columns")
+        points = []
+        for row in reader:
+            lat = _float_or_none(row.get(columns["lat"]))
+            lon = _float_or_none(row.get(columns["lon"]))
+            if lat is None or lon is None:
+                continue
+            points.append(
+                (
+                    lat,
+                    lon,
+                    _float_or_none(row.get(columns["accuracy"])) if columns["accuracy"] else None,
+                    _float_or_none(row.get(columns["speed"])) if columns["speed"] else None,
+                    _parse_time(row.get(columns["time"])) if columns["time"] else None,
+                )
+            )
+    return _fill_times(points)
+
+
+class _Axis:
+    """Положение и скорость вдоль одной оси (метры от начала отсчёта) с ковариацией."""
+
+    __slots__ = ("position", "velocity", "p00", "p01", "p11")
+
+    def __init__(self, position, variance):
+        self.position = position
+        self.velocity = 0.0
+        # Скорость поначалу неизвестна: дисперсия как у пешехода (2 м/с)²
+        self.p00, self.p01, self.p11 = variance, 0.0, 4.0
+
+    def predict(self, dt, acceleration):
+        q = acceleration * acceleration
+        self.position += self.velocity * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt ** 4 / 4
+        self.p01 += dt * self.p11 + q * dt ** 3 / 2
+        self.p11 += q * dt * dt
+
+    def correct(self, measured, variance):
+        total = self.p00 + variance
+        gain_position = self.p00 / total
+        gain_velocity = self.p01 / total
+        residual = measured - self.position
+        self.position += gain_position * residual
+        self.velocity += gain_velocity * residual
+        self.p11 -= gain_velocity * self.p01
+        self.p00 *= 1 - gain_position
+        self.p01 *= 1 - gain_position
+
+    def copy(self):
+        axis = _Axis(self.position, self.p00)
+        axis.velocity, axis.p01, axis.p11 = self.velocity, self.p01, self.p11
+        return axis
+
+
+class FixSmoother:
+    """Сглаживание координат фильтром Калмана «положение + скорость» по двум осям.
+
+    Координаты переводятся в метры от первого измерения (на север и на
+    восток), измерение входит с дисперсией из своей точности: точные
+    сдвигают положение сильно, грубые — слабо, а скорость, оценённая
+    фильтром, позволяет не отставать от идущего или едущего пользователя.
+    Измерение дальше GATE_SIGMAS стандартных отклонений от предсказания
+    считается выбросом и пропускается; если выбросы идут подряд
+    (MAX_REJECTED_FIXES), ошибалось само положение, и фильтр начинает
+    заново. Скорость в Fix — от источника, а без неё — оценка фильтра.
+    """
+
+    def __init__(self, acceleration=SMOOTHING_ACCELERATION):
+        self.acceleration = acceleration
+        self.reset()
+
+    def reset(self):
+        self.fix = None
+        self._axes = None
+        self._origin = None
+        self._rejected = 0
+
+    def update(self, fix):
+        """Сглаженный Fix по новому измерению или None, если измерение отброшено."""
+        accuracy = fix.accuracy if fix.accuracy and fix.accuracy > 0 else DEFAULT_ACCURACY_M
+        variance = accuracy * accuracy
+        if self.fix is None or self._rejected >= MAX_REJECTED_FIXES:
+            self._rejected = 0
+            self._origin = (fix.lat, fix.lon, math.cos(math.radians(fix.lat)))
+            self._axes = (_Axis(0.0, variance), _Axis(0.0, variance))
+            self.fix = Fix(fix.lat, fix.lon, accuracy, fix.speed, fix.time)
+            return self.fix
+        lat0, lon0, cos0 = self._origin
+        measured = (
+            math.radians(fix.lat - lat0) * EARTH_RADIUS_M,
+            math.radians(fix.lon - lon0) * EARTH_RADIUS_M * cos0,
+        )
+        dt = max(fix.time - self.fix.time, 0.0)
+        axes = tuple(axis.copy() for axis in self._axes)
+        distance2 = 0.0
+        for axis, value in zip(axes, measured):
+            axis.predict(dt, self.acceleration)
+            distance2 += (value - axis.position) ** 2 / (axis.p00 + variance)
+        if distance2 > 2 * GATE_SIGMAS * GATE_SIGMAS:
+            self._rejected += 1
+            return None
+        self._rejected = 0
+        for axis, value in zip(axes, measured):
+            axis.correct(value, variance)
+        self._axes = axes
+        north, east = axes
+        speed = fix.speed if fix.speed is not None else math.hypot(north.velocity, east.velocity)
+        self.fix = Fix(
+            lat0 + math.degrees(north.position / EARTH_RADIUS_M),
+            lon0 + math.degrees(east.position / (EARTH_RADIUS_M * cos0)),
+            math.sqrt((north.p00 + east.p00) / 2),
+            speed,
+            fix.time,
+        )
+        return self.fix
+
+
+def sampling_interval(speed):
+    """Интервал опроса источника (с) для скорости speed (м/с; None — как пешеход)."""
+    if speed is None:
+        speed = 1.0
+    for limit, interval in SAMPLING_STEPS:
+        if speed < limit:
+            return interval
+    return SAMPLING_STEPS[-1][1]
+
+
+class GeofenceSet:
+    """Круглые геозоны с событиями входа и выхода.
+
+    update(fix) возвращает [("enter" | "exit", key)] для зон, состояние
+    которых изменилось. Вход — центр зоны ближе radius_m, выход — дальше
+    radius_m · GEOFENCE_EXIT_FACTOR.
+    """
+
+    def __init__(self):
+        self._zones = {}
+        self._inside = set()
+
+    def add(self, key, lat, lon, radius_m):
+        self._zones[key] = (lat, lon, radius_m)
+
+    def remove(self, key):
+        self._zones.pop(key, None)
+        self._inside.discard(key)
+
+    def clear(self):
+        self._zones.clear()
+        self._inside.clear()
+
+    def __len__(self):
+        return len(self._zones)
+
+    def update(self, fix):
+        events = []
+        for key, (lat, lon, radius_m) in self._zones.items():
+            distance = haversine_m(lat, lon, fix.lat, fix.lon)
+            if key in self._inside:
+                if distance > radius_m * GEOFENCE_EXIT_FACTOR:
+                    self._inside.discard(key)
+                    events.append(("exit", key))
+            elif distance <= radius_m:
+                self._inside.add(key)
+                events.append(("enter", key))
+        return events
@@ -0,0 +1,167 @@
+"""Версионированные миграции схемы базы данных.
+
+Номер последней применённой миграции хранится в PRAGMA user_version.
+При старте DataManager сравнивает его с SCHEMA_VERSION: если база уже
+актуальна, никакие ALTER/UPDATE/проверки не выполняются.
+
+Каждая миграция — функция, принимающая DataManager. Миграции должны быть
+идемпотентными: база, созданная старой версией приложения, имеет
+user_version = 0, но уже содержит часть таблиц и колонок.
+"""
+from data.fuzzy import create_fuzzy_index
+from data.listing import listing_indexes
+from data.search import create_search_index
+from data.spatial import create_spatial_index
+
+
+def _migration_1_base_schema(dm):
+    """Базовые таблицы и все колонки, добавленные до появления миграций."""
+    dm._create_tables()
+    dm._ensure_tour_points_images_column()
+    dm._ensure_city_schema()
+
+
+def _migration_2_seed_data(dm):
+    """Начальные данные: встроенный админ, список городов, места и туры."""
+    dm._ensure_admin_user()
+    dm._ensure_cities_loaded()
+    dm._ensure_places_loaded()
+    dm._ensure_tours_loaded()
+
+
+# Вторичные индексы под все пути доступа DataManager: (имя, таблица, SQL).
+# Держим их одним списком, чтобы массовая загрузка могла временно снять
+# индексы и построить их заново одним проходом.
+INDEXES = [
+    ("idx_places_city", "places", "CREATE INDEX IF NOT EXISTS idx_places_city ON places(city_id)"),
+    ("idx_tours_city", "tours", "CREATE INDEX IF NOT EXISTS idx_tours_city ON tours(city_id)"),
+    (
+        "idx_tour_points_tour",
+        "tour_points",
+        "CREATE INDEX IF NOT EXISTS idx_tour_points_tour ON tour_points(tour_id, order_index)",
+    ),
+    (
+        "idx_tour_points_place",
+        "tour_points",
+        "CREATE INDEX IF NOT EXISTS idx_tour_points_place ON tour_points(place_id)",
+    ),
+    (
+        "idx_favorites_user_place",
+        "favorites",
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_favorites_user_place ON favorites(user_id, place_id)",
+    ),
+    (
+        "idx_favorites_place",
+        "favorites",
+        "CREATE INDEX IF NOT EXISTS idx_favorites_place ON favorites(place_id)",
+    ),
+    (
+        "idx_reviews_place",
+        "reviews",
+        "CREATE INDEX IF NOT EXISTS idx_reviews_place ON reviews(place_id)",
+    ),
+    (
+        "idx_user_tours_tour",
+        "user_tours",
+        "CREATE INDEX IF NOT EXISTS idx_user_tours_tour ON user_tours(tour_id)",
+    ),
+    (
+        "idx_user_cities_user",
+        "user_cities",
+        "CREATE INDEX IF NOT EXISTS idx_user_cities_user ON user_cities(user_id, city_id)",
+    ),
+    (
+        "idx_support_messages_user",
+        "support_messages",
+        "CREATE INDEX IF NOT EXISTS idx_support_messages_user ON support_messages(user_id)",
+    ),
+    # Сортировки списка мест (get_places_page)
+    *listing_indexes(),
+]
+
+
+def _selected(tables, keep=()):
+    for name, table, sql in INDEXES:
+        if (tables is None or table in tables) and name not in keep:
+            yield name, sql
+
+
+def create_indexes(conn, tables=None):
+    for _name, sql in _selected(tables):
+        conn.execute(sql)
+
+
+def drop_indexes(conn, tables=None, keep=()):
+    for name, _sql in _selected(tables, keep):
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+def _migration_3_indexes(dm):
+    """Вторичные индексы; перед уникальным индексом убираем дубли избранного."""
+    dm.conn.execute(
+        "DELETE FROM favorites WHERE rowid NOT IN "
+        "(SELECT MIN(rowid) FROM favorites GROUP BY user_id, place_id)"
+    )
+    create_indexes(dm.conn)
+
+
+def _migration_4_full_text_search(dm):
+    """FTS5-индекс мест и туров с триггерами синхронизации (data/search.py)."""
+    create_search_index(dm.conn)
+
+
+def _migration_5_fuzzy_names(dm):
+    """Триграммный индекс названий для нечёткого поиска (data/fuzzy.py)."""
+    create_fuzzy_index(dm.conn)
+
+
+def _migration_6_listing_indexes(dm):
+    """Составные индексы для постраничного списка мест (data/listing.py)."""
+    create_indexes(dm.conn, tables=("places",))
+
+
+def _migration_7_spatial_index(dm):
+    """R*Tree по координатам мест для запросов по области карты (data/spatial.py)."""
+    create_spatial_index(dm.conn)
+
+
+# (номер, описание, функция). Номера идут подряд, новые добавляются в конец.
+MIGRATIONS = [
+    (1, "base schema", _migration_1_base_schema),
+    (2, "seed data", _migration_2_seed_data),
+    (3, "secondary indexes", _migration_3_indexes),
+    (4, "full-text search", _migration_4_full_text_search),
+    (5, "fuzzy name index", _migration_5_fuzzy_names),
+    (6, "place listing indexes", _migration_6_listing_indexes),
+    (7, "place spatial index", _migration_7_spatial_index),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def apply_migrations(dm):
+    """Применяет к базе dm.conn все миграции новее текущей user_version.
+
+    Возвращает список номеров применённых миграций (пустой, если база
+    уже актуальна). Версия записывается после каждой успешной миграции,
+    поэтому прерванный запуск продолжится с того же места.
+    """
+    conn = dm.conn
+    version = get_schema_version(conn)
+    if version >= SCHEMA_VERSION:
+        return []
+
+    applied = []
+    for number, _name, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        migration(dm)
+        # PRAGMA не поддерживает параметры, number — целое из MIGRATIONS
+        conn.execute(f"PRAGMA user_version = {int(number)}")
+        conn.commit()
+        applied.append(number)
+    return applied
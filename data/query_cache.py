@@ -0,0 +1,68 @@
+"""Кэш результатов запросов DataManager с версиями таблиц.
+
+Запись кэша помечена таблицами, из которых она прочитана, и версиями этих
+таблиц на момент чтения. Изменяющие методы DataManager после фиксации
+увеличивают версии своих таблиц (bump), и все зависящие записи перестают
+совпадать — без явного обхода кэша. Размер ограничен, вытесняется давно
+не использованная запись (LRU).
+"""
+import threading
+from collections import OrderedDict
+
+
+class QueryCache:
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stamp(self, tables):
+        """Версии таблиц; снимается до выполнения запроса и передаётся в put."""
+        with self._lock:
+            return tuple(self._versions.get(table, 0) for table in tables)
+
+    def get(self, key, tables):
+        """(True, значение) при попадании, иначе (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stamp, value = entry
+                if stamp == tuple(self._versions.get(table, 0) for table in tables):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def put(self, key, stamp, value):
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def bump(self, tables):
+        """Помечает таблицы изменёнными: зависящие записи больше не совпадут."""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+            }
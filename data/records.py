@@ -0,0 +1,122 @@
+"""Компактные записи мест, туров и точек маршрута.
+
+Геттеры DataManager раньше строили dict на каждую строку. Запись хранит
+кортеж строки из курсора как есть и ссылку на общий для всего запроса
+словарь «имя колонки -> индекс», поэтому 100 тысяч мест не означают
+100 тысяч словарей. Интерфейс чтения тот же, что у dict (get, [], in,
+keys/items), а dict(record) даёт обычный словарь там, где он нужен
+(например, для DictProperty экранов).
+
+image_urls хранится в базе JSON-строкой; запись отдаёт уже список и
+декодирует его один раз, при первом обращении.
+"""
+import json
+
+
+_NOT_LOADED = object()
+
+
+def column_index(cursor):
+    """Словарь «имя колонки -> индекс» для результата cursor."""
+    return {column[0]: index for index, column in enumerate(cursor.description)}
+
+
+def decode_image_urls(raw):
+    """Список ссылок из значения колонки image_urls (JSON-строка или список)."""
+    if isinstance(raw, (list, tuple)):
+        return list(raw)
+    if not raw:
+        return []
+    try:
+        urls = json.loads(raw)
+    except (TypeError, ValueError):
+        return []
+    return urls if isinstance(urls, list) else []
+
+
+class Record:
+    __slots__ = ("_columns", "_row", "_image_urls")
+
+    def __init__(self, columns, row):
+        self._columns = columns
+        self._row = row
+        self._image_urls = _NOT_LOADED
+
+    @classmethod
+    def fetch_all(cls, cursor):
+        columns = column_index(cursor)
+        return [cls(columns, row) for row in cursor.fetchall()]
+
+    @classmethod
+    def fetch_one(cls, cursor):
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        return cls(column_index(cursor), row)
+
+    @property
+    def image_urls(self):
+        if self._image_urls is _NOT_LOADED:
+            index = self._columns.get("image_urls")
+            self._image_urls = decode_image_urls(self._row[index] if index is not None else None)
+        return self._image_urls
+
+    def __getitem__(self, key):
+        index = self._columns[key]
+        if key == "image_urls":
+            return self.image_urls
+        return self._row[index]
+
+    def get(self, key, default=None):
+        index = self._columns.get(key)
+        if index is None:
+            return default
+        if key == "image_urls":
+            return self.image_urls
+        return self._row[index]
+
+    def __contains__(self, key):
+        return key in self._columns
+
+    def __iter__(self):
+        return iter(self._columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def keys(self):
+        return self._columns.keys()
+
+    def values(self):
+        return [self[key] for key in self._columns]
+
+    def items(self):
+        return [(key, self[key]) for key in self._columns]
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self.items())!r})"
+
+
+class Place(Record):
+    __slots__ = ()
+
+
+class Tour(Record):
+    __slots__ = ()
+
+
+class TourPoint(Record):
+    __slots__ = ()
+
+
+class SearchHit(Record):
+    """Результат поиска: kind ("place"/"tour"), id, title, snippet, rank."""
+
+    __slots__ = ()
@@ -0,0 +1,151 @@
+"""Полнотекстовый поиск по местам и турам (SQLite FTS5).
+
+places_fts и tours_fts — FTS5-таблицы с внешним содержимым: текст
+хранится только в places/tours, в индексе — токены. Синхронизацию
+выполняют триггеры. Массовая загрузка их временно снимает и в конце
+перестраивает индекс одним проходом (rebuild), как и обычные индексы.
+
+Про INSERT OR REPLACE: при замене строки SQLite не вызывает DELETE-триггеры
+(recursive_triggers выключен), поэтому старые токены убирает отдельный
+BEFORE INSERT триггер.
+"""
+import re
+
+
+PLACE_TEXT_COLUMNS = (
+    "name",
+    "name_ru",
+    "name_en",
+    "short_desc",
+    "short_desc_ru",
+    "short_desc_en",
+    "description",
+    "description_ru",
+    "description_en",
+)
+TOUR_TEXT_COLUMNS = ("title", "description")
+PLACE_NAME_COLUMNS = ("name", "name_ru", "name_en")
+
+# Веса bm25 в порядке колонок: совпадение в названии важнее, чем в описании
+PLACE_WEIGHTS = (10.0, 10.0, 10.0, 4.0, 4.0, 4.0, 1.0, 1.0, 1.0)
+TOUR_WEIGHTS = (10.0, 1.0)
+
+# unicode61 приводит кириллицу к нижнему регистру и убирает диакритику (ё -> е);
+# префиксные индексы ускоряют запросы вида "кре*" при наборе текста
+_FTS_OPTIONS = "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'"
+
+# Таблица -> (FTS-таблица, текстовые колонки)
+FTS_TABLES = {
+    "places": ("places_fts", PLACE_TEXT_COLUMNS),
+    "tours": ("tours_fts", TOUR_TEXT_COLUMNS),
+}
+
+# Максимум слов из строки поиска, остальное отбрасывается
+MAX_QUERY_TERMS = 8
+
+
+def place_search_columns(lang):
+    """Колонки places_fts, по которым ищем для языка lang (и базовые без суффикса)."""
+    suffix = "_en" if lang == "en" else "_ru"
+    return [f"{field}{suffix}" for field in ("name", "short_desc", "description")] + [
+        "name",
+        "short_desc",
+        "description",
+    ]
+
+
+def _triggers(table, fts, columns):
+    cols = ", ".join(columns)
+    new = ", ".join(f"new.{c}" for c in columns)
+    old = ", ".join(f"old.{c}" for c in columns)
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in columns)
+    return [
+        (
+            f"{fts}_before_insert",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_before_insert BEFORE INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols})
+                SELECT 'delete', id, {cols} FROM {table} WHERE id = new.id;
+            END""",
+        ),
+        (
+            f"{fts}_after_insert",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_after_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+        ),
+        (
+            f"{fts}_after_delete",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_after_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+            END""",
+        ),
+        (
+            f"{fts}_after_update",
+            f"""CREATE TRIGGER IF NOT EXISTS {fts}_after_update AFTER UPDATE ON {table}
+            WHEN old.id IS NOT new.id OR {changed}
+            BEGIN
+                INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old});
+                INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new});
+            END""",
+        ),
+    ]
+
+
+def _selected(tables):
+    for table, (fts, columns) in FTS_TABLES.items():
+        if tables is None or table in tables:
+            yield table, fts, columns
+
+
+def create_search_index(conn, tables=None):
+    """FTS-таблицы и триггеры; индекс заполняется из текущих данных."""
+    for table, fts, columns in _selected(tables):
+        conn.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+            f"{', '.join(columns)}, content = '{table}', content_rowid = 'id', {_FTS_OPTIONS})"
+        )
+    create_search_triggers(conn, tables)
+    rebuild_search_index(conn, tables)
+
+
+def search_index_exists(conn):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'places_fts'"
+    ).fetchone()
+    return row is not None
+
+
+def create_search_triggers(conn, tables=None):
+    for table, fts, columns in _selected(tables):
+        for _name, sql in _triggers(table, fts, columns):
+            conn.execute(sql)
+
+
+def drop_search_triggers(conn, tables=None):
+    for table, fts, columns in _selected(tables):
+        for name, _sql in _triggers(table, fts, columns):
+            conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+
+def rebuild_search_index(conn, tables=None):
+    for _table, fts, _columns in _selected(tables):
+        conn.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+
+
+def match_expression(query, columns=None):
+    """Строка поиска пользователя -> безопасное выражение FTS5 MATCH.
+
+    Каждое слово ищется как префикс ("кремл" найдёт «Кремль»), все слова
+    должны встретиться. Операторы и кавычки FTS5 из ввода не пропускаются.
+    Возвращает None, если в запросе нет ни одного слова.
+    """
+    terms = re.findall(r"\w+", (query or "").lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    expression = " ".join(f'"{term}"*' for term in terms)
+    if columns:
+        expression = "{" + " ".join(columns) + "} : (" + expression + ")"
+    return expression
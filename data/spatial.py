@@ -0,0 +1,185 @@
+"""Пространственный индекс мест (SQLite R*Tree).
+
+places.lat/lon — обычные REAL-колонки, и вопрос «что попадает в экран»
+без индекса — полный проход по таблице. place_rtree хранит каждое место
+с координатами как вырожденный прямоугольник (min = max) и отвечает на
+запрос по прямоугольнику за O(log n + ответ).
+
+Во вспомогательных колонках лежат city_id, category и rating: фильтры и
+выбор лучших мест выполняются по самому R*Tree, а строки places читаются
+только для того, что попадёт в ответ.
+
+R*Tree хранит координаты во float32 и округляет их наружу. Место, чей
+прямоугольник целиком внутри запроса, точно в нём; только для мест на
+самой границе запроса координаты сверяются с places.lat/lon. Места без
+координат в индекс не попадают. Как и нечёткий индекс (data/fuzzy.py),
+place_rtree обновляет DataManager (refresh_spatial после изменения
+строк), а массовая загрузка — после каждой пачки.
+
+Ближайшие места (nearest_places у DataManager) ищутся так же по R*Tree:
+кандидаты из прямоугольника вокруг круга радиуса r, точное расстояние —
+по формуле гаверсинусов; r удваивается, пока в круге не окажется k мест.
+Прочитанные места хранит NearbyWindow, и пока точка сдвигается в пределах
+запаса окна, ответ считается в памяти, без запросов к базе.
+"""
+import heapq
+import math
+
+
+EARTH_RADIUS_M = 6371008.8
+# Круг такого радиуса накрывает всю Землю
+HALF_CIRCUMFERENCE_M = math.pi * EARTH_RADIUS_M
+
+
+def create_spatial_index(conn):
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS place_rtree "
+        "USING rtree(id, min_lat, max_lat, min_lon, max_lon, +city_id, +category, +rating)"
+    )
+    rebuild_spatial_index(conn)
+
+
+def spatial_index_exists(conn):
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'place_rtree'"
+    ).fetchone()
+    return row is not None
+
+
+_INSERT_SQL = """INSERT INTO place_rtree (id, min_lat, max_lat, min_lon, max_lon, city_id, category, rating)
+    SELECT id, lat, lat, lon, lon, city_id, category, rating FROM places
+    WHERE lat IS NOT NULL AND lon IS NOT NULL"""
+
+
+def refresh_spatial(conn, ids):
+    """Переиндексирует места ids по текущим строкам places (удалённые — убирает)."""
+    ids = list(ids)
+    # Не больше 500 параметров на запрос
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        marks = ", ".join("?" * len(chunk))
+        conn.execute(f"DELETE FROM place_rtree WHERE id IN ({marks})", chunk)
+        conn.execute(f"{_INSERT_SQL} AND id IN ({marks})", chunk)
+
+
+def rebuild_spatial_index(conn):
+    conn.execute("DELETE FROM place_rtree")
+    # По порядку координат соседние места попадают в соседние узлы дерева
+    conn.execute(f"{_INSERT_SQL} ORDER BY lat, lon")
+
+
+def bbox_condition(min_lat, min_lon, max_lat, max_lon, city_id=None, category=None):
+    """(условие WHERE, параметры) для мест place_rtree r внутри прямоугольника.
+
+    Границы включаются; прямоугольник через 180-й меридиан не
+    поддерживается (ValueError, если min больше max).
+    """
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bounding box min must not exceed max")
+    box = [min_lat, max_lat, min_lon, max_lon]
+    conditions = [
+        # Пересечение — по нему R*Tree ищет кандидатов
+        "r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?",
+        "(r.min_lat >= ? AND r.max_lat <= ? AND r.min_lon >= ? AND r.max_lon <= ?"
+        " OR EXISTS (SELECT 1 FROM places p WHERE p.id = r.id"
+        " AND p.lat BETWEEN ? AND ? AND p.lon BETWEEN ? AND ?))",
+    ]
+    params = box + box + box
+    if city_id is not None:
+        conditions.append("r.city_id = ?")
+        params.append(city_id)
+    if category:
+        conditions.append("r.category = ?")
+        params.append(category)
+    return " AND ".join(conditions), params
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Расстояние по поверхности Земли в метрах."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lon, radius_m):
+    """(min_lat, min_lon, max_lat, max_lon), в который целиком входит круг радиуса radius_m.
+
+    Долготы не переходят 180-й меридиан, а у полюса берётся весь круг долгот.
+    """
+    pad_lat = math.degrees(radius_m / EARTH_RADIUS_M)
+    min_lat = max(lat - pad_lat, -90.0)
+    max_lat = min(lat + pad_lat, 90.0)
+    # Долготы расходятся сильнее всего на ближнем к полюсу краю
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if min_lat <= -90.0 or max_lat >= 90.0 or cos_lat <= 1e-9:
+        return min_lat, -180.0, max_lat, 180.0
+    pad_lon = math.degrees(radius_m / (EARTH_RADIUS_M * cos_lat))
+    return min_lat, max(lon - pad_lon, -180.0), max_lat, min(lon + pad_lon, 180.0)
+
+
+def points_near(conn, lat, lon, radius_m, city_id=None, category=None):
+    """[(id, lat, lon)] мест из прямоугольника radius_bbox (с точными координатами из places).
+
+    В ответе могут быть места дальше radius_m (углы прямоугольника), но
+    все места ближе radius_m в нём есть: прямоугольники R*Tree округлены
+    наружу, так что пересечения достаточно.
+    """
+    min_lat, min_lon, max_lat, max_lon = radius_bbox(lat, lon, radius_m)
+    sql = (
+        "SELECT p.id, p.lat, p.lon FROM place_rtree r JOIN places p ON p.id = r.id "
+        "WHERE r.max_lat >= ? AND r.min_lat <= ? AND r.max_lon >= ? AND r.min_lon <= ?"
+    )
+    params = [min_lat, max_lat, min_lon, max_lon]
+    if city_id is not None:
+        sql += " AND r.city_id = ?"
+        params.append(city_id)
+    if category:
+        sql += " AND r.category = ?"
+        params.append(category)
+    return conn.execute(sql, params).fetchall()
+
+
+class NearbyWindow:
+    """Места в круге radius_m вокруг (lat, lon), прочитанные из базы одним запросом.
+
+    Для новой точки на расстоянии moved от центра окна все места ближе
+    radius_m - moved к ней лежат в окне, поэтому k ближайших можно
+    посчитать по окну, если их расстояния не больше этого запаса.
+    complete — окно накрывает всю Землю (мест меньше k), подходит для любой
+    точки. key и stamp — фильтры и версия таблицы places, по которым окно
+    читалось.
+    """
+
+    __slots__ = ("key", "stamp", "lat", "lon", "radius_m", "points", "complete")
+
+    def __init__(self, key, stamp, lat, lon, radius_m, points):
+        self.key = key
+        self.stamp = stamp
+        self.lat = lat
+        self.lon = lon
+        self.radius_m = radius_m
+        self.points = points
+        self.complete = radius_m >= HALF_CIRCUMFERENCE_M
+
+    def nearest(self, lat, lon, k, max_distance_m=None):
+        """[(расстояние, id)] до k ближайших мест по возрастанию или None, если окна мало."""
+        reach = math.inf if self.complete else self.radius_m - haversine_m(self.lat, self.lon, lat, lon)
+        if reach <= 0:
+            return None
+        limit = reach if max_distance_m is None else min(reach, max_distance_m)
+        found = heapq.nsmallest(
+            k,
+            (
+                (distance, place_id)
+                for place_id, place_lat, place_lon in self.points
+                if (distance := haversine_m(lat, lon, place_lat, place_lon)) <= limit
+            ),
+        )
+        # k мест в пределах запаса — ближе их вне окна ничего нет; меньше k —
+        # ответ точный, только если окно накрывает весь круг max_distance_m
+        if len(found) == k or self.complete or (max_distance_m is not None and max_distance_m <= reach):
+            return found
+        return None
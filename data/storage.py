@@ -0,0 +1,104 @@
+"""Профили хранения SQLite для DataManager.
+
+default — одно общее соединение для записи и для чтения из UI-потока,
+          как было исходно.
+wal     — журнал WAL, отдельное соединение-писатель и read-only соединения
+          для чтения, по одному на поток. Читатели работают со снимком
+          последней зафиксированной транзакции и не ждут, пока идёт импорт.
+
+Фоновые потоки (поиск, маркеры карты, автодополнение) в обоих профилях
+читают через свои read-only соединения из ReaderPool: общее соединение
+не защищено от одновременного использования, и через него были бы видны
+незафиксированные изменения идущей записи.
+"""
+import sqlite3
+import threading
+
+
+PROFILE_DEFAULT = "default"
+PROFILE_WAL = "wal"
+PROFILES = (PROFILE_DEFAULT, PROFILE_WAL)
+
+# Настройки WAL-профиля. cache_size в отрицательном виде задаётся в КиБ.
+WAL_PRAGMAS = {
+    "synchronous": "NORMAL",
+    "cache_size": -8000,
+    "mmap_size": 64 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,
+}
+
+
+def _apply_pragmas(conn, pragmas):
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+def configure_writer(conn, profile):
+    """Настраивает основное (пишущее) соединение под выбранный профиль."""
+    if profile != PROFILE_WAL:
+        return
+    conn.execute("PRAGMA journal_mode = WAL")
+    _apply_pragmas(conn, WAL_PRAGMAS)
+
+
+class ReaderPool:
+    """Read-only соединения к базе, по одному на поток.
+
+    Соединения потоков, которые уже завершились, закрываются при следующем
+    запросе, так что пул остаётся маленьким: UI-поток и несколько фоновых.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+        )
+        _apply_pragmas(conn, WAL_PRAGMAS)
+        conn.execute("PRAGMA query_only = 1")
+        return conn
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        conn = self._connect()
+        self._local.conn = conn
+        with self._lock:
+            self._prune_dead_threads()
+            self._connections[threading.get_ident()] = (threading.current_thread(), conn)
+        return conn
+
+    def _prune_dead_threads(self):
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+
+    def interrupt(self, thread):
+        """Прерывает запрос, выполняющийся в соединении потока thread (если есть)."""
+        with self._lock:
+            entry = self._connections.get(thread.ident)
+        if entry is not None and entry[0] is thread:
+            entry[1].interrupt()
+
+    def size(self):
+        with self._lock:
+            return len(self._connections)
+
+    def close_all(self):
+        with self._lock:
+            for _thread, conn in self._connections.values():
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections = {}
+        self._local = threading.local()
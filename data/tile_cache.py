@@ -0,0 +1,295 @@
+"""Ограниченный по размеру дисковый кэш тайлов карты.
+
+MapView складывает скачанные тайлы файлами в папку кэша и никогда их не
+удаляет. TileCache ведёт учёт этих файлов в небольшом индексе SQLite
+(tile_index.db в той же папке): размер, время последнего обращения и
+центр тайла. Когда сумма размеров превышает квоту, удаляются давно не
+использованные тайлы (LRU) — до TILE_CACHE_LOW_WATER квоты, чтобы не
+чистить кэш на каждом новом тайле.
+
+Тайлы в прямоугольниках закреплённых городов (скачанных, см.
+set_pins) не удаляются. Обращения к кэшу копятся в памяти и пишутся в
+индекс пачками; счётчики попаданий и промахов хранятся там же, так что
+статистика переживает перезапуск.
+
+Учёт файлов, скачанных до появления индекса, и чистка по квоте
+(при запуске, смене квоты или закреплённых городов) идут в фоновом
+потоке: на старом кэше это тысячи stat и удалений, и UI-поток их не ждёт.
+"""
+import math
+import os
+import sqlite3
+import time
+from threading import Lock, Thread
+
+
+# Та же папка, что у MapView по умолчанию (kivy_garden.mapview.constants.CACHE_DIR)
+TILE_CACHE_DIR = "cache"
+TILE_CACHE_INDEX = "tile_index.db"
+DEFAULT_TILE_CACHE_QUOTA = 200 * 1024 * 1024
+# Чистка освобождает место с запасом: до этой доли квоты
+TILE_CACHE_LOW_WATER = 0.9
+# Сколько обращений копить в памяти перед записью в индекс
+TILE_CACHE_FLUSH_EVERY = 64
+
+
+def tile_center(zoom, column, row):
+    """(lat, lon) центра тайла; row — по TMS, как tile_y у MapView."""
+    side = 1 << zoom
+    lon = (column + 0.5) / side * 360.0 - 180.0
+    y = (side - 1 - row + 0.5) / side
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y))))
+    return lat, lon
+
+
+def _parse_cache_name(name):
+    """(zoom, column, row) из имени файла кэша MapView «{key}_{z}_{x}_{y}.{ext}» или None."""
+    parts = os.path.splitext(name)[0].rsplit("_", 3)
+    if len(parts) != 4:
+        return None
+    try:
+        return int(parts[1]), int(parts[2]), int(parts[3])
+    except ValueError:
+        return None
+
+
+class TileCache:
+    """Учёт тайлов в папке кэша: квота, LRU-чистка, закрепление городов, статистика.
+
+    Методы потокобезопасны: lookup и add вызываются из потоков загрузки
+    тайлов, остальное — из UI-потока.
+    """
+
+    _instance = None
+
+    def __init__(self, cache_dir=TILE_CACHE_DIR, quota_bytes=DEFAULT_TILE_CACHE_QUOTA):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.quota_bytes = quota_bytes
+        self._lock = Lock()
+        self.conn = sqlite3.connect(os.path.join(cache_dir, TILE_CACHE_INDEX), check_same_thread=False)
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS tiles (
+                name TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                lat REAL,
+                lon REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_tiles_last_used ON tiles(last_used);
+            CREATE TABLE IF NOT EXISTS pins (
+                city_id INTEGER PRIMARY KEY,
+                min_lat REAL, min_lon REAL, max_lat REAL, max_lon REAL
+            );
+            CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER);
+            """
+        )
+        # Имя файла -> размер: проверка попадания без запроса к индексу
+        self._sizes = dict(self.conn.execute("SELECT name, size FROM tiles"))
+        self._bytes = sum(self._sizes.values())
+        # Обращения и новые тайлы, ещё не записанные в индекс
+        self._touched = {}
+        self._added = []
+        stats = dict(self.conn.execute("SELECT key, value FROM stats"))
+        self.hits = stats.get("hits", 0)
+        self.misses = stats.get("misses", 0)
+        # Фоновое обслуживание: учёт старых файлов (один раз) и чистка по квоте
+        self._maintenance_thread = None
+        self._maintenance_requested = False
+        self._scan_requested = False
+        self._schedule_maintenance(scan=True)
+
+    @classmethod
+    def get_instance(cls, cache_dir=None, quota_bytes=None):
+        """Общий кэш приложения; quota_bytes у уже созданного — меняет квоту."""
+        if cls._instance is None:
+            cls._instance = cls(
+                cache_dir or TILE_CACHE_DIR,
+                DEFAULT_TILE_CACHE_QUOTA if quota_bytes is None else quota_bytes,
+            )
+        elif quota_bytes is not None:
+            cls._instance.set_quota(quota_bytes)
+        return cls._instance
+
+    def _schedule_maintenance(self, scan=False):
+        """Запускает (или просит повторить) фоновую чистку; scan — сначала учесть старые файлы."""
+        with self._lock:
+            self._maintenance_requested = True
+            self._scan_requested = self._scan_requested or scan
+            if self._maintenance_thread is None:
+                self._maintenance_thread = Thread(target=self._maintain, name="tile-cache", daemon=True)
+                self._maintenance_thread.start()
+
+    def _maintain(self):
+        while True:
+            with self._lock:
+                if not self._maintenance_requested:
+                    self._maintenance_thread = None
+                    return
+                self._maintenance_requested = False
+                scan = self._scan_requested
+                self._scan_requested = False
+            try:
+                if scan:
+                    self._index_existing_files()
+                self._enforce_quota()
+            except (OSError, sqlite3.Error):
+                # Кэш — не критичные данные: повторим при следующем запуске
+                pass
+
+    def _index_existing_files(self):
+        """Учитывает файлы, скачанные до появления индекса (время — по mtime)."""
+        rows = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.is_file() or entry.name in self._sizes or entry.name.startswith(TILE_CACHE_INDEX):
+                continue
+            address = _parse_cache_name(entry.name)
+            if address is None:
+                continue
+            stat = entry.stat()
+            lat, lon = tile_center(*address)
+            rows.append((entry.name, stat.st_size, stat.st_mtime, lat, lon))
+        if rows:
+            with self._lock:
+                # Пока шёл обход папки, часть тайлов могла прийти через add()
+                rows = [row for row in rows if row[0] not in self._sizes]
+                self.conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)", rows)
+                self.conn.commit()
+                for name, size, _used, _lat, _lon in rows:
+                    self._sizes[name] = size
+                    self._bytes += size
+
+    def lookup(self, path):
+        """Есть ли тайл path в кэше; учитывается как попадание или промах."""
+        name = os.path.basename(path)
+        with self._lock:
+            found = name in self._sizes and os.path.exists(path)
+            if found:
+                self.hits += 1
+                self._touched[name] = time.time()
+            else:
+                self.misses += 1
+                if name in self._sizes:
+                    # Файл удалили в обход кэша
+                    self._bytes -= self._sizes.pop(name)
+                    self._touched.pop(name, None)
+                    self.conn.execute("DELETE FROM tiles WHERE name = ?", (name,))
+            if len(self._touched) >= TILE_CACHE_FLUSH_EVERY:
+                self._flush()
+        return found
+
+    def add(self, path, size, zoom, column, row):
+        """Учитывает записанный файл тайла (row — по TMS) и при превышении квоты чистит кэш."""
+        name = os.path.basename(path)
+        lat, lon = tile_center(zoom, column, row)
+        with self._lock:
+            self._bytes += size - self._sizes.get(name, 0)
+            self._sizes[name] = size
+            self._added.append((name, size, time.time(), lat, lon))
+            over = self._bytes > self.quota_bytes
+            if len(self._added) >= TILE_CACHE_FLUSH_EVERY:
+                self._flush()
+        if over:
+            self._enforce_quota()
+
+    def _flush(self):
+        # Вызывается под self._lock
+        if self._added:
+            self.conn.executemany("INSERT OR REPLACE INTO tiles VALUES (?, ?, ?, ?, ?)", self._added)
+            self._added = []
+        if self._touched:
+            self.conn.executemany(
+                "UPDATE tiles SET last_used = ? WHERE name = ?",
+                [(used, name) for name, used in self._touched.items()],
+            )
+            self._touched = {}
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO stats (key, value) VALUES (?, ?)",
+            (("hits", self.hits), ("misses", self.misses)),
+        )
+        self.conn.commit()
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def set_quota(self, quota_bytes):
+        self.quota_bytes = quota_bytes
+        self._schedule_maintenance()
+
+    def set_pins(self, pins):
+        """Закреплённые города: {city_id: (min_lat, min_lon, max_lat, max_lon)}; их тайлы не удаляются."""
+        with self._lock:
+            self.conn.execute("DELETE FROM pins")
+            self.conn.executemany(
+                "INSERT INTO pins (city_id, min_lat, min_lon, max_lat, max_lon) VALUES (?, ?, ?, ?, ?)",
+                [(city_id, *bbox) for city_id, bbox in pins.items()],
+            )
+            self.conn.commit()
+        self._schedule_maintenance()
+
+    _UNPINNED = """NOT EXISTS (SELECT 1 FROM pins p
+        WHERE t.lat BETWEEN p.min_lat AND p.max_lat AND t.lon BETWEEN p.min_lon AND p.max_lon)"""
+
+    def _enforce_quota(self):
+        """Удаляет давно не использованные незакреплённые тайлы, пока кэш больше квоты."""
+        with self._lock:
+            if self._bytes <= self.quota_bytes:
+                return
+            self._flush()
+            target = self.quota_bytes * TILE_CACHE_LOW_WATER
+            while self._bytes > target:
+                rows = self.conn.execute(
+                    f"SELECT name, size FROM tiles t WHERE {self._UNPINNED} ORDER BY last_used LIMIT 256"
+                ).fetchall()
+                if not rows:
+                    # Остались только закреплённые тайлы
+                    break
+                evicted = []
+                for name, size in rows:
+                    if self._bytes <= target:
+                        break
+                    try:
+                        os.remove(os.path.join(self.cache_dir, name))
+                    except FileNotFoundError:
+                        pass
+                    self._bytes -= self._sizes.pop(name, size)
+                    evicted.append((name,))
+                self.conn.executemany("DELETE FROM tiles WHERE name = ?", evicted)
+            self.conn.commit()
+
+    def stats(self):
+        """Статистика для экрана профиля: попадания, промахи, доля попаданий, байты."""
+        with self._lock:
+            self._flush()
+            pinned = self.conn.execute(
+                f"SELECT COUNT(*), IFNULL(SUM(size), 0) FROM tiles t WHERE NOT {self._UNPINNED}"
+            ).fetchone()
+            requests = self.hits + self.misses
+            return {
+                "tiles": len(self._sizes),
+                "bytes": self._bytes,
+                "quota_bytes": self.quota_bytes,
+                "pinned_tiles": pinned[0],
+                "pinned_bytes": pinned[1],
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+            }
+
+    def clear(self, keep_pinned=True):
+        """Удаляет тайлы из кэша (по умолчанию кроме закреплённых) и обнуляет статистику."""
+        with self._lock:
+            self._flush()
+            condition = f"WHERE {self._UNPINNED}" if keep_pinned else ""
+            rows = self.conn.execute(f"SELECT name FROM tiles t {condition}").fetchall()
+            for (name,) in rows:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+                self._bytes -= self._sizes.pop(name, 0)
+            self.conn.executemany("DELETE FROM tiles WHERE name = ?", rows)
+            self.hits = self.misses = 0
+            self._flush()
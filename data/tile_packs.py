@@ -0,0 +1,178 @@
+"""Пакеты тайлов карты города (MBTiles).
+
+Пакет — один файл SQLite в формате MBTiles: таблица metadata (name,
+format, bounds, center, minzoom, maxzoom, attribution) и таблица tiles
+(zoom_level, tile_column, tile_row, tile_data) с уникальным индексом по
+адресу тайла. Номер строки — по схеме TMS (ось y снизу вверх), как в
+стандарте и как tile_y у тайлов MapView, так что файл открывается и
+сторонними программами. Пакет города лежит рядом с данными:
+data/tiles_<city_id>.mbtiles.
+
+Пакет строит tools/prefetch_tiles.py для прямоугольника вокруг центра
+города и диапазона масштабов; карта читает его через TilePack — одно
+открытое соединение на поток и отображение файла в память (mmap), без
+отдельного файла на каждый тайл.
+"""
+import math
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from data.clusters import mercator
+
+
+DATA_DIR = os.path.dirname(__file__)
+# Масштабы и радиус пакета по умолчанию: от обзора города до улиц
+TILE_PACK_ZOOMS = (10, 16)
+TILE_PACK_RADIUS_KM = 8
+# Тайлы пишутся в пакет и фиксируются пачками (прерванная загрузка продолжается с места остановки)
+TILE_PACK_BATCH = 100
+# Сколько байт файла пакета отображать в память при чтении
+TILE_PACK_MMAP = 256 * 1024 * 1024
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)",
+    "CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row)",
+)
+
+
+def tile_pack_path(city_id, base_dir=DATA_DIR):
+    return os.path.join(base_dir, f"tiles_{city_id}.mbtiles")
+
+
+def city_bbox(center_lat, center_lon, radius_km=TILE_PACK_RADIUS_KM):
+    """(min_lat, min_lon, max_lat, max_lon) квадрата со стороной 2 * radius_km вокруг центра."""
+    lat_pad = radius_km / 111.32
+    lon_pad = radius_km / (111.32 * max(math.cos(math.radians(center_lat)), 0.01))
+    return (
+        max(center_lat - lat_pad, -85.0),
+        max(center_lon - lon_pad, -180.0),
+        min(center_lat + lat_pad, 85.0),
+        min(center_lon + lon_pad, 180.0),
+    )
+
+
+def tms_row(zoom, y):
+    """Номер строки тайла по TMS для строки y по XYZ (и обратно)."""
+    return (1 << zoom) - 1 - y
+
+
+def tiles_in_bbox(min_lat, min_lon, max_lat, max_lon, min_zoom, max_zoom):
+    """Адреса (zoom, x, y) тайлов по XYZ, покрывающих прямоугольник, по масштабам."""
+    if min_lat > max_lat or min_lon > max_lon:
+        raise ValueError("bounding box min must not exceed max")
+    x0, y1 = mercator(min_lat, min_lon)
+    x1, y0 = mercator(max_lat, max_lon)
+    for zoom in range(min_zoom, max_zoom + 1):
+        side = 1 << zoom
+        for x in range(int(x0 * side), min(int(x1 * side), side - 1) + 1):
+            for y in range(int(y0 * side), min(int(y1 * side), side - 1) + 1):
+                yield zoom, x, y
+
+
+def count_tiles(min_lat, min_lon, max_lat, max_lon, min_zoom, max_zoom):
+    return sum(1 for _ in tiles_in_bbox(min_lat, min_lon, max_lat, max_lon, min_zoom, max_zoom))
+
+
+def build_tile_pack(path, bbox, zooms, fetch, metadata=None, workers=2, progress=None):
+    """Скачивает в пакет path тайлы прямоугольника bbox на масштабах zooms.
+
+    fetch(zoom, x, y) — содержимое тайла по XYZ (bytes) или None, если
+    тайла нет; вызывается из workers потоков. Тайлы, уже лежащие в
+    пакете, не скачиваются заново. progress(готово, всего) — после каждой
+    пачки. Возвращает (скачано, уже было, не найдено).
+    """
+    min_zoom, max_zoom = zooms
+    min_lat, min_lon, max_lat, max_lon = bbox
+    conn = sqlite3.connect(path)
+    try:
+        for statement in _SCHEMA:
+            conn.execute(statement)
+        info = {
+            "format": "png",
+            "type": "baselayer",
+            "bounds": f"{min_lon},{min_lat},{max_lon},{max_lat}",
+            "center": f"{(min_lon + max_lon) / 2},{(min_lat + max_lat) / 2},{min(max(13, min_zoom), max_zoom)}",
+            "minzoom": str(min_zoom),
+            "maxzoom": str(max_zoom),
+        }
+        info.update(metadata or {})
+        conn.executemany("INSERT OR REPLACE INTO metadata (name, value) VALUES (?, ?)", info.items())
+        conn.commit()
+
+        tiles = list(tiles_in_bbox(min_lat, min_lon, max_lat, max_lon, min_zoom, max_zoom))
+        have = set(conn.execute("SELECT zoom_level, tile_column, tile_row FROM tiles"))
+        todo = [(z, x, y) for z, x, y in tiles if (z, x, tms_row(z, y)) not in have]
+        fetched = missing = 0
+        done = len(tiles) - len(todo)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for start in range(0, len(todo), TILE_PACK_BATCH):
+                batch = todo[start:start + TILE_PACK_BATCH]
+                rows = []
+                for (z, x, y), data in zip(batch, executor.map(lambda tile: fetch(*tile), batch)):
+                    if data is None:
+                        missing += 1
+                    else:
+                        rows.append((z, x, tms_row(z, y), sqlite3.Binary(data)))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+                fetched += len(rows)
+                done += len(batch)
+                if progress:
+                    progress(done, len(tiles))
+        return fetched, len(tiles) - len(todo), missing
+    finally:
+        conn.close()
+
+
+class TilePack:
+    """Чтение тайлов из пакета MBTiles из нескольких потоков.
+
+    Соединение SQLite нельзя делить между потоками, поэтому у каждого
+    потока своё, открытое один раз и только для чтения; файл читается
+    через mmap, так что повторные тайлы берутся из памяти.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.metadata = dict(self._conn().execute("SELECT name, value FROM metadata"))
+        self.min_zoom = int(self.metadata.get("minzoom", 0))
+        self.max_zoom = int(self.metadata.get("maxzoom", 19))
+        self.format = self.metadata.get("format", "png")
+        self.bounds = (
+            tuple(float(value) for value in self.metadata["bounds"].split(","))
+            if self.metadata.get("bounds")
+            else None
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute(f"PRAGMA mmap_size = {TILE_PACK_MMAP}")
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def get_tile(self, zoom, column, row):
+        """Содержимое тайла по TMS (строка снизу вверх) или None."""
+        found = self._conn().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
+            (zoom, column, row),
+        ).fetchone()
+        return bytes(found[0]) if found else None
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
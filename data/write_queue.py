@@ -0,0 +1,115 @@
+"""Очередь записи с групповой фиксацией (group commit).
+
+Изменения от UI ставятся в очередь и выполняются фоновым потоком-писателем.
+Писатель собирает их в пачку — пока не наберётся max_batch операций или не
+пройдёт max_delay секунд с первой — и фиксирует пачку одной транзакцией,
+то есть одним fsync вместо одного на каждое действие пользователя.
+
+Очередь ничего не знает о схеме: пачку выполняет функция run_batch,
+переданная владельцем (DataManager). Для каждой операции запоминаются
+таблицы, которые она меняет, чтобы чтение ждало только тех операций,
+которые его касаются (flush(tables=...)).
+"""
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+
+_STOP = object()
+
+
+class WriteQueue:
+    def __init__(self, run_batch, max_batch=64, max_delay=0.005):
+        self._run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue = queue.Queue()
+        self._idle = threading.Condition()
+        self._pending = 0
+        self._pending_tables = Counter()
+        self.batches_committed = 0
+        self.thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, work, tables=()):
+        """Ставит work() в очередь и возвращает Future с её результатом.
+
+        tables — таблицы, которые меняет work (см. flush).
+        """
+        future = Future()
+        with self._idle:
+            self._pending += 1
+            self._pending_tables.update(tables)
+        self._queue.put((work, future, tables))
+        return future
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def in_writer_thread(self):
+        return threading.current_thread() is self.thread
+
+    def touches(self, tables):
+        """Есть ли незафиксированные операции, меняющие одну из таблиц tables."""
+        return any(self._pending_tables[table] for table in tables)
+
+    def flush(self, timeout=None, tables=None):
+        """Ждёт, пока поставленные операции будут зафиксированы.
+
+        tables=None — все операции, иначе только меняющие эти таблицы.
+        Возвращает False, если не дождались за timeout секунд.
+        """
+        if self.in_writer_thread():
+            return True
+        if tables is None:
+            done = lambda: self._pending == 0
+        else:
+            done = lambda: not self.touches(tables)
+        with self._idle:
+            return self._idle.wait_for(done, timeout)
+
+    def close(self, timeout=None):
+        """Дописывает очередь и останавливает поток-писатель."""
+        if not self.thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        self.thread.join(timeout)
+
+    def _loop(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                self._run_batch([(work, future) for work, future, _tables in batch])
+                self.batches_committed += 1
+            except Exception as exc:
+                # Сбой фиксации: все ещё не завершённые операции пачки получают ошибку
+                for _work, future, _tables in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            finally:
+                with self._idle:
+                    self._pending -= len(batch)
+                    for _work, _future, tables in batch:
+                        self._pending_tables.subtract(tables)
+                    self._idle.notify_all()
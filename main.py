@@ -26,6 +26,9 @@ from screens.tour_run_screen import TourRunScreen
 from screens.auth_screen import AuthScreen
 from screens.users_admin_screen import UsersAdminScreen
 from data.data_manager import DataManager
+from data.tile_cache import DEFAULT_TILE_CACHE_QUOTA, TileCache
+from utils.location_service import LocationService, create_provider
+from utils.tile_cache_source import pin_downloaded_cities
 import hashlib
 
 
@@ -52,6 +55,9 @@ TEXTS = {
         "places_sort_label": "Сортировка:",
         "places_sort_rating": "По рейтингу",
         "places_sort_name": "По имени",
+        "places_sort_nearby": "Рядом",
+        "distance_m": "{} м",
+        "distance_km": "{:.1f} км",
         "category_sight": "Достопримеч.",
         "category_food": "Еда",
         "category_museum": "Музей",
@@ -114,6 +120,12 @@ TEXTS = {
         "achievements_title": "Достижения:",
         "cities_title": "Мои города:",
         "progress_label": "Исследовано: {}% точек города",
+        "storage_title": "Хранилище:",
+        "storage_cache_size": "Кэш карты: {:.1f} из {:.0f} МБ  •  Тайлов: {}",
+        "storage_pinned": "Закреплено для скачанных городов: {:.1f} МБ",
+        "storage_hit_rate": "Попадания в кэш: {:.0f}% ({} из {})",
+        "storage_no_requests": "Попадания в кэш: пока нет обращений",
+        "btn_clear_map_cache": "Очистить кэш карты",
         # PlaceDetailScreen
         "place_default": "Место",
         "btn_toggle_favorite": "В избранное / из избранного",
@@ -135,6 +147,7 @@ TEXTS = {
         "next_stop": "Далее: {}",
         "next_stop_default": "Далее: следующая точка",
         "last_stop": "Это последняя остановка",
+        "tour_point_reached": "📍 Вы у точки: {}",
         "btn_back": "Назад",
         "btn_next": "Далее",
         "btn_finish": "Завершить",
@@ -217,6 +230,9 @@ TEXTS = {
         "places_sort_label": "Sort:",
         "places_sort_rating": "By rating",
         "places_sort_name": "By name",
+        "places_sort_nearby": "Nearby",
+        "distance_m": "{} m",
+        "distance_km": "{:.1f} km",
         "category_sight": "Sight",
         "category_food": "Food",
         "category_museum": "Museum",
@@ -279,6 +295,12 @@ TEXTS = {
         "achievements_title": "Achievements:",
         "cities_title": "My cities:",
         "progress_label": "City explored: {}% of places",
+        "storage_title": "Storage:",
+        "storage_cache_size": "Map cache: {:.1f} of {:.0f} MB  •  Tiles: {}",
+        "storage_pinned": "Pinned for downloaded cities: {:.1f} MB",
+        "storage_hit_rate": "Cache hits: {:.0f}% ({} of {})",
+        "storage_no_requests": "Cache hits: no requests yet",
+        "btn_clear_map_cache": "Clear map cache",
         # PlaceDetailScreen
         "place_default": "Place",
         "btn_toggle_favorite": "Add to favorites / Remove from favorites",
@@ -300,6 +322,7 @@ TEXTS = {
         "next_stop": "Next: {}",
         "next_stop_default": "Next: next point",
         "last_stop": "This is the last stop",
+        "tour_point_reached": "📍 You have reached: {}",
         "btn_back": "Back",
         "btn_next": "Next",
         "btn_finish": "Finish",
@@ -390,6 +413,16 @@ class CityGuideApp(MDApp):
     def build(self):
         # Перед настройкой внешнего вида и загрузкой KV узнаём язык
         self.ui_language = self.get_language_code()
+        # Общий DataManager создаём до экранов, чтобы применился профиль хранения
+        DataManager.get_instance(
+            storage_profile=self._load_storage_profile(),
+            write_queue=self._load_write_queue_enabled(),
+        )
+        # Кэш тайлов карты с квотой; тайлы скачанных городов закреплены
+        TileCache.get_instance(quota_bytes=self._load_tile_cache_quota())
+        pin_downloaded_cities(DataManager.get_instance())
+        # Источник положения: GPS устройства или трек из настроек (см. utils/location_service.py)
+        LocationService.get_instance().set_provider(create_provider(self._load_location_settings()))
         self._setup_appearance()
         self._setup_window()
         self._load_ui()
@@ -462,6 +495,19 @@ class CityGuideApp(MDApp):
         # Здесь в будущем можно добавить загрузку пользовательских данных,
         # проверку обновлений и аналитики запуска приложения.
 
+    def on_stop(self):
+        # Дописываем отложенные изменения из очереди записи до выхода
+        try:
+            DataManager.get_instance().flush(timeout=5)
+        except Exception as exc:
+            Logger.warning(f"CityGuideApp: unable to flush pending writes: {exc}")
+        try:
+            TileCache.get_instance().flush()
+        except Exception as exc:
+            Logger.warning(f"CityGuideApp: unable to flush tile cache index: {exc}")
+        # Выключаем GPS / проигрывание трека
+        LocationService.get_instance().set_provider(None)
+
     # --- Настройки приложения (JsonStore) ---
 
     def _get_settings_store(self):
@@ -485,6 +531,36 @@ class CityGuideApp(MDApp):
         store = self._get_settings_store()
         store.put("theme", style=style)
 
+    def _load_storage_profile(self) -> str:
+        """Профиль хранения SQLite: 'default' или 'wal' (см. data/storage.py)."""
+        store = self._get_settings_store()
+        if store.exists("storage"):
+            return store.get("storage").get("profile", "default")
+        return "default"
+
+    def _load_write_queue_enabled(self) -> bool:
+        """Включена ли групповая фиксация изменений (см. data/write_queue.py)."""
+        store = self._get_settings_store()
+        if store.exists("storage"):
+            return bool(store.get("storage").get("write_queue", False))
+        return False
+
+    def _load_tile_cache_quota(self) -> int:
+        """Квота кэша тайлов карты в байтах (в настройках — tile_cache_mb, см. data/tile_cache.py)."""
+        store = self._get_settings_store()
+        if store.exists("storage"):
+            megabytes = store.get("storage").get("tile_cache_mb")
+            if megabytes:
+                return int(megabytes) * 1024 * 1024
+        return DEFAULT_TILE_CACHE_QUOTA
+
+    def _load_location_settings(self) -> dict:
+        """Настройки источника положения, например {"replay": "track.gpx", "replay_speed": 5}."""
+        store = self._get_settings_store()
+        if store.exists("location"):
+            return dict(store.get("location"))
+        return {}
+
     def _load_language(self) -> str:
         """Читает сохранённый язык интерфейса пользователя."""
         store = self._get_settings_store()
@@ -3,6 +3,7 @@ from kivy.properties import DictProperty
 from kivymd.uix.screen import MDScreen
 
 from data.data_manager import DataManager
+from utils.tile_cache_source import pin_downloaded_cities
 
 
 class CityPackageScreen(MDScreen):
@@ -49,6 +50,8 @@ class CityPackageScreen(MDScreen):
         if not city_id:
             return
         self.data_manager.download_city_data(city_id)
+        # Тайлы скачанного города больше не вытесняются из кэша карты
+        pin_downloaded_cities(self.data_manager)
         self.data_manager.set_active_city(city_id)
         from kivy.app import App
 
@@ -97,7 +97,7 @@ class HomeScreen(MDScreen):
         # Рекомендация 1: незавершённый тур или самый популярный
         tours = []
         try:
-            tours = dm.get_all_tours_with_progress()
+            tours = dm.get_tour_cards()
         except Exception:
             tours = []
         rec_tour = None
@@ -118,7 +118,7 @@ class HomeScreen(MDScreen):
         # Рекомендация 2: место, которое ещё не было в точках туров
         places = []
         try:
-            places = dm.get_all_places()
+            places = dm.get_place_cards()
         except Exception:
             places = []
         used_place_ids = set()
@@ -168,7 +168,7 @@ class HomeScreen(MDScreen):
 
         tours = []
         try:
-            tours = dm.get_all_tours_with_progress()
+            tours = dm.get_tour_cards()
         except Exception:
             tours = []
 
@@ -182,7 +182,7 @@ class HomeScreen(MDScreen):
 
         places = []
         try:
-            places = dm.get_all_places()
+            places = dm.get_place_cards()
         except Exception:
             places = []
         if len(places) >= 2:
@@ -204,7 +204,7 @@ class HomeScreen(MDScreen):
         
         dm = self.data_manager
         try:
-            places = dm.get_all_places()
+            places = dm.get_place_cards()
         except Exception:
             places = []
 
@@ -217,7 +217,11 @@ class HomeScreen(MDScreen):
         rnd = random.Random(seed)
         place = rnd.choice(places)
         name = place.get("name", "интересное место")
-        short = place.get("short_desc") or place.get("description", "")
+        short = place.get("short_desc")
+        if not short:
+            # Полное описание нужно только этому месту, читаем запись целиком
+            full = dm.get_place(place["id"]) or {}
+            short = full.get("description", "")
         if short:
             self.place_of_day = f"{app.get_text('place_of_day_prefix')} {name} — {short}"
         else:
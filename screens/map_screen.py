@@ -1,20 +1,69 @@
+import math
+import os
+import threading
+
 from kivymd.uix.screen import MDScreen
-from kivy.properties import BooleanProperty, NumericProperty
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, NumericProperty, StringProperty
 
-from kivy_garden.mapview import MapView, MapMarker
+from kivy_garden.mapview import MapView
 
+from data.clusters import MAX_CLUSTER_ZOOM, ClusterIndex
 from data.data_manager import DataManager
+from data.listing import PLACE_CATEGORIES
+from data.tile_packs import tile_pack_path
+from utils.location_service import LocationService
+from utils.marker_layer import MarkerLayer, UserLocationMarker
+from utils.search_controller import SearchController
+from utils.tile_cache_source import CachedMapSource
+from utils.tile_pack_source import TilePackMapSource
+
+
+# Сколько результатов поиска показывать в выпадающем списке под строкой поиска
+MAP_SEARCH_RESULTS = 6
+KIND_ICONS = {"place": "📍", "tour": "🎭"}
+# Больше маркеров на карте не создаётся: в области показываются лучшие по рейтингу
+MAP_MAX_MARKERS = 300
+# На сколько уровней приближать карту по нажатию на кластер
+CLUSTER_ZOOM_STEP = 2
+# Точка «Я здесь» переставляется после сдвига хотя бы на столько метров
+USER_MARKER_MIN_MOVE_M = 3
+EARTH_CIRCUMFERENCE_M = 40075016.686
 
 
 class MapScreen(MDScreen):
     # Режим выбора точки для конкретного места
     pick_mode = BooleanProperty(False)
     pick_place_id = NumericProperty(0)
+    # Категория мест на карте ('' — все), выбирается в open_filters
+    selected_category = StringProperty("")
     def on_kv_post(self, base_widget):
         super().on_kv_post(base_widget)
         self.data_manager = DataManager.get_instance()
-        # все маркеры мест по id места
-        self.all_place_markers = {}
+        # Маркеры только видимой области карты, см. utils/marker_layer.py
+        map_view = self.ids.get("map_view")
+        self._marker_layer = (
+            MarkerLayer(map_view, self._places_in_view, limit=MAP_MAX_MARKERS, on_cluster=self._zoom_to_cluster)
+            if map_view
+            else None
+        )
+        # Индекс кластеров (data/clusters.py) для (город, категория); строится в фоне
+        self._clusters = None
+        self._clusters_key = None
+        self._clusters_generation = 0
+        self._clusters_thread = None
+        self._search = SearchController(
+            self._search_places, self._on_search_results, interrupt=self.data_manager.interrupt_reads
+        )
+        self._search_menu = None
+        self._filters_menu = None
+        # «Я здесь»: точка положения пользователя и режим следования карты за ним
+        self._user_marker = None
+        self._follow_user = False
+        # Сетевые тайлы — через ограниченный кэш (data/tile_cache.py);
+        # для города с пакетом тайлов — TilePackMapSource
+        self._online_source = CachedMapSource(cache_dir=map_view.cache_dir) if map_view else None
+        self._update_map_source()
         self._center_on_active_city()
         self._populate_markers()
 
@@ -35,31 +84,103 @@ class MapScreen(MDScreen):
             map_view.lat = lat
             map_view.lon = lon
 
-    def _populate_markers(self):
+    def _update_map_source(self):
+        """Тайлы из офлайн-пакета активного города (data/tile_packs.py), если он собран."""
         map_view = self.ids.get("map_view")
         if not map_view:
             return
-        # удаляем старые маркеры мест
-        for marker in self.all_place_markers.values():
+        city = self.data_manager.get_active_city()
+        path = tile_pack_path(city["id"]) if city else None
+        current = map_view.map_source
+        if path and os.path.exists(path):
+            if isinstance(current, TilePackMapSource) and current.path == path:
+                return
             try:
-                map_view.remove_widget(marker)
+                source = TilePackMapSource(path)
             except Exception:
-                pass
-        self.all_place_markers = {}
-
-        places = self.data_manager.get_all_places()
-
-        for place in places:
-            lat = place.get("lat")
-            lon = place.get("lon")
-            if lat is None or lon is None:
-                continue
-            marker = MapMarker(lat=lat, lon=lon)
-            # добавляем как обычный виджет, без внутреннего регистра MapView
-            map_view.add_widget(marker)
-            pid = place.get("id")
-            if pid is not None:
-                self.all_place_markers[pid] = marker
+                # Повреждённый или недокачанный пакет — остаёмся на сетевых тайлах
+                source = self._online_source
+        else:
+            source = self._online_source
+        if source is not current:
+            # Соединения старого пакета закрываются вместе с ним, когда его дочитают потоки Downloader
+            map_view.map_source = source
+
+    def _populate_markers(self, rebuild_clusters=False):
+        """Перезапрашивает маркеры видимой области с текущими фильтрами.
+
+        Индекс кластеров перестраивается при смене города или категории
+        (и по rebuild_clusters — после изменения мест извне карты).
+        """
+        if self._marker_layer is None:
+            return
+        city = self.data_manager.get_active_city()
+        key = (city["id"] if city else None, self.selected_category or None)
+        if rebuild_clusters or key != self._clusters_key:
+            self._build_clusters(key)
+        self._marker_layer.refresh(category=self.selected_category or None, lang=self._language_code())
+
+    def _build_clusters(self, key):
+        """Строит ClusterIndex мест города в фоне; до готовности карта показывает отдельные места.
+
+        Точки читаются в потоке через его read-only соединение; запрос
+        предыдущего, уже ненужного построения прерывается.
+        """
+        self._clusters_generation += 1
+        generation = self._clusters_generation
+        self._clusters = None
+        self._clusters_key = key
+        city_id, category = key
+        previous = self._clusters_thread
+        if previous is not None and previous.is_alive():
+            self.data_manager.interrupt_reads(previous)
+
+        def build():
+            if generation != self._clusters_generation:
+                return
+            try:
+                index = ClusterIndex(self.data_manager.get_place_points(city_id=city_id, category=category))
+            except Exception:
+                return
+            Clock.schedule_once(lambda dt: self._on_clusters_built(generation, index))
+
+        self._clusters_thread = threading.Thread(target=build, name="clusters", daemon=True)
+        self._clusters_thread.start()
+
+    def _on_clusters_built(self, generation, index):
+        if generation != self._clusters_generation:
+            return
+        self._clusters = index
+        if self._marker_layer is not None:
+            self._marker_layer.refresh()
+
+    def _places_in_view(self, bbox, zoom, limit, category=None, lang="ru"):
+        """Места или кластеры области карты для MarkerLayer; вызывается в фоновом потоке."""
+        min_lat, min_lon, max_lat, max_lon = bbox
+        clusters = self._clusters
+        if clusters is not None and zoom <= MAX_CLUSTER_ZOOM:
+            return [
+                {"id": place_id, "lat": lat, "lon": lon, "count": count}
+                for lat, lon, count, place_id in clusters.clusters(min_lat, min_lon, max_lat, max_lon, zoom)
+            ]
+        return self.data_manager.get_places_in_bbox(
+            min_lat, min_lon, max_lat, max_lon, category=category, limit=limit, lang=lang
+        )
+
+    def _zoom_to_cluster(self, lat, lon):
+        """Нажатие на кластер: приближаем карту к нему, кластер распадается на части."""
+        map_view = self.ids.get("map_view")
+        if not map_view:
+            return
+        max_zoom = getattr(map_view.map_source, "max_zoom", MAX_CLUSTER_ZOOM + 1)
+        map_view.zoom = min(map_view.zoom + CLUSTER_ZOOM_STEP, max_zoom)
+        map_view.center_on(lat, lon)
+
+    def _language_code(self):
+        from kivy.app import App
+
+        app = App.get_running_app()
+        return app.get_language_code() if hasattr(app, "get_language_code") else "ru"
 
     def focus_on_place_by_id(self, place_id):
         place = self.data_manager.get_place(place_id)
@@ -86,26 +207,13 @@ class MapScreen(MDScreen):
 
     def show_route(self, place_ids):
         map_view = self.ids.get("map_view")
-        if not map_view:
+        if not map_view or self._marker_layer is None:
             return
-        # скрываем все маркеры мест
-        for pid, marker in self.all_place_markers.items():
-            try:
-                map_view.remove_widget(marker)
-            except Exception:
-                pass
-
-        # показываем только выбранные маркеры
-        route_places = []
-        for pid in place_ids:
-            marker = self.all_place_markers.get(pid)
-            if not marker:
-                continue
-            try:
-                map_view.add_widget(marker)
-            except Exception:
-                continue
-            route_places.append((marker.lat, marker.lon))
+        # показываем только места маршрута, пока не вернутся к общему виду (reset_view)
+        places = [self.data_manager.get_place(pid) for pid in place_ids]
+        places = [place for place in places if place and place.get("lat") is not None and place.get("lon") is not None]
+        self._marker_layer.show_places(places)
+        route_places = [(place["lat"], place["lon"]) for place in places]
 
         if route_places:
             lat0, lon0 = route_places[0]
@@ -119,29 +227,129 @@ class MapScreen(MDScreen):
     # --- Панель действий над картой ---
 
     def on_search_text(self, text):
-        """Простой поиск по местам (название и описание) с фокусом на первое совпадение."""
-        query = (text or "").strip().lower()
+        """Поиск мест и экскурсий; лучшие совпадения — выпадающим списком.
+
+        Сразу показываются подсказки по началу слов в названиях (индекс в
+        памяти), а полнотекстовый запрос выполняется в фоне после паузы в
+        наборе (см. SearchController) и заменяет их своими результатами.
+        """
+        from kivy.app import App
+
+        search = getattr(self, "_search", None)
+        if search is None:
+            return
+        query = (text or "").strip()
         if not query:
+            search.cancel()
+            self._dismiss_search_menu()
+            return
+        app = App.get_running_app()
+        lang = app.get_language_code() if hasattr(app, "get_language_code") else "ru"
+        suggestions = self.data_manager.autocomplete(query, limit=MAP_SEARCH_RESULTS, lang=lang)
+        if suggestions:
+            self._show_search_menu(suggestions)
+        search.submit((query, lang))
+
+    def _search_places(self, request):
+        query, lang = request
+        return self.data_manager.search(query, lang=lang, limit=MAP_SEARCH_RESULTS)
+
+    def _on_search_results(self, request, hits):
+        self._show_search_menu(hits)
+
+    def _show_search_menu(self, hits):
+        from kivymd.uix.menu import MDDropdownMenu
+
+        self._dismiss_search_menu()
+        field = self.ids.get("map_search")
+        if not hits or field is None:
             return
-        places = self.data_manager.get_all_places()
-        for place in places:
-            name = (place.get("name") or "").lower()
-            desc = (place.get("description") or "").lower()
-            if query in name or query in desc:
-                self.focus_on_place_by_id(place.get("id"))
-                break
+        items = [
+            {
+                "text": f"{KIND_ICONS.get(hit['kind'], '')} {hit['title'] or ''}",
+                "secondary_text": hit.get("snippet") or "",
+                "viewclass": "TwoLineListItem",
+                "on_release": lambda kind=hit["kind"], item_id=hit["id"]: self._open_search_hit(kind, item_id),
+            }
+            for hit in hits
+        ]
+        self._search_menu = MDDropdownMenu(caller=field, items=items, width_mult=6)
+        self._search_menu.open()
+
+    def _dismiss_search_menu(self):
+        if self._search_menu is not None:
+            self._search_menu.dismiss()
+            self._search_menu = None
+
+    def _open_search_hit(self, kind, item_id):
+        """Место — центрируем карту на нём, экскурсия — показываем её маршрут."""
+        self._dismiss_search_menu()
+        if kind == "tour":
+            points = self.data_manager.get_points_for_tour(item_id)
+            self.show_route([point["place_id"] for point in points])
+        else:
+            self.focus_on_place_by_id(item_id)
 
     def focus_on_user_location(self):
-        """Заглушка под фокус на текущем местоположении пользователя.
+        """«Я здесь»: точка пользователя на карте, карта следует за ним.
 
-        В текущем прототипе просто возвращаемся к центру активного города.
+        Положение приходит подпиской на LocationService
+        (utils/location_service.py). Следование выключается, когда карту
+        сдвигают пальцем, а подписка — в reset_view. Пока положение
+        неизвестно (нет источника или первого измерения), карта показывает
+        центр активного города.
         """
-        self._center_on_active_city()
+        service = LocationService.get_instance()
+        self._follow_user = True
+        if service.last_fix is None:
+            self._center_on_active_city()
+        if service.available:
+            # Известное положение придёт сразу после подписки
+            service.subscribe(self._on_user_location, min_distance_m=USER_MARKER_MIN_MOVE_M)
+
+    def _on_user_location(self, fix):
+        map_view = self.ids.get("map_view")
+        if not map_view:
+            return
+        marker = self._user_marker
+        if marker is None:
+            marker = self._user_marker = UserLocationMarker(lat=fix.lat, lon=fix.lon)
+            map_view.bind(zoom=lambda *args: self._update_accuracy_circle())
+        else:
+            map_view.remove_widget(marker)
+            marker.lat, marker.lon = fix.lat, fix.lon
+        marker.accuracy_m = fix.accuracy or 0
+        map_view.add_widget(marker)
+        self._update_accuracy_circle()
+        if self._follow_user:
+            map_view.center_on(fix.lat, fix.lon)
+
+    def _update_accuracy_circle(self):
+        """Радиус круга точности в пикселях для текущего масштаба карты."""
+        marker = self._user_marker
+        map_view = self.ids.get("map_view")
+        if marker is None or not map_view:
+            return
+        tile_size = getattr(map_view.map_source, "dp_tile_size", 256)
+        meters_per_px = EARTH_CIRCUMFERENCE_M * math.cos(math.radians(marker.lat)) / (tile_size * 2 ** map_view.zoom)
+        marker.accuracy_px = marker.accuracy_m / meters_per_px
+
+    def _stop_following_user(self):
+        LocationService.get_instance().unsubscribe(self._on_user_location)
+        self._follow_user = False
+        map_view = self.ids.get("map_view")
+        if self._user_marker is not None and map_view:
+            map_view.remove_widget(self._user_marker)
 
     def reset_view(self):
         """Вернуть карту к виду по умолчанию: центр города и все маркеры."""
+        self.selected_category = ""
+        self._stop_following_user()
+        # Город мог смениться или быть скачан вместе с пакетом тайлов
+        self._update_map_source()
         self._center_on_active_city()
-        self._populate_markers()
+        # Сюда возвращаются после правки мест и смены города — индекс кластеров строим заново
+        self._populate_markers(rebuild_clusters=True)
 
     # --- Режим выбора координат для места ---
 
@@ -162,7 +370,9 @@ class MapScreen(MDScreen):
         except Exception:
             return
 
-        # Обновляем маркеры и центрируемся на новой точке
+        # Переносим место в индексе кластеров (не перестраивая его) и
+        # обновляем маркеры, затем центрируемся на новой точке
+        self._move_in_clusters(self.pick_place_id, lat, lon)
         map_view = self.ids.get("map_view")
         self._populate_markers()
         if map_view:
@@ -177,6 +387,17 @@ class MapScreen(MDScreen):
         self.pick_mode = False
         self.pick_place_id = 0
 
+    def _move_in_clusters(self, place_id, lat, lon):
+        if self._clusters is None:
+            if self._clusters_key is not None:
+                # Индекс ещё строится и мог прочитать старые координаты
+                self._build_clusters(self._clusters_key)
+            return
+        place = self.data_manager.get_place(place_id)
+        city_id, category = self._clusters_key
+        if place and place.get("city_id") == city_id and (not category or place.get("category") == category):
+            self._clusters.update(place_id, lat, lon)
+
     def on_touch_down(self, touch):
         """Обработка нажатий мыши/пальца.
 
@@ -196,10 +417,51 @@ class MapScreen(MDScreen):
                 self._apply_picked_coords(lat, lon)
                 return True
 
+        # Карту сдвигают сами — больше не возвращаем её к пользователю
+        map_view = self.ids.get("map_view")
+        if self._follow_user and map_view and map_view.collide_point(*touch.pos):
+            self._follow_user = False
+
         # Обычное поведение, если не в режиме выбора точки
         return super().on_touch_down(touch)
 
     def open_filters(self):
-        """Заглушка для будущей панели фильтров карты."""
-        # В дальнейшем здесь можно открыть отдельный экран/диалог фильтров.
-        pass
+        """Панель фильтров: категории мест с числом мест в каждой.
+
+        Счётчики — один GROUP BY по активному городу (get_category_counts,
+        кэшируется до изменения мест), выбранная категория отмечена галочкой.
+        """
+        from kivy.app import App
+        from kivymd.uix.menu import MDDropdownMenu
+
+        self._dismiss_filters_menu()
+        button = self.ids.get("map_filters_btn")
+        if button is None:
+            return
+        app = App.get_running_app()
+        lang = app.get_language_code() if hasattr(app, "get_language_code") else "ru"
+        counts = self.data_manager.get_category_counts(lang=lang)
+        items = []
+        for category in ("",) + PLACE_CATEGORIES:
+            text = app.get_text(f"places_filter_{category or 'all'}")
+            mark = "✓ " if category == self.selected_category else ""
+            items.append(
+                {
+                    "text": f"{mark}{text} ({counts.get(category, 0)})",
+                    "viewclass": "OneLineListItem",
+                    "on_release": lambda category=category: self.set_category_filter(category),
+                }
+            )
+        self._filters_menu = MDDropdownMenu(caller=button, items=items, width_mult=4)
+        self._filters_menu.open()
+
+    def _dismiss_filters_menu(self):
+        if self._filters_menu is not None:
+            self._filters_menu.dismiss()
+            self._filters_menu = None
+
+    def set_category_filter(self, category):
+        """Показать на карте только места категории category ('' — все)."""
+        self._dismiss_filters_menu()
+        self.selected_category = category
+        self._populate_markers()
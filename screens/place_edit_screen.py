@@ -16,7 +16,7 @@ class PlaceEditScreen(MDScreen):
     file_manager = None
 
     def set_place(self, place):
-        self.place = place or {}
+        self.place = dict(place) if place else {}
         self._refresh_fields()
 
     def on_pre_enter(self, *args):
@@ -1,3 +1,5 @@
+from collections import deque
+
 from kivy.properties import ListProperty, StringProperty
 from kivy.clock import Clock
 from kivy.uix.image import AsyncImage
@@ -9,7 +11,11 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.button import MDIconButton
 
 from data.data_manager import DataManager
+from data.listing import PLACE_CATEGORIES, SORT_NEARBY, SORT_RATING
+from data.spatial import haversine_m
+from utils.location_service import LocationService
 from utils.notifications import show_success, haptic_feedback
+from utils.search_controller import SearchController
 
 
 class PlacesScreen(MDScreen):
@@ -17,10 +23,38 @@ class PlacesScreen(MDScreen):
     search_query = StringProperty("")
     selected_category = StringProperty("")  # '', 'sight', 'food', 'museum', ...
     sort_mode = StringProperty("rating")
+    # Карточек за кадр: длинный список достраивается в следующих кадрах
+    CARDS_PER_FRAME = 20
+    # Мест на страницу; следующая подгружается при прокрутке к концу списка
+    PAGE_SIZE = 40
+    # Доля высоты списка от низа, при которой подгружается следующая страница
+    LOAD_MORE_THRESHOLD = 0.1
+    # Кнопки фильтров: (id в kv, категория, ключ текста); "" — все места
+    FILTER_BUTTONS = (("filter_all_btn", "", "places_filter_all"),) + tuple(
+        (f"filter_{category}_btn", category, f"places_filter_{category}") for category in PLACE_CATEGORIES
+    )
+    _search = None
+    _render_event = None
+    # Запрос показанного списка и ключ его следующей страницы (None — конец)
+    _page_request = None
+    _next_key = None
+    _pending_cards = None
+    # Число мест по категориям для текущего запроса (get_category_counts)
+    _category_counts = None
+    # Сортировка «Рядом»: текущее положение (lat, lon), положение показанного
+    # списка и подписи расстояний на карточках по id места
+    NEARBY_REQUERY_M = 15
+    _user_location = None
+    _shown_location = None
+    _distance_labels = None
 
     def on_kv_post(self, base_widget):
         super().on_kv_post(base_widget)
         self.data_manager = DataManager.get_instance()
+        # Поиск при наборе: с задержкой и в фоновом потоке, см. utils/search_controller.py
+        self._search = SearchController(
+            self._query_list, self._on_search_results, interrupt=self.data_manager.interrupt_reads
+        )
         self.load_places()
 
     def get_title(self):
@@ -50,17 +84,8 @@ class PlacesScreen(MDScreen):
             if hasattr(self, 'ids') and 'places_search_field' in self.ids:
                 self.ids.places_search_field.hint_text = app.get_text("places_search_hint")
             
-            # Обновляем кнопки фильтров
+            # Кнопки фильтров обновятся вместе со списком (load_places ниже)
             if hasattr(self, 'ids'):
-                if 'filter_all_btn' in self.ids:
-                    self.ids.filter_all_btn.text = app.get_text("places_filter_all")
-                if 'filter_sight_btn' in self.ids:
-                    self.ids.filter_sight_btn.text = app.get_text("places_filter_sight")
-                if 'filter_food_btn' in self.ids:
-                    self.ids.filter_food_btn.text = app.get_text("places_filter_food")
-                if 'filter_museum_btn' in self.ids:
-                    self.ids.filter_museum_btn.text = app.get_text("places_filter_museum")
-                
                 # Обновляем метку и кнопки сортировки
                 if 'sort_label' in self.ids:
                     self.ids.sort_label.text = app.get_text("places_sort_label")
@@ -68,6 +93,8 @@ class PlacesScreen(MDScreen):
                     self.ids.sort_rating_btn.text = app.get_text("places_sort_rating")
                 if 'sort_name_btn' in self.ids:
                     self.ids.sort_name_btn.text = app.get_text("places_sort_name")
+                if 'sort_nearby_btn' in self.ids:
+                    self.ids.sort_nearby_btn.text = app.get_text("places_sort_nearby")
             
             # Перезагружаем места, чтобы обновить карточки с новым языком
             self.load_places()
@@ -76,7 +103,8 @@ class PlacesScreen(MDScreen):
 
     def on_search_text(self, text):
         self.search_query = text
-        self.load_places()
+        if self._search is not None:
+            self._search.submit(self._places_request())
 
     def set_category_filter(self, category):
         # Повторное нажатие снимает фильтр
@@ -88,80 +116,197 @@ class PlacesScreen(MDScreen):
 
     def set_sort_mode(self, mode):
         self.sort_mode = mode
+        # Положение нужно только сортировке «Рядом» — подписка лишь на это время
+        service = LocationService.get_instance()
+        if mode == SORT_NEARBY:
+            service.subscribe(self._on_user_location, min_distance_m=self.NEARBY_REQUERY_M)
+        else:
+            service.unsubscribe(self._on_user_location)
         self.load_places()
 
-    def load_places(self, show_notification=False):
-        all_places = self.data_manager.get_all_places()
+    def _on_user_location(self, fix):
+        self.set_user_location(fix.lat, fix.lon)
+
+    def set_user_location(self, lat, lon):
+        """Новое положение пользователя; в режиме «Рядом» обновляет порядок и расстояния.
+
+        Пока сдвиг от показанного списка меньше NEARBY_REQUERY_M, список не
+        трогается. Иначе места перезапрашиваются (nearest_places считает
+        их в памяти, пока точка в пределах окна); если порядок не
+        изменился, на карточках меняются только подписи расстояний.
+        """
+        self._user_location = (lat, lon)
+        if self.sort_mode != SORT_NEARBY or self.search_query.strip():
+            return
+        shown = self._shown_location
+        if shown is not None and haversine_m(shown[0], shown[1], lat, lon) < self.NEARBY_REQUERY_M:
+            return
+        request = self._places_request()
+        count = max(len(self.places), self.PAGE_SIZE)
+        places = self.data_manager.nearest_places(
+            lat, lon, k=count, category=request[0], lang=request[3]
+        )
+        labels = self._distance_labels or {}
+        if request == self._page_request and [place["id"] for place in places] == [
+            place["id"] for place in self.places
+        ] and all(place["id"] in labels for place in places):
+            self._shown_location = (lat, lon)
+            self.places = places
+            for place in places:
+                labels[place["id"]].text = self._format_distance(place["distance_m"])
+            return
+        self._show_places(request, (places, len(places) if len(places) == count else None), self._category_counts)
+
+    def _current_location(self):
+        """Положение пользователя, а пока оно неизвестно — центр активного города."""
+        if self._user_location is not None:
+            return self._user_location
+        city = self.data_manager.get_active_city()
+        if city and city.get("center_lat") is not None and city.get("center_lon") is not None:
+            return city["center_lat"], city["center_lon"]
+        return None
+
+    def _places_request(self):
+        return (
+            self.selected_category or None,
+            self.search_query,
+            self.sort_mode,
+            self._language_code(),
+        )
+
+    def _query_places(self, request, after_key=None):
+        """Страница мест (места, ключ следующей) по (категория, запрос, сортировка, язык).
+
+        Фильтр, поиск, сортировка и пагинация выполняются в SQL, в список
+        попадают только поля карточки. Не трогает виджеты, поэтому
+        вызывается и из потока поиска.
+        """
+        category, query, sort_mode, lang = request
+        if sort_mode == SORT_NEARBY:
+            location = self._current_location()
+            if location is not None and not (query or "").strip():
+                # Страницы «Рядом» — следующие по удалённости; after_key — сколько мест уже показано
+                shown = after_key or 0
+                places = self.data_manager.nearest_places(
+                    *location, k=shown + self.PAGE_SIZE, category=category, lang=lang
+                )
+                next_key = len(places) if len(places) == shown + self.PAGE_SIZE else None
+                return places[shown:], next_key
+            # Поиск по тексту и неизвестное положение — по рейтингу
+            sort_mode = SORT_RATING
+        return self.data_manager.get_places_page(
+            category=category,
+            query=query,
+            sort=sort_mode,
+            after_key=after_key,
+            limit=self.PAGE_SIZE,
+            lang=lang,
+        )
+
+    def _query_list(self, request):
+        """Первая страница и число мест по категориям для запроса.
 
-        # Фильтр по категории
-        if self.selected_category:
-            all_places = [p for p in all_places if p.get("category") == self.selected_category]
+        Счётчики не зависят от выбранной категории: на каждой кнопке
+        фильтра видно, сколько мест она покажет с текущим поиском.
+        """
+        _category, query, _sort_mode, lang = request
+        counts = self.data_manager.get_category_counts(query=query, lang=lang)
+        return self._query_places(request), counts
 
-        # Поиск по названию и описанию
-        q = (self.search_query or "").strip().lower()
-        if q:
-            def match(p):
-                return q in (p.get("name", "").lower()) or q in (p.get("description", "").lower())
+    def _on_search_results(self, request, result):
+        self._show_places(request, *result)
 
-            all_places = [p for p in all_places if match(p)]
+    def load_places(self, show_notification=False):
+        # Явная перезагрузка заменяет результат поиска, который ещё не показан
+        if self._search is not None:
+            self._search.cancel()
+        request = self._places_request()
+        self._show_places(request, *self._query_list(request))
 
-        if self.sort_mode == "rating":
-            all_places.sort(key=lambda p: p.get("rating") or 0, reverse=True)
-        elif self.sort_mode == "name":
-            all_places.sort(key=lambda p: (p.get("name") or "").lower())
+        if show_notification:
+            haptic_feedback()
+            show_success(f"✅ Обновлено: {len(self.places)} мест")
 
-        self.places = all_places
+    def _show_places(self, request, page, counts=None):
+        places, next_key = page
+        self._page_request = request
+        self._next_key = next_key
+        self._category_counts = counts
+        self.places = places
+        self._distance_labels = {}
+        self._shown_location = self._current_location() if request[2] == SORT_NEARBY else None
         container = self.ids.get("places_list")
         if not container:
             return
+        if self._render_event is not None:
+            self._render_event.cancel()
+            self._render_event = None
         container.clear_widgets()
-        for place in self.places:
-            card = self._build_place_card(place)
-            container.add_widget(card)
-        
-        # Обновляем статические тексты кнопок
+        self._pending_cards = deque()
+        self._append_cards(places)
+
+        # Тексты кнопок фильтров с числом мест
         self._update_filter_buttons()
-        
-        if show_notification:
-            haptic_feedback()
-            show_success(f"✅ Обновлено: {len(self.places)} мест")
+
+    def _append_cards(self, places):
+        """Добавляет карточки в конец списка по CARDS_PER_FRAME за кадр."""
+        container = self.ids.get("places_list")
+        if not container:
+            return
+        self._pending_cards.extend(places)
+        if self._render_event is not None:
+            return
+
+        def add_batch(dt):
+            for _ in range(min(self.CARDS_PER_FRAME, len(self._pending_cards))):
+                container.add_widget(self._build_place_card(self._pending_cards.popleft()))
+            if self._pending_cards:
+                self._render_event = Clock.schedule_once(add_batch, 0)
+            else:
+                self._render_event = None
+
+        add_batch(0)
+
+    def load_more_places(self):
+        """Следующая страница показанного списка (бесконечная прокрутка)."""
+        if self._next_key is None or self._page_request is None:
+            return
+        places, next_key = self._query_places(self._page_request, self._next_key)
+        self._next_key = next_key
+        self.places = self.places + places
+        self._append_cards(places)
+
+    def on_places_scroll(self, scroll_view):
+        # scroll_y = 0 — низ списка; пока карточки дорисовываются, не подгружаем
+        if scroll_view.scroll_y <= self.LOAD_MORE_THRESHOLD and not self._pending_cards:
+            self.load_more_places()
+
+    def _format_distance(self, meters):
+        from kivy.app import App
+
+        app = App.get_running_app()
+        if meters < 1000:
+            # До километра — с точностью до 10 м: подпись не дёргается от шума координат
+            return app.get_text("distance_m").format(int(round(meters, -1)))
+        return app.get_text("distance_km").format(meters / 1000)
 
     def refresh_places(self):
         """Метод для pull-to-refresh."""
         self.load_places(show_notification=True)
     
     def _update_filter_buttons(self):
-        """Обновляет тексты кнопок фильтров и сортировки."""
+        """Тексты кнопок фильтров на языке интерфейса с числом мест: «Еда (12)»."""
         from kivy.app import App
         app = App.get_running_app()
-        
-        try:
-            # Обновляем кнопки фильтров - они пересоздаются при load_places
-            # Но нужно обновить их тексты программно
-            if hasattr(self, 'ids'):
-                # Находим все NeonButton в контейнерах фильтров
-                for child in self.children:
-                    if hasattr(child, 'children'):
-                        for grandchild in child.children:
-                            if hasattr(grandchild, 'children'):
-                                for btn in grandchild.children:
-                                    if hasattr(btn, 'text') and hasattr(btn, 'on_release'):
-                                        # Это кнопка фильтра или сортировки
-                                        # Обновляем текст на основе текущего языка
-                                        if "places_filter_all" in str(btn.on_release) or not self.selected_category:
-                                            btn.text = app.get_text("places_filter_all")
-                                        elif "sight" in str(btn.on_release) or self.selected_category == "sight":
-                                            btn.text = app.get_text("places_filter_sight")
-                                        elif "food" in str(btn.on_release) or self.selected_category == "food":
-                                            btn.text = app.get_text("places_filter_food")
-                                        elif "museum" in str(btn.on_release) or self.selected_category == "museum":
-                                            btn.text = app.get_text("places_filter_museum")
-                                        elif "rating" in str(btn.on_release) or self.sort_mode == "rating":
-                                            btn.text = app.get_text("places_sort_rating")
-                                        elif "name" in str(btn.on_release) or self.sort_mode == "name":
-                                            btn.text = app.get_text("places_sort_name")
-        except Exception:
-            pass
+
+        counts = self._category_counts or {}
+        for button_id, category, text_key in self.FILTER_BUTTONS:
+            button = self.ids.get(button_id)
+            if button is None:
+                continue
+            text = app.get_text(text_key)
+            count = counts.get(category, 0 if counts else None)
+            button.text = f"{text} ({count})" if count is not None else text
 
     def toggle_favorite_from_list(self, place_id, icon_widget):
         dm = self.data_manager
@@ -191,17 +336,24 @@ class PlacesScreen(MDScreen):
 
         app = App.get_running_app()
         sm = app.sm
-        place = self.data_manager.get_place(item.place_id)
+        place = self.data_manager.get_place(item.place_id, lang=self._language_code())
         if not place:
             return
         detail_screen = sm.get_screen("place_detail")
-        detail_screen.place = place
+        detail_screen.place = dict(place)
         sm.current = "place_detail"
 
+    def _language_code(self):
+        from kivy.app import App
+
+        app = App.get_running_app()
+        if hasattr(app, "get_language_code"):
+            return app.get_language_code()
+        return "ru"
+
     def _build_place_card(self, place):
         from kivy.metrics import dp
         from kivy.app import App
-        import json
 
         app = App.get_running_app()
         
@@ -219,49 +371,12 @@ class PlacesScreen(MDScreen):
         )
         card.place_id = place["id"]
 
-        # Определяем язык и выбираем правильные поля
-        # Используем get_language_code() для правильного определения языка
-        # Это гарантирует, что мы используем актуальный язык из настроек
-        if hasattr(app, "get_language_code"):
-            lang = app.get_language_code()
-        else:
-            lang = "ru"
-
-        # Используем правильные поля из базы данных с fallback
-        if lang == "en":
-            # Для английского: сначала name_en, потом name_ru, потом name
-            name = place.get("name_en") or place.get("name_ru") or place.get("name") or ""
-            short_desc = (
-                place.get("short_desc_en")
-                or place.get("short_desc_ru")
-                or place.get("short_desc")
-                or ""
-            )
-            description = (
-                place.get("description_en")
-                or place.get("description_ru")
-                or place.get("description")
-                or ""
-            )
-        else:
-            # Для русского: сначала name_ru, потом name
-            name = place.get("name_ru") or place.get("name") or ""
-            short_desc = place.get("short_desc_ru") or place.get("short_desc") or ""
-            description = place.get("description_ru") or place.get("description") or ""
+        # name и short_desc уже на языке интерфейса (get_place_cards(lang=...))
+        name = place.get("name") or ""
+        short_desc = place.get("short_desc") or ""
 
         # Изображение места (первая фотка из image_urls, если есть)
-        image_source = ""
-        raw_images = place.get("image_urls")
-        urls = []
-        if isinstance(raw_images, str):
-            try:
-                urls = json.loads(raw_images)
-            except Exception:
-                urls = []
-        elif isinstance(raw_images, (list, tuple)):
-            urls = list(raw_images)
-        if urls:
-            image_source = urls[0]
+        image_source = place.get("first_image") or ""
 
         # Нормализуем локальные пути, чтобы AsyncImage понимал их на Android
         try:
@@ -310,6 +425,21 @@ class PlacesScreen(MDScreen):
 
         header.add_widget(rating_label)
         header.add_widget(title_label)
+        # Расстояние есть у мест из nearest_places (сортировка «Рядом»)
+        distance = place.get("distance_m")
+        if distance is not None:
+            distance_label = MDLabel(
+                text=self._format_distance(distance),
+                theme_text_color="Secondary",
+                font_style="Caption",
+                halign="right",
+                size_hint_x=None,
+                width=dp(64),
+                max_lines=1,
+            )
+            header.add_widget(distance_label)
+            if self._distance_labels is not None:
+                self._distance_labels[place["id"]] = distance_label
         content_box.add_widget(header)
 
         # Краткое описание
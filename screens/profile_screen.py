@@ -5,6 +5,8 @@ from kivymd.uix.list import TwoLineRightIconListItem, IconRightWidget
 from kivymd.uix.dialog import MDDialog
 
 from data.data_manager import DataManager
+from data.tile_cache import TileCache
+from utils.tile_cache_source import pin_downloaded_cities
 
 
 class ProfileScreen(MDScreen):
@@ -25,6 +27,8 @@ class ProfileScreen(MDScreen):
     stats_title = StringProperty("Моя статистика:")
     achievements_title = StringProperty("Достижения:")
     cities_title = StringProperty("Мои города:")
+    storage_title = StringProperty("Хранилище:")
+    storage_text = StringProperty("")
 
     def on_kv_post(self, base_widget):
         super().on_kv_post(base_widget)
@@ -38,11 +42,37 @@ class ProfileScreen(MDScreen):
                 pass
         self.load_cities()
         self.update_stats()
+        self.update_storage_stats()
 
     def on_pre_enter(self, *args):
         super().on_pre_enter(*args)
         self.load_cities()
         self.update_stats()
+        self.update_storage_stats()
+
+    def update_storage_stats(self):
+        """Раздел «Хранилище»: объём и эффективность кэша тайлов карты (data/tile_cache.py)."""
+        get_text = self.app.get_text
+        stats = TileCache.get_instance().stats()
+        megabyte = 1024 * 1024
+        lines = [
+            get_text("storage_cache_size").format(
+                stats["bytes"] / megabyte, stats["quota_bytes"] / megabyte, stats["tiles"]
+            ),
+            get_text("storage_pinned").format(stats["pinned_bytes"] / megabyte),
+        ]
+        requests = stats["hits"] + stats["misses"]
+        if requests:
+            lines.append(get_text("storage_hit_rate").format(stats["hit_rate"] * 100, stats["hits"], requests))
+        else:
+            lines.append(get_text("storage_no_requests"))
+        self.storage_title = get_text("storage_title")
+        self.storage_text = "\n".join(lines)
+
+    def clear_map_cache(self):
+        """Удаляет из кэша тайлы карты, кроме закреплённых за скачанными городами."""
+        TileCache.get_instance().clear()
+        self.update_storage_stats()
 
     def show_about(self):
         if hasattr(self, "_about_dialog") and self._about_dialog:
@@ -361,10 +391,10 @@ class ProfileScreen(MDScreen):
 
     def download_city(self, city_id):
         # Для пользователя это просто пометка, что город скачан (без реальной загрузки JSON)
-        cur = self.data_manager.conn.cursor()
-        cur.execute("UPDATE cities SET is_downloaded = 1 WHERE id = ?", (city_id,))
-        self.data_manager.conn.commit()
+        self.data_manager.mark_city_downloaded(city_id)
+        pin_downloaded_cities(self.data_manager)
         self.load_cities()
+        self.update_storage_stats()
 
     def refresh_data(self):
         """Перезагружает данные мест из JSON и обновляет связанные экраны.
@@ -450,6 +480,7 @@ class ProfileScreen(MDScreen):
                 
                 # Обновляем заголовки в ProfileScreen
                 self.update_stats()
+                self.update_storage_stats()
                 
                 # Обновляем заголовки TopAppBar во всех экранах
                 self._update_top_appbars(root)
@@ -622,16 +653,17 @@ class ProfileScreen(MDScreen):
             if not new_username:
                 return
 
-            # Обновляем логин/пароль и роль через существующий метод
-            dm.update_user(user_id, username=new_username, password_plain=new_password, role=role)
-
-            # Обновляем дополнительные поля профиля
-            cur = dm.conn.cursor()
-            cur.execute(
-                "UPDATE users SET first_name = ?, last_name = ?, email = ?, secret_word = ? WHERE id = ?",
-                (new_first_name, new_last_name, new_email, new_secret_word, user_id),
+            # Логин/пароль, роль и дополнительные поля профиля — одной транзакцией
+            dm.update_user(
+                user_id,
+                username=new_username,
+                password_plain=new_password,
+                role=role,
+                first_name=new_first_name,
+                last_name=new_last_name,
+                email=new_email,
+                secret_word=new_secret_word,
             )
-            dm.conn.commit()
 
             # Если редактируем текущего активного пользователя — обновляем настройки
             store = app._get_settings_store()
@@ -17,7 +17,7 @@ class TourDetailScreen(MDScreen):
     _image_dialog = None
 
     def set_tour(self, tour):
-        self.tour = tour
+        self.tour = dict(tour) if tour else {}
         self._load_points()
         self.refresh_view()
 
@@ -34,26 +34,14 @@ class TourDetailScreen(MDScreen):
         image_source = self.tour.get("cover_image") or ""
         if not image_source:
             try:
-                import json
-
                 points = self.points or []
                 if points:
                     first_point = points[0]
                     place_id = first_point.get("place_id")
                     if place_id:
                         place = dm.get_place(place_id)
-                        if place:
-                            raw = place.get("image_urls")
-                            urls = []
-                            if isinstance(raw, str):
-                                try:
-                                    urls = json.loads(raw)
-                                except Exception:
-                                    urls = []
-                            elif isinstance(raw, (list, tuple)):
-                                urls = list(raw)
-                            if urls:
-                                image_source = urls[0]
+                        if place and place.image_urls:
+                            image_source = place.image_urls[0]
             except Exception:
                 image_source = ""
 
@@ -15,7 +15,7 @@ class TourEditScreen(MDScreen):
     file_manager = None
 
     def set_tour(self, tour):
-        self.tour = tour or {}
+        self.tour = dict(tour) if tour else {}
         self._refresh_fields()
 
     def on_pre_enter(self, *args):
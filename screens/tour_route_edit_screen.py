@@ -8,7 +8,6 @@ from kivy.core.window import Window
 
 from data.data_manager import DataManager
 import os
-import json
 import shutil
 
 
@@ -24,7 +23,7 @@ class TourRouteEditScreen(MDScreen):
 
     def set_tour(self, tour):
         """Устанавливает текущую экскурсию и загружает её точки."""
-        self.tour = tour or {}
+        self.tour = dict(tour) if tour else {}
         self._load_points()
 
     def _load_points(self):
@@ -45,16 +44,8 @@ class TourRouteEditScreen(MDScreen):
             if "\n" in full_story:
                 title, body = full_story.split("\n", 1)
             place_name = place.get("name") if place else f"#{p.get('place_id')}"
-            # image_urls может быть JSON-строкой или уже списком (на будущее)
-            raw_images = p.get("image_urls")
-            image_urls = []
-            if isinstance(raw_images, str) and raw_images:
-                try:
-                    image_urls = json.loads(raw_images)
-                except Exception:
-                    image_urls = []
-            elif isinstance(raw_images, (list, tuple)):
-                image_urls = list(raw_images)
+            # TourPoint уже отдаёт image_urls списком; копия — чтобы правки не трогали запись
+            image_urls = list(p.get("image_urls") or [])
             points.append(
                 {
                     "place_id": p.get("place_id"),
@@ -3,17 +3,30 @@ from kivy.properties import DictProperty, ListProperty, NumericProperty, StringP
 from kivymd.uix.screen import MDScreen
 
 from data.data_manager import DataManager
+from data.location import GeofenceSet
+from utils.location_service import LocationService
+from utils.notifications import show_info
 from kivy.uix.carousel import Carousel
 from kivy.uix.image import AsyncImage
 from kivymd.uix.dialog import MDDialog
 from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.button import MDFlatButton
 from kivy.metrics import dp
-import json
+
+
+# Точка экскурсии считается достигнутой ближе этого расстояния до места
+TOUR_POINT_RADIUS_M = 35
+# Геозоны проверяются после сдвига пользователя хотя бы на столько метров
+TOUR_LOCATION_MIN_MOVE_M = 3
 
 
 class TourRunScreen(MDScreen):
-    """Простой режим прохождения экскурсии (линейный, без аудио и GPS)."""
+    """Простой режим прохождения экскурсии (линейный, без аудио).
+
+    Точки переключаются кнопками, а когда положение пользователя известно
+    (utils/location_service.py) — и сами: у каждой точки геозона, и при
+    входе в неё экран показывает эту точку.
+    """
 
     tour = DictProperty()
     points = ListProperty()
@@ -24,13 +37,52 @@ class TourRunScreen(MDScreen):
 
     def start_tour(self, tour):
         """Инициализация экскурсии и переход к первой точке."""
-        self.tour = tour
+        self.tour = dict(tour)
         dm = DataManager.get_instance()
         self.points = dm.get_points_for_tour(tour["id"])
         self.current_index = 0
         self._update_view(save_progress=True)
+        self._watch_points()
 
     _image_dialog = None
+    _geofences = None
+
+    def _watch_points(self):
+        """Геозоны вокруг мест экскурсии и подписка на положение пользователя."""
+        # Зоны прошлой экскурсии больше не нужны
+        self._stop_watching_points()
+        dm = DataManager.get_instance()
+        self._geofences = GeofenceSet()
+        for index, point in enumerate(self.points):
+            place = dm.get_place(point["place_id"])
+            if place and place.get("lat") is not None and place.get("lon") is not None:
+                self._geofences.add(index, place["lat"], place["lon"], TOUR_POINT_RADIUS_M)
+        service = LocationService.get_instance()
+        if len(self._geofences) and service.available:
+            service.subscribe(self._on_user_location, min_distance_m=TOUR_LOCATION_MIN_MOVE_M)
+
+    def _stop_watching_points(self):
+        """Отписка от положения: GPS не работает зря, прогресс не пишется в фоне."""
+        LocationService.get_instance().unsubscribe(self._on_user_location)
+        self._geofences = None
+
+    def on_leave(self, *args):
+        # Ушли с экрана не через «Завершить» (назад, нижняя навигация)
+        self._stop_watching_points()
+
+    def _on_user_location(self, fix):
+        if self._geofences is None:
+            return
+        for event, index in self._geofences.update(fix):
+            if event != "enter" or index == self.current_index:
+                continue
+            self.current_index = index
+            self._update_view(save_progress=True)
+            from kivy.app import App
+
+            app = App.get_running_app()
+            place = DataManager.get_instance().get_place(self.points[index]["place_id"])
+            show_info(app.get_text("tour_point_reached").format(place.get("name", "") if place else ""))
 
     def _update_view(self, save_progress=False):
         ids = self.ids
@@ -59,27 +111,9 @@ class TourRunScreen(MDScreen):
 
         # Картинки текущей точки: сначала берём собственные image_urls точки,
         # если их нет — фото места.
-        raw_point_images = point.get("image_urls")
-        image_urls = []
-        if isinstance(raw_point_images, str) and raw_point_images:
-            try:
-                image_urls = json.loads(raw_point_images)
-            except Exception:
-                image_urls = []
-        elif isinstance(raw_point_images, (list, tuple)):
-            image_urls = list(raw_point_images)
+        image_urls = point.image_urls
         if not image_urls and place is not None:
-            try:
-                raw = place.get("image_urls")
-                if isinstance(raw, str) and raw:
-                    try:
-                        image_urls = json.loads(raw)
-                    except Exception:
-                        image_urls = []
-                elif isinstance(raw, (list, tuple)):
-                    image_urls = list(raw)
-            except Exception:
-                image_urls = []
+            image_urls = place.image_urls
 
         carousel = ids.get("point_image_carousel")
         if carousel is not None:
@@ -259,6 +293,8 @@ class TourRunScreen(MDScreen):
         """Завершение экскурсии: сохраняем как завершённую и выходим."""
         from kivy.app import App
 
+        self._stop_watching_points()
+
         if self.tour and self.points:
             dm = DataManager.get_instance()
             dm.upsert_user_tour_progress(
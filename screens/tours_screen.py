@@ -9,7 +9,6 @@ from kivymd.uix.label import MDLabel
 from kivymd.uix.button import MDRaisedButton
 
 from data.data_manager import DataManager
-import json
 
 
 class TourCard(MDCard):
@@ -30,32 +29,9 @@ class TourCard(MDCard):
         self.radius = [dp(15), dp(15), dp(15), dp(15)]
         self.elevation = 2
 
-        # Обложка экскурсии: сначала берём cover_image, если задано админом,
-        # иначе пробуем найти фото по первой точке тура
-        image_source = tour_data.get("cover_image") or ""
-        if not image_source:
-            try:
-                dm = DataManager.get_instance()
-                points = dm.get_points_for_tour(self.tour_id) or []
-                if points:
-                    first_point = points[0]
-                    place_id = first_point.get("place_id")
-                    if place_id:
-                        place = dm.get_place(place_id)
-                        if place:
-                            raw = place.get("image_urls")
-                            urls = []
-                            if isinstance(raw, str):
-                                try:
-                                    urls = json.loads(raw)
-                                except Exception:
-                                    urls = []
-                            elif isinstance(raw, (list, tuple)):
-                                urls = list(raw)
-                            if urls:
-                                image_source = urls[0]
-            except Exception:
-                image_source = ""
+        # Обложка экскурсии: cover_image, если задано админом, иначе фото
+        # места первой точки — get_tour_cards уже выбрал его в first_image
+        image_source = tour_data.get("first_image") or tour_data.get("cover_image") or ""
 
         # Нормализуем локальные пути, чтобы AsyncImage понимал их на Android
         try:
@@ -121,10 +97,12 @@ class TourCard(MDCard):
         )
 
         # Количество остановок
-        stops = tour_data.get("points") or []
+        stops_count = tour_data.get("points_count")
+        if stops_count is None:
+            stops_count = len(tour_data.get("points") or [])
         info_layout.add_widget(
             MDLabel(
-                text=get_text("stops_count").format(len(stops)),
+                text=get_text("stops_count").format(stops_count),
                 theme_text_color="Secondary",
                 adaptive_height=True,
             )
@@ -244,7 +222,7 @@ class ToursScreen(MDScreen):
         self.load_tours()
 
     def load_tours(self):
-        tours = self.data_manager.get_all_tours_with_progress()
+        tours = self.data_manager.get_tour_cards()
 
         # фильтр по категории (theme)
         if self.selected_category:
@@ -146,15 +146,17 @@ class UsersAdminScreen(MDScreen):
                     new_role = "admin" if role_switch.active else "user"
 
                     dm = DataManager.get_instance()
-                    # Обновляем основные поля (логин/пароль/роль)
-                    dm.update_user(user_id, username=new_username, password_plain=new_password, role=new_role)
-                    # Обновляем дополнительные поля профиля
-                    cur = dm.conn.cursor()
-                    cur.execute(
-                        "UPDATE users SET first_name = ?, last_name = ?, email = ?, secret_word = ? WHERE id = ?",
-                        (new_first_name, new_last_name, new_email, new_secret_word, user_id),
+                    # Основные поля (логин/пароль/роль) и дополнительные поля профиля
+                    dm.update_user(
+                        user_id,
+                        username=new_username,
+                        password_plain=new_password,
+                        role=new_role,
+                        first_name=new_first_name,
+                        last_name=new_last_name,
+                        email=new_email,
+                        secret_word=new_secret_word,
                     )
-                    dm.conn.commit()
                     # Обновляем текущий user в настройках, если редактировали активного
                     base = app._get_user()
                     if base and base.get("username") == username:
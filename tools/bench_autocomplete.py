@@ -0,0 +1,52 @@
+"""Память и скорость индекса автодополнения (data/autocomplete.py).
+
+Строит AutocompleteIndex по синтетическим названиям (как в bench_search)
+и печатает время построения, память, которую занимает индекс, и медиану
+времени одного запроса подсказок.
+
+Запуск из корня проекта:
+    python -m tools.bench_autocomplete --sizes 10000 100000
+"""
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from data.autocomplete import AutocompleteIndex
+from tools.bench_search import make_places
+
+
+PREFIXES = ("с", "со", "собо", "парк", "кра", "набер", "цар", "планетарий", "старый со", "№12")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--limit", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'names':>8} {'build, s':>9} {'memory, MB':>11} {'query, us':>10}")
+    for size in args.sizes:
+        entries = [("place", place["id"], place["name"]) for place in make_places(size)]
+        started = time.perf_counter()
+        index = AutocompleteIndex(1, "ru", entries)
+        build_s = time.perf_counter() - started
+        # Память меряем отдельным построением: tracemalloc сильно его замедляет
+        del index
+        tracemalloc.start()
+        index = AutocompleteIndex(1, "ru", entries)
+        memory_mb = tracemalloc.get_traced_memory()[0] / 1e6
+        tracemalloc.stop()
+
+        timings = []
+        for _ in range(args.repeats):
+            for prefix in PREFIXES:
+                started = time.perf_counter()
+                index.complete(prefix, args.limit)
+                timings.append((time.perf_counter() - started) * 1e6)
+        print(f"{size:>8} {build_s:>9.2f} {memory_mb:>11.1f} {statistics.median(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Запросы по области карты: R*Tree против прохода по places.
+
+Заполняет временную базу местами вокруг центра города (плотнее к центру,
+как в жизни) и меряет медиану времени запроса для областей экрана разного
+масштаба: get_places_in_bbox (до BBOX_PLACES_LIMIT лучших мест),
+count_places_in_bbox и прежний способ — условие по lat/lon без индекса.
+Места вставляются напрямую в places, минуя полнотекстовый и нечёткий
+индексы, которые здесь не нужны; R*Tree строится одним проходом.
+
+Запуск из корня проекта:
+    python -m tools.bench_bbox --sizes 100000 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from data.data_manager import DataManager
+from data.search import drop_search_triggers
+from data.spatial import rebuild_spatial_index
+
+
+CENTER = (55.75, 37.62)
+# Половина стороны области экрана в градусах: район, квартал, улица
+VIEWPORTS = {"district": 0.05, "block": 0.01, "street": 0.002}
+
+
+def fill_places(dm, count, seed=1):
+    rnd = random.Random(seed)
+    drop_search_triggers(dm.conn)
+    dm.conn.execute("DELETE FROM places")
+    dm.conn.executemany(
+        "INSERT INTO places (id, name, category, lat, lon, rating, city_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i + 1,
+                f"Место {i}",
+                ("sight", "food", "museum")[i % 3],
+                rnd.gauss(CENTER[0], 0.1),
+                rnd.gauss(CENTER[1], 0.15),
+                round(rnd.uniform(3, 5), 1),
+                1,
+            )
+            for i in range(count)
+        ),
+    )
+    rebuild_spatial_index(dm.conn)
+    dm.conn.commit()
+
+
+def viewports(half, count, seed=2):
+    rnd = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        lat = rnd.gauss(CENTER[0], 0.05)
+        lon = rnd.gauss(CENTER[1], 0.08)
+        boxes.append((lat - half, lon - half * 1.8, lat + half, lon + half * 1.8))
+    return boxes
+
+
+def scan_places(dm, box):
+    """Прежний способ: условие по обычным колонкам lat/lon."""
+    min_lat, min_lon, max_lat, max_lon = box
+    return dm.conn.execute(
+        "SELECT id, name, category, rating, lat, lon FROM places "
+        "WHERE city_id = 1 AND lat BETWEEN ? AND ? AND lon BETWEEN ? AND ?",
+        (min_lat, max_lat, min_lon, max_lon),
+    ).fetchall()
+
+
+def median_ms(func, boxes):
+    timings = []
+    for box in boxes:
+        started = time.perf_counter()
+        func(box)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'places':>8} {'viewport':>9} {'in box':>7} {'scan, ms':>9} {'bbox, ms':>9} {'count, ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dm = DataManager(os.path.join(tmp, "bbox.db"))
+            fill_places(dm, size)
+            for name, half in VIEWPORTS.items():
+                boxes = viewports(half, args.queries)
+                found = statistics.median(dm.count_places_in_bbox(*box, city_id=1) for box in boxes)
+                scan_ms = median_ms(lambda box: scan_places(dm, box), boxes[: max(1, args.queries // 5)])
+                bbox_ms = median_ms(lambda box: dm.get_places_in_bbox(*box, city_id=1), boxes)
+                count_ms = median_ms(lambda box: dm.count_places_in_bbox(*box, city_id=1), boxes)
+                print(f"{size:>8} {name:>9} {found:>7.0f} {scan_ms:>9.1f} {bbox_ms:>9.2f} {count_ms:>10.2f}")
+            dm.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Построение и запросы индекса кластеров карты (data/clusters.py).
+
+Строит ClusterIndex по местам вокруг центра города (как в bench_bbox) и
+печатает время построения, медиану времени кластеров для области экрана
+телефона на каждом масштабе и время переноса одного места.
+
+Запуск из корня проекта:
+    python -m tools.bench_clusters --sizes 10000 100000
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+
+from data.clusters import MAX_CLUSTER_ZOOM, TILE_SIZE, ClusterIndex
+from tools.bench_bbox import CENTER
+
+
+SCREEN_PX = (1080, 2000)
+
+
+def make_points(count, seed=1):
+    rnd = random.Random(seed)
+    return [(i + 1, rnd.gauss(CENTER[0], 0.1), rnd.gauss(CENTER[1], 0.15)) for i in range(count)]
+
+
+def screen_bbox(lat, lon, zoom):
+    """Область экрана SCREEN_PX с центром (lat, lon) на масштабе zoom."""
+    degrees_per_px = 360.0 / (TILE_SIZE << zoom)
+    half_lon = SCREEN_PX[0] / 2 * degrees_per_px
+    half_lat = SCREEN_PX[1] / 2 * degrees_per_px * math.cos(math.radians(lat))
+    return lat - half_lat, lon - half_lon, lat + half_lat, lon + half_lon
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    rnd = random.Random(2)
+    for size in args.sizes:
+        points = make_points(size)
+        started = time.perf_counter()
+        index = ClusterIndex(points)
+        build_s = time.perf_counter() - started
+        timings = []
+        for _ in range(args.queries):
+            place_id = rnd.randint(1, size)
+            started = time.perf_counter()
+            index.update(place_id, rnd.gauss(CENTER[0], 0.1), rnd.gauss(CENTER[1], 0.15))
+            timings.append((time.perf_counter() - started) * 1e6)
+        print(f"{size} places: build {build_s:.2f} s, move one place {statistics.median(timings):.0f} us")
+        print(f"{'zoom':>6} {'clusters':>9} {'query, ms':>10}")
+        for zoom in range(8, MAX_CLUSTER_ZOOM + 1):
+            timings = []
+            found = []
+            for _ in range(args.queries):
+                box = screen_bbox(rnd.gauss(CENTER[0], 0.05), rnd.gauss(CENTER[1], 0.08), zoom)
+                started = time.perf_counter()
+                found.append(len(index.clusters(*box, zoom)))
+                timings.append((time.perf_counter() - started) * 1000)
+            print(f"{zoom:>6} {statistics.median(found):>9.0f} {statistics.median(timings):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
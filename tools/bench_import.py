@@ -0,0 +1,95 @@
+"""Сравнение построчной загрузки города с DataManager.bulk_import.
+
+Построчный путь — insert_place / insert_tour_with_points с фиксацией на
+каждую запись (так раньше работали download_city_data и начальная загрузка).
+
+Запуск из корня проекта:
+    python -m tools.bench_import --places 20000 --tours 500
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from data.data_manager import DataManager
+
+
+def make_city(places_count, tours_count, city_id=2):
+    places = [
+        {
+            "id": 100000 + i,
+            "category": ("sight", "food", "museum")[i % 3],
+            "name": f"Место {i}",
+            "short_desc": f"Кратко о месте {i}",
+            "description": f"Подробное описание места {i}. " * 4,
+            "lat": 59.9 + (i % 500) / 5000.0,
+            "lon": 30.3 + (i // 500) / 5000.0,
+            "address": f"Улица {i}",
+            "price": "Бесплатно",
+            "hours": "10:00–18:00",
+            "rating": 4.0 + (i % 10) / 10.0,
+            "image_urls": [],
+        }
+        for i in range(places_count)
+    ]
+    tours = [
+        {
+            "id": 10000 + t,
+            "title": f"Экскурсия {t}",
+            "description": "Маршрут по центру",
+            "theme": "history",
+            "points": [
+                {"place_id": 100000 + (t * 5 + k) % max(places_count, 1), "order_index": k + 1}
+                for k in range(5)
+            ],
+        }
+        for t in range(tours_count)
+    ]
+    for row in places + tours:
+        row["city_id"] = city_id
+    return places, tours
+
+
+def per_row(dm, places, tours):
+    for place in places:
+        dm.insert_place(place)
+    for tour in tours:
+        dm.insert_tour_with_points(tour)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, default=20000)
+    parser.add_argument("--tours", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    args = parser.parse_args()
+
+    places, tours = make_city(args.places, args.tours)
+    rows = len(places) + len(tours) + sum(len(t["points"]) for t in tours)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm = DataManager(os.path.join(tmp, "per_row.db"))
+        started = time.perf_counter()
+        per_row(dm, places, tours)
+        per_row_seconds = time.perf_counter() - started
+        dm.close()
+
+        dm = DataManager(os.path.join(tmp, "bulk.db"))
+        started = time.perf_counter()
+        stats = dm.bulk_import(
+            places,
+            tours,
+            chunk_size=args.chunk_size,
+            progress=lambda done, rate: None,
+        )
+        bulk_seconds = time.perf_counter() - started
+        dm.close()
+
+    print(f"rows: {rows} ({len(places)} places, {len(tours)} tours)")
+    print(f"per-row insert: {per_row_seconds:.2f} s ({rows / per_row_seconds:,.0f} rows/s)")
+    print(f"bulk_import:    {bulk_seconds:.2f} s ({rows / bulk_seconds:,.0f} rows/s)")
+    print(f"bulk stats: {stats}")
+
+
+if __name__ == "__main__":
+    main()
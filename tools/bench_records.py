@@ -0,0 +1,92 @@
+"""Память и время загрузки мест через get_all_places.
+
+Сравнивает записи Place (data/records.py) с прежним способом — dict на
+каждую строку и json.loads(image_urls) в коде экрана при каждом
+построении карточки. Память — сколько удерживает загруженный список
+(tracemalloc), время — сама загрузка и несколько проходов «первая
+картинка каждого места», как при повторном построении карточек.
+
+Запуск из корня проекта:
+    python -m tools.bench_records --places 100000
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+from data.data_manager import DataManager
+from tools.bench_import import make_city
+
+
+def load_dicts(dm):
+    """Прежняя реализация get_all_places."""
+    city = dm.get_active_city()
+    cur = dm.conn.cursor()
+    cur.execute("SELECT * FROM places WHERE city_id = ?", (city["id"],))
+    columns = [c[0] for c in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def first_image_from_dict(place):
+    raw = place.get("image_urls")
+    urls = json.loads(raw) if isinstance(raw, str) and raw else []
+    return urls[0] if urls else ""
+
+
+def first_image_from_record(place):
+    return place.image_urls[0] if place.image_urls else ""
+
+
+def measure(load, first_image, passes):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    places = load()
+    load_seconds = time.perf_counter() - started
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    pass_seconds = []
+    for _ in range(passes):
+        started = time.perf_counter()
+        for place in places:
+            first_image(place)
+        pass_seconds.append(time.perf_counter() - started)
+    return len(places), retained, load_seconds, pass_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--passes", type=int, default=3, help="сколько раз строятся «карточки»")
+    args = parser.parse_args()
+
+    places, _tours = make_city(args.places, 0, city_id=1)
+    for i, place in enumerate(places):
+        place["image_urls"] = [f"https://example.org/img/{i}_{k}.jpg" for k in range(3)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dm = DataManager(os.path.join(tmp, "records.db"))
+        dm.conn.execute("DELETE FROM places")
+        dm.bulk_import(places)
+        del places
+
+        results = [
+            ("dict + json.loads", measure(lambda: load_dicts(dm), first_image_from_dict, args.passes)),
+            ("Place records", measure(dm.get_all_places, first_image_from_record, args.passes)),
+        ]
+        dm.close()
+
+    for label, (count, retained, load_seconds, pass_seconds) in results:
+        passes = " / ".join(f"{seconds * 1000:.0f}" for seconds in pass_seconds)
+        print(
+            f"{label:18} {count} rows, retained {retained / 2**20:6.1f} MB, "
+            f"load {load_seconds * 1000:5.0f} ms, first image per pass {passes} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
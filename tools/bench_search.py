@@ -0,0 +1,120 @@
+"""Задержка поиска в зависимости от числа мест: FTS5 и триграммы против прохода в Python.
+
+Прежний поиск (PlacesScreen.load_places, MapScreen.on_search_text) на
+каждое нажатие загружал все места города и проверял подстроку в name и
+description. Здесь он сравнивается с DataManager.search. Кэш запросов
+перед каждым поиском очищается, чтобы мерить сам запрос. Отдельно
+меряется нечёткий поиск (DataManager.fuzzy_search) на запросах с
+опечатками и латиницей — он должен укладываться в бюджет поиска при
+наборе текста.
+
+Запуск из корня проекта:
+    python -m tools.bench_search --sizes 1000 10000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from data.data_manager import DataManager
+
+
+WORDS = (
+    "собор", "парк", "музей", "площадь", "мост", "башня", "сад", "театр",
+    "набережная", "галерея", "усадьба", "фонтан", "монастырь", "рынок",
+    "бульвар", "дворец", "храм", "причал", "библиотека", "планетарий",
+)
+ADJECTIVES = (
+    "старый", "новый", "красный", "зелёный", "северный", "южный", "речной",
+    "каменный", "летний", "городской", "торговый", "царский",
+)
+QUERIES = ("собор", "парк красн", "набереж", "дворец царск", "планетар", "музей старый")
+FUZZY_QUERIES = ("sobr", "park krasny", "naberezhnaja", "dvorets tsarsky", "planetari", "muzei stary")
+
+
+SYLLABLES = ("ка", "ло", "ми", "ре", "сто", "ва", "ну", "пе", "до", "ри", "та", "зо")
+
+
+def make_vocabulary(rnd, size=5000):
+    """Случайные «слова» для описаний, чтобы совпадения были избирательными, как в жизни."""
+    return ["".join(rnd.choice(SYLLABLES) for _ in range(rnd.randint(2, 4))) for _ in range(size)]
+
+
+def make_places(count, seed=1):
+    rnd = random.Random(seed)
+    vocabulary = make_vocabulary(rnd)
+    places = []
+    for i in range(count):
+        name = f"{rnd.choice(ADJECTIVES).capitalize()} {rnd.choice(WORDS)} №{i}"
+        description = " ".join(rnd.choice(vocabulary) for _ in range(30))
+        places.append(
+            {
+                "id": 100000 + i,
+                "name": name,
+                "category": ("sight", "food", "museum")[i % 3],
+                "short_desc": " ".join(rnd.choice(vocabulary) for _ in range(5)),
+                "description": description,
+                "lat": 55.7,
+                "lon": 37.6,
+                "city_id": 1,
+            }
+        )
+    return places
+
+
+def python_search(dm, query):
+    """Прежний способ: все места города из базы и проверка подстроки."""
+    city = dm.get_active_city()
+    cur = dm.conn.cursor()
+    cur.execute("SELECT * FROM places WHERE city_id = ?", (city["id"],))
+    columns = [c[0] for c in cur.description]
+    query = query.lower()
+    return [
+        row
+        for row in (dict(zip(columns, r)) for r in cur.fetchall())
+        if query in (row.get("name") or "").lower() or query in (row.get("description") or "").lower()
+    ]
+
+
+def fts_search(dm, query):
+    dm.query_cache.clear()
+    return dm.search(query, limit=20)
+
+
+def fuzzy_search(dm, query):
+    dm.query_cache.clear()
+    return dm.fuzzy_search(query, limit=20)
+
+
+def median_ms(func, dm, repeats, queries=QUERIES):
+    timings = []
+    for _ in range(repeats):
+        for query in queries:
+            started = time.perf_counter()
+            func(dm, query)
+            timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'places':>8} {'python, ms':>11} {'fts5, ms':>9} {'fuzzy, ms':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            dm = DataManager(os.path.join(tmp, "search.db"))
+            dm.bulk_import(make_places(size))
+            python_ms = median_ms(python_search, dm, max(1, args.repeats // 2))
+            fts_ms = median_ms(fts_search, dm, args.repeats)
+            fuzzy_ms = median_ms(fuzzy_search, dm, args.repeats, FUZZY_QUERIES)
+            dm.close()
+        print(f"{size:>8} {python_ms:>11.1f} {fts_ms:>9.2f} {fuzzy_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
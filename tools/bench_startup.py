@@ -0,0 +1,79 @@
+"""Замер холодного старта DataManager на большой базе.
+
+Сравнивает запуск на базе без версии схемы (user_version = 0: выполняется
+вся цепочка миграций, как раньше при каждом старте) и повторный запуск на
+уже мигрированной базе (одна проверка PRAGMA user_version).
+
+Запуск из корня проекта:
+    python -m tools.bench_startup --places 100000
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from data.data_manager import DataManager
+
+
+def build_legacy_db(path, places_count):
+    """Создаёт базу в виде, в котором её оставляла версия без миграций."""
+    dm = DataManager(path)
+    dm.close()
+
+    conn = sqlite3.connect(path)
+    rows = (
+        (
+            100000 + i,
+            f"Место {i}",
+            "sight",
+            f"Описание места {i}",
+            f"Кратко {i}",
+            55.0 + (i % 1000) / 1000.0,
+            37.0 + (i // 1000) / 1000.0,
+            4.0,
+            "[]",
+            None,
+        )
+        for i in range(places_count)
+    )
+    # Старые записи без city_id и ru-колонок — их заполнит миграция
+    conn.executemany(
+        "INSERT INTO places (id, name, category, description, short_desc, lat, lon, rating, image_urls, city_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    conn.execute("UPDATE places SET name_ru = NULL, description_ru = NULL, short_desc_ru = NULL")
+    conn.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+
+
+def time_startup(path):
+    started = time.perf_counter()
+    dm = DataManager(path)
+    elapsed = time.perf_counter() - started
+    dm.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_legacy_db(path, args.places)
+
+        first = time_startup(path)
+        steady = min(time_startup(path) for _ in range(args.repeat))
+
+    print(f"places: {args.places}")
+    print(f"start with migrations (user_version = 0): {first * 1000:.1f} ms")
+    print(f"steady-state start (best of {args.repeat}):   {steady * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Пиковая память (RSS) при импорте города разного размера.
+
+Для каждого размера генерируется places_<id>.json (или .jsonl) и
+загружается в отдельном процессе двумя способами: json.load всего файла
+с последующим bulk_import и потоковым чтением (data/json_stream.py).
+
+Запуск из корня проекта:
+    python -m tools.bench_stream_import --sizes 10000 50000 200000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+
+from data.data_manager import DataManager
+from data.json_stream import iter_records
+from tools.bench_import import make_city
+
+
+def write_places(path, count):
+    places, _tours = make_city(count, 0)
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for place in places:
+                f.write(json.dumps(place, ensure_ascii=False) + "\n")
+        else:
+            json.dump(places, f, ensure_ascii=False, indent=2)
+
+
+def child(path, mode):
+    dm = DataManager(os.path.join(os.path.dirname(path), f"{mode}.db"))
+    if mode == "load":
+        with open(path, "r", encoding="utf-8") as f:
+            places = json.load(f)
+    else:
+        places = iter_records(path)
+    stats = dm.bulk_import(places, city_id=2)
+    dm.close()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"peak_mb": peak_kb / 1024, "places": stats["places"]}))
+
+
+def run_child(*args):
+    # Всё тяжёлое — в дочерних процессах: ru_maxrss наследуется через exec,
+    # и пик родителя исказил бы замер
+    return subprocess.check_output([sys.executable, "-m", "tools.bench_stream_import", *args])
+
+
+def measure(path, mode):
+    return json.loads(run_child("--child", path, mode))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    parser.add_argument("--jsonl", action="store_true")
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument("--write", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+    if args.write:
+        write_places(args.write[0], int(args.write[1]))
+        return
+
+    ext = ".jsonl" if args.jsonl else ".json"
+    print(f"{'places':>8} {'file MB':>8} {'json.load MB':>13} {'stream MB':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "places_2" + ext)
+            run_child("--write", path, str(size))
+            file_mb = os.path.getsize(path) / 1024 / 1024
+            # json.load не читает JSON Lines, для .jsonl замеряем только поток
+            loaded = f"{measure(path, 'load')['peak_mb']:.1f}" if not args.jsonl else "-"
+            streamed = measure(path, "stream")
+        print(f"{size:>8} {file_mb:>8.1f} {loaded:>13} {streamed['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
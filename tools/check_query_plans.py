@@ -0,0 +1,189 @@
+"""Проверка планов запросов DataManager.
+
+Заполняет временную базу, вызывает публичные методы DataManager, собирает
+все выполненные SELECT/UPDATE/DELETE через trace-callback и прогоняет их
+через EXPLAIN QUERY PLAN. Если какой-то запрос делает полный SCAN одной
+из больших таблиц, скрипт печатает его план и завершается с кодом 1.
+
+Запуск из корня проекта:
+    python -m tools.check_query_plans
+"""
+import os
+import sys
+import tempfile
+
+from data.data_manager import DataManager
+from data.fuzzy import rebuild_fuzzy_index
+from data.spatial import rebuild_spatial_index
+
+
+LARGE_TABLES = {
+    "places",
+    "tours",
+    "tour_points",
+    "favorites",
+    "reviews",
+    "user_tours",
+    "support_messages",
+    "fuzzy_names",
+    "fuzzy_trigrams",
+}
+
+# Запросы, которым полный проход по таблице нужен по смыслу
+ALLOWED_SCANS = {
+    "SELECT * FROM places",
+    "SELECT * FROM tours",
+    "DELETE FROM places",
+    # BulkImporter: размер таблиц, чтобы решить, снимать ли индексы на время загрузки
+    "SELECT COUNT(*) FROM places",
+    "SELECT COUNT(*) FROM tours",
+    "SELECT COUNT(*) FROM tour_points",
+}
+
+
+def fill_database(dm, places_count=2000, tours_count=200):
+    cur = dm.conn.cursor()
+    cur.executemany(
+        "INSERT INTO places (id, name, name_ru, category, lat, lon, rating, image_urls, city_id) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            (10000 + i, f"Место {i}", f"Место {i}", "sight", 55.7, 37.6, 4.5, "[]", 1 + i % 6)
+            for i in range(places_count)
+        ),
+    )
+    cur.executemany(
+        "INSERT INTO tours (id, title, city_id) VALUES (?, ?, ?)",
+        ((1000 + i, f"Тур {i}", 1 + i % 6) for i in range(tours_count)),
+    )
+    cur.executemany(
+        "INSERT INTO tour_points (tour_id, place_id, order_index) VALUES (?, ?, ?)",
+        (
+            (1000 + i % tours_count, 10000 + i, i // tours_count)
+            for i in range(places_count)
+        ),
+    )
+    # Строки вставлены в обход DataManager, нечёткий и пространственный индексы строим сами
+    rebuild_fuzzy_index(dm.conn)
+    rebuild_spatial_index(dm.conn)
+    dm.conn.commit()
+
+
+def exercise(dm):
+    """Вызывает все методы DataManager, которые обращаются к базе."""
+    dm.get_active_city()
+    dm.set_active_city(2)
+    dm.get_all_places()
+    dm.get_place_cards()
+    dm.get_place_cards(category="sight", query="место", lang="en")
+    dm.get_place_cards(query="mesto 12")
+    page, next_key = dm.get_places_page(limit=5)
+    dm.get_places_page(after_key=next_key, limit=5)
+    page, next_key = dm.get_places_page(category="sight", sort="name", lang="en", limit=5)
+    dm.get_places_page(category="sight", sort="name", lang="en", after_key=next_key, limit=5)
+    dm.get_places_page(query="место", sort="name", limit=5)
+    dm.get_category_counts()
+    dm.get_category_counts(query="место", lang="en")
+    dm.get_category_counts(query="mesto 12")
+    dm.get_places_in_bbox(55.6, 37.5, 55.8, 37.7)
+    dm.get_places_in_bbox(55.6, 37.5, 55.8, 37.7, category="sight", limit=None, lang="en")
+    dm.count_places_in_bbox(55.6, 37.5, 55.8, 37.7, category="food")
+    dm.get_place_points()
+    dm.get_place_points(category="sight")
+    dm.nearest_places(55.75, 37.62)
+    dm.nearest_places(55.75, 37.62, k=5, category="food", max_distance_m=1000, lang="en")
+    dm.search("место")
+    dm.search("tur 17")
+    dm.fuzzy_search("mesto 123", lang="en")
+    dm.get_all_tours()
+    dm.get_all_tours_with_progress()
+    dm.get_tour_cards()
+    dm.get_tour(1001)
+    dm.get_points_for_tour(1001)
+    dm.set_tour_points(1002, [{"place_id": 10002, "order_index": 1}])
+    dm.get_place(10001)
+    dm.get_place(10001, lang="en")
+    dm.update_place_basic(10001, "Имя", "Кратко", "Описание", "Адрес")
+    dm.update_place_images(10001, [])
+    dm.update_place_coords(10001, 55.75, 37.61)
+    dm.add_favorite(10001)
+    dm.is_favorite(10001)
+    dm.get_favorite_places()
+    dm.remove_favorite(10001)
+    dm.add_review(10001, 5, "Отлично")
+    dm.get_reviews_for_place(10001)
+    dm.upsert_user_tour_progress(1001, 1, 0)
+    dm.get_user_tour_progress(1001)
+    dm.update_tour_basic(1001, title="Тур")
+    dm.add_support_message(1, False, "Вопрос")
+    dm.get_support_messages_for_user(1)
+    dm.get_support_users_with_last_message()
+    dm.get_all_users()
+    dm.get_user_by_username("admin")
+    dm.delete_place(10003)
+    dm.delete_tour(1003)
+    dm.download_city_data(2)
+    city_id = dm.add_city("Тестовый город")
+    dm.delete_city(city_id)
+
+
+def collect_statements(dm):
+    statements = []
+
+    def trace(sql):
+        head = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else ""
+        if head in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            statements.append(sql)
+
+    # Фоновые потоки (автодополнение) читают через свои соединения из ReaderPool
+    connect = dm._readers._connect
+
+    def traced_connect():
+        conn = connect()
+        conn.set_trace_callback(trace)
+        return conn
+
+    dm._readers._connect = traced_connect
+    dm.conn.set_trace_callback(trace)
+    try:
+        exercise(dm)
+        dm.build_autocomplete_index().join()
+    finally:
+        dm.conn.set_trace_callback(None)
+        dm._readers._connect = connect
+    return statements
+
+
+def find_full_scans(conn, sql):
+    scans = []
+    for _id, _parent, _notused, detail in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        words = detail.split()
+        if len(words) >= 2 and words[0] == "SCAN" and words[1] in LARGE_TABLES:
+            scans.append(detail)
+    return scans
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        dm = DataManager(os.path.join(tmp, "plans.db"))
+        fill_database(dm)
+        statements = collect_statements(dm)
+
+        failures = []
+        for sql in dict.fromkeys(statements):
+            if " ".join(sql.split()) in ALLOWED_SCANS:
+                continue
+            scans = find_full_scans(dm.conn, sql)
+            if scans:
+                failures.append((sql, scans))
+        dm.close()
+
+    print(f"checked {len(set(statements))} statements")
+    for sql, scans in failures:
+        print("\nFULL SCAN:", " ".join(sql.split()))
+        for detail in scans:
+            print("   ", detail)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Сборка офлайн-пакета тайлов карты города (data/tile_packs.py).
+
+Скачивает тайлы прямоугольника вокруг центра города (или заданного
+--bbox) на масштабах --zooms в data/tiles_<city_id>.mbtiles; экран карты
+берёт тайлы из этого файла, когда он есть. Повторный запуск докачивает
+только недостающие тайлы. --dry-run только считает тайлы.
+
+Сервер тайлов задаётся --url; при использовании tile.openstreetmap.org
+соблюдайте его правила (не больше двух потоков, свой User-Agent).
+
+Запуск из корня проекта:
+    python -m tools.prefetch_tiles --city 1 --zooms 10 16
+"""
+import argparse
+import os
+import sqlite3
+import time
+import urllib.error
+import urllib.request
+
+from data.data_manager import DB_NAME
+from data.tile_packs import (
+    TILE_PACK_RADIUS_KM,
+    TILE_PACK_ZOOMS,
+    build_tile_pack,
+    city_bbox,
+    count_tiles,
+    tile_pack_path,
+)
+
+
+DEFAULT_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
+USER_AGENT = "CityGuide tile prefetch (offline city packages)"
+
+
+def city_center(db_path, city_id):
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT name, center_lat, center_lon FROM cities WHERE id = ?", (city_id,)).fetchone()
+    finally:
+        conn.close()
+    if row is None or row[1] is None or row[2] is None:
+        raise SystemExit(f"город {city_id} не найден или у него нет координат центра")
+    return row
+
+
+def make_fetch(url, timeout=10, retries=3):
+    def fetch(zoom, x, y):
+        request = urllib.request.Request(url.format(z=zoom, x=x, y=y), headers={"User-Agent": USER_AGENT})
+        for attempt in range(retries):
+            try:
+                with urllib.request.urlopen(request, timeout=timeout) as response:
+                    return response.read()
+            except urllib.error.HTTPError as exc:
+                if exc.code == 404:
+                    return None
+            except OSError:
+                pass
+            time.sleep(1 + attempt)
+        return None
+
+    return fetch
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--city", type=int, required=True)
+    parser.add_argument("--db", default=os.path.join("data", DB_NAME))
+    parser.add_argument("--bbox", type=float, nargs=4, metavar=("MIN_LAT", "MIN_LON", "MAX_LAT", "MAX_LON"))
+    parser.add_argument("--radius-km", type=float, default=TILE_PACK_RADIUS_KM)
+    parser.add_argument("--zooms", type=int, nargs=2, default=list(TILE_PACK_ZOOMS), metavar=("MIN", "MAX"))
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--out", help="путь пакета (по умолчанию data/tiles_<city>.mbtiles)")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    name, lat, lon = city_center(args.db, args.city)
+    bbox = tuple(args.bbox) if args.bbox else city_bbox(lat, lon, args.radius_km)
+    total = count_tiles(*bbox, *args.zooms)
+    print(f"{name}: bbox {', '.join(f'{value:.5f}' for value in bbox)}, масштабы {args.zooms[0]}-{args.zooms[1]}, тайлов {total}")
+    if args.dry_run:
+        return
+
+    path = args.out or tile_pack_path(args.city)
+    started = time.perf_counter()
+
+    def progress(done, count):
+        print(f"\r{done}/{count}", end="", flush=True)
+
+    fetched, existed, missing = build_tile_pack(
+        path,
+        bbox,
+        args.zooms,
+        make_fetch(args.url),
+        metadata={"name": name, "attribution": "© OpenStreetMap contributors"},
+        workers=args.workers,
+        progress=progress,
+    )
+    print()
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    print(
+        f"{path}: скачано {fetched}, уже было {existed}, не найдено {missing}, "
+        f"{size_mb:.1f} МБ за {time.perf_counter() - started:.0f} с"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Сглаживание и частота опроса положения на треке (data/location.py).
+
+Проигрывает трек через FixSmoother так же, как LocationService, с
+прореживанием по sampling_interval, и печатает число измерений, отброшенные
+выбросы и интервалы опроса. Без файла строится синтетическая прогулка
+(остановка, ходьба, поездка) с шумом GPS и выбросами; для неё известно
+истинное положение, и печатается средняя ошибка до и после сглаживания.
+--write сохраняет синтетический трек в CSV — его можно указать в
+настройке location.replay и проверить приложение без устройства.
+
+Запуск из корня проекта:
+    python -m tools.replay_track
+    python -m tools.replay_track --track walk.gpx
+"""
+import argparse
+import csv
+import math
+import random
+import statistics
+
+from data.location import Fix, FixSmoother, read_track, sampling_interval
+from data.spatial import EARTH_RADIUS_M, haversine_m
+from tools.bench_bbox import CENTER
+
+
+# Участки синтетического трека: (секунд, скорость м/с)
+SYNTHETIC_LEGS = ((60, 0.0), (300, 1.4), (120, 8.0), (60, 0.0))
+
+
+def synthetic_track(noise_m=8.0, outliers=0.01, seed=1):
+    """(измерения, истинные положения) раз в секунду."""
+    rnd = random.Random(seed)
+    lat, lon = CENTER
+    heading = 0.6
+    fixes, truth = [], []
+    moment = 0.0
+    for seconds, speed in SYNTHETIC_LEGS:
+        for _ in range(seconds):
+            heading += rnd.gauss(0, 0.05)
+            step = speed / EARTH_RADIUS_M
+            lat += math.degrees(step * math.cos(heading))
+            lon += math.degrees(step * math.sin(heading) / math.cos(math.radians(lat)))
+            moment += 1.0
+            error = noise_m * (20 if rnd.random() < outliers else 1)
+            north, east = rnd.gauss(0, error), rnd.gauss(0, error)
+            fixes.append(
+                Fix(
+                    lat + math.degrees(north / EARTH_RADIUS_M),
+                    lon + math.degrees(east / (EARTH_RADIUS_M * math.cos(math.radians(lat)))),
+                    noise_m,
+                    None,
+                    moment,
+                )
+            )
+            truth.append((lat, lon))
+    return fixes, truth
+
+
+def replay(fixes):
+    """([(индекс, сглаженный Fix)] для подписчиков, интервалы опроса, число выбросов)."""
+    smoother = FixSmoother()
+    delivered = []
+    intervals = []
+    rejected = 0
+    interval = sampling_interval(None)
+    last_time = None
+    for index, fix in enumerate(fixes):
+        if last_time is not None and fix.time - last_time < interval:
+            continue
+        last_time = fix.time
+        smoothed = smoother.update(fix)
+        if smoothed is None:
+            rejected += 1
+            continue
+        interval = sampling_interval(smoothed.speed)
+        intervals.append(interval)
+        delivered.append((index, smoothed))
+    return delivered, intervals, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--track", help="трек GPX или CSV; без него — синтетический")
+    parser.add_argument("--write", help="сохранить синтетический трек в этот CSV")
+    args = parser.parse_args()
+
+    truth = None
+    if args.track:
+        fixes = read_track(args.track)
+    else:
+        fixes, truth = synthetic_track()
+        if args.write:
+            with open(args.write, "w", newline="", encoding="utf-8") as fp:
+                writer = csv.writer(fp)
+                writer.writerow(("time", "lat", "lon", "accuracy"))
+                writer.writerows((f"{fix.time:.0f}", f"{fix.lat:.7f}", f"{fix.lon:.7f}", fix.accuracy) for fix in fixes)
+            print(f"записан {args.write}")
+
+    delivered, intervals, rejected = replay(fixes)
+    print(f"измерений в треке {len(fixes)}, передано подписчикам {len(delivered)}, отброшено выбросов {rejected}")
+    print("интервалы опроса, с: " + ", ".join(
+        f"{interval:g} x{intervals.count(interval)}" for interval in sorted(set(intervals))
+    ))
+    if truth is not None:
+        raw = [haversine_m(*truth[index], fixes[index].lat, fixes[index].lon) for index, _fix in delivered]
+        smooth = [haversine_m(*truth[index], fix.lat, fix.lon) for index, fix in delivered]
+        print(f"ошибка положения, м: без сглаживания {statistics.mean(raw):.1f} "
+              f"(p95 {sorted(raw)[int(len(raw) * 0.95)]:.1f}), "
+              f"со сглаживанием {statistics.mean(smooth):.1f} (p95 {sorted(smooth)[int(len(smooth) * 0.95)]:.1f})")
+
+
+if __name__ == "__main__":
+    main()
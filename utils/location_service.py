@@ -0,0 +1,295 @@
+"""Служба положения пользователя: один источник на всё приложение и подписчики.
+
+Экраны не опрашивают GPS сами, а подписываются на LocationService
+(subscribe) с порогами: не чаще min_interval_s и только после сдвига на
+min_distance_m. Источник работает, пока есть хотя бы один подписчик.
+Измерения сглаживаются (data/location.py, FixSmoother), а интервал
+опроса источника подстраивается под скорость: стоящему пользователю —
+раз в несколько секунд, идущему и едущему — чаще.
+
+Источники: PlyerProvider — GPS устройства через plyer; ReplayProvider —
+записанный трек GPX или CSV с ускорением, чтобы проверять карту,
+экскурсии и геозоны на компьютере. Какой выбрать, решает приложение при
+запуске (настройка location в settings.json).
+"""
+import time
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.utils import platform
+
+from data.location import Fix, FixSmoother, read_track, sampling_interval
+from data.spatial import haversine_m
+
+
+def _float_or_none(value):
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class PlyerProvider:
+    """Положение от GPS устройства через plyer (Android и iOS)."""
+
+    def __init__(self):
+        self._on_fix = None
+        self._interval = None
+
+    @staticmethod
+    def is_supported():
+        if platform not in ("android", "ios"):
+            return False
+        try:
+            from plyer import gps  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def start(self, on_fix, interval):
+        from plyer import gps
+
+        self._on_fix = on_fix
+        gps.configure(on_location=self._on_location, on_status=self._on_status)
+        if platform == "android":
+            # Разрешение запрашивается асинхронно; GPS включаем после ответа
+            from android.permissions import Permission, request_permissions
+
+            def on_permissions(permissions, grants):
+                if any(grants) and self._on_fix is not None:
+                    self._start_gps(interval)
+
+            request_permissions(
+                [Permission.ACCESS_FINE_LOCATION, Permission.ACCESS_COARSE_LOCATION],
+                on_permissions,
+            )
+        else:
+            self._start_gps(interval)
+
+    def _start_gps(self, interval):
+        from plyer import gps
+
+        gps.start(minTime=int(interval * 1000), minDistance=1)
+        self._interval = interval
+
+    def set_interval(self, interval):
+        if self._on_fix is None or self._interval is None or interval == self._interval:
+            return
+        from plyer import gps
+
+        gps.stop()
+        self._start_gps(interval)
+
+    def stop(self):
+        if self._on_fix is None:
+            return
+        self._on_fix = None
+        if self._interval is not None:
+            from plyer import gps
+
+            gps.stop()
+        self._interval = None
+
+    def _on_location(self, **kwargs):
+        # Вызывается из потока платформы
+        on_fix = self._on_fix
+        if on_fix is None:
+            return
+        on_fix(
+            Fix(
+                float(kwargs["lat"]),
+                float(kwargs["lon"]),
+                _float_or_none(kwargs.get("accuracy")),
+                _float_or_none(kwargs.get("speed")),
+                time.time(),
+            )
+        )
+
+    def _on_status(self, status_type, status):
+        Logger.info(f"Location: gps {status_type}: {status}")
+
+
+class ReplayProvider:
+    """Проигрывает трек GPX или CSV (data/location.py, read_track) в speed раз быстрее записи.
+
+    Измерения идут с теми же промежутками времени трека, что и при
+    записи, делёнными на speed; время в Fix — время трека, сдвинутое к
+    моменту запуска, так что скорость движения остаётся настоящей. Как и
+    GPS устройства, источник не отдаёт измерения чаще заданного
+    интервала (время трека). loop — по окончании начинать трек заново.
+    """
+
+    def __init__(self, path, speed=1.0, loop=True):
+        self.fixes = read_track(path)
+        if not self.fixes:
+            raise ValueError(f"track has no points: {path}")
+        self.path = path
+        self.speed = max(float(speed), 0.01)
+        self.loop = loop
+        self._on_fix = None
+        self._interval = 0.0
+        self._event = None
+        self._index = 0
+        self._offset = 0.0
+
+    def start(self, on_fix, interval):
+        self._on_fix = on_fix
+        self._interval = interval
+        self._index = 0
+        self._offset = time.time() - self.fixes[0].time
+        self._event = Clock.schedule_once(self._emit, 0)
+
+    def set_interval(self, interval):
+        self._interval = interval
+
+    def stop(self):
+        self._on_fix = None
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _emit(self, dt):
+        if self._on_fix is None:
+            return
+        fix = self.fixes[self._index]
+        self._on_fix(fix._replace(time=fix.time + self._offset))
+        # Следующее измерение — не раньше чем через интервал опроса
+        index = self._index + 1
+        while index < len(self.fixes) and self.fixes[index].time - fix.time < self._interval:
+            index += 1
+        if index >= len(self.fixes):
+            if not self.loop:
+                self._event = None
+                return
+            # Новый круг продолжает время трека с того же шага
+            last = self.fixes[-1].time
+            self._offset += last - self.fixes[0].time + 1.0
+            index = 0
+            delay = 1.0 / self.speed
+        else:
+            delay = (self.fixes[index].time - fix.time) / self.speed
+        self._index = index
+        self._event = Clock.schedule_once(self._emit, delay)
+
+
+class LocationService:
+    """Общий источник положения и рассылка сглаженных Fix подписчикам (в UI-потоке)."""
+
+    _instance = None
+
+    def __init__(self):
+        self.provider = None
+        self.last_fix = None
+        self._smoother = FixSmoother()
+        # callback -> [min_distance_m, min_interval_s, последний отправленный Fix]
+        self._subscribers = {}
+        self._running = False
+        self._interval = None
+
+    @classmethod
+    def get_instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    @property
+    def available(self):
+        return self.provider is not None
+
+    def set_provider(self, provider):
+        """Меняет источник (None — положение неизвестно); подписки сохраняются."""
+        self._stop()
+        self.provider = provider
+        self.last_fix = None
+        self._smoother.reset()
+        if self._subscribers:
+            self._start()
+
+    def subscribe(self, callback, min_distance_m=0.0, min_interval_s=0.0):
+        """callback(fix) после сдвига не меньше min_distance_m и не чаще min_interval_s.
+
+        Если положение уже известно, callback получает его в следующем кадре.
+        Повторная подписка того же callback меняет пороги.
+        """
+        self._subscribers[callback] = [min_distance_m, min_interval_s, None]
+        if self.last_fix is not None:
+            Clock.schedule_once(lambda dt: self._deliver(self.last_fix, [callback]))
+        if not self._running:
+            self._start()
+
+    def unsubscribe(self, callback):
+        self._subscribers.pop(callback, None)
+        if not self._subscribers:
+            self._stop()
+
+    def _start(self):
+        if self.provider is None:
+            return
+        speed = self.last_fix.speed if self.last_fix is not None else None
+        self._interval = sampling_interval(speed)
+        try:
+            self.provider.start(self._on_provider_fix, self._interval)
+        except Exception as exc:
+            Logger.warning(f"Location: unable to start provider: {exc}")
+            return
+        self._running = True
+
+    def _stop(self):
+        if self._running and self.provider is not None:
+            self.provider.stop()
+        self._running = False
+
+    def _on_provider_fix(self, fix):
+        # Источник может вызывать из своего потока — обработка в UI-потоке
+        Clock.schedule_once(lambda dt: self._handle_fix(fix))
+
+    def _handle_fix(self, fix):
+        if not self._running:
+            return
+        smoothed = self._smoother.update(fix)
+        if smoothed is None:
+            return
+        self.last_fix = smoothed
+        interval = sampling_interval(smoothed.speed)
+        if interval != self._interval:
+            self._interval = interval
+            self.provider.set_interval(interval)
+        self._deliver(smoothed, list(self._subscribers))
+
+    def _deliver(self, fix, callbacks):
+        for callback in callbacks:
+            state = self._subscribers.get(callback)
+            if state is None:
+                continue
+            min_distance_m, min_interval_s, sent = state
+            if sent is not None and (
+                fix.time - sent.time < min_interval_s
+                or haversine_m(sent.lat, sent.lon, fix.lat, fix.lon) < min_distance_m
+            ):
+                continue
+            state[2] = fix
+            try:
+                callback(fix)
+            except Exception:
+                Logger.exception("Location: subscriber failed")
+
+
+def create_provider(settings):
+    """Источник по настройкам location: replay — путь к треку (replay_speed, replay_loop).
+
+    Без трека — GPS устройства, если plyer его поддерживает, иначе None.
+    """
+    replay = settings.get("replay")
+    if replay:
+        try:
+            return ReplayProvider(
+                replay,
+                speed=settings.get("replay_speed", 1.0),
+                loop=settings.get("replay_loop", True),
+            )
+        except (OSError, ValueError) as exc:
+            Logger.warning(f"Location: unable to load track {replay}: {exc}")
+            return None
+    if PlyerProvider.is_supported():
+        return PlyerProvider()
+    return None
@@ -0,0 +1,203 @@
+"""Маркеры мест только для видимой части карты: запрос по области, пул виджетов, не чаще раза за кадр."""
+import threading
+
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.properties import NumericProperty
+from kivy_garden.mapview import MapMarker
+
+
+class ClusterMarker(MapMarker):
+    """Кружок с числом мест кластера; вид задан правилом <ClusterMarker> в main.kv."""
+
+    count = NumericProperty(0)
+
+
+class UserLocationMarker(MapMarker):
+    """Точка «Я здесь» с кругом точности; вид задан правилом <UserLocationMarker> в main.kv."""
+
+    # Точность положения в метрах и тот же радиус в пикселях карты
+    accuracy_m = NumericProperty(0)
+    accuracy_px = NumericProperty(0)
+
+
+class MarkerLayer:
+    """Показывает на MapView маркеры мест из видимой области (с запасом).
+
+    При сдвиге или масштабировании карты (on_map_relocated) проверка
+    области откладывается до следующего кадра, так что за кадр она
+    выполняется не больше одного раза. Пока видимая область не вышла за
+    уже загруженную (область экрана плюс margin её размера с каждой
+    стороны) и масштаб тот же, база не опрашивается. Иначе
+    fetch(bbox, zoom, limit, **filters) выполняется в фоновом потоке слоя
+    (одном на всё время жизни, так что его read-only соединение с базой
+    не открывается заново на каждый сдвиг карты); пока он работает, новые
+    запросы заменяют друг друга, и выполняется только последний. Результат
+    применяется в UI-потоке: маркеры ушедших из области мест возвращаются
+    в пул, новые места получают маркеры из пула, так что число виджетов
+    не превышает limit, сколько бы мест ни было в городе.
+
+    bbox — (min_lat, min_lon, max_lat, max_lon); fetch возвращает места с
+    id, lat и lon и не должен трогать виджеты. Запись с count больше 1 —
+    кластер: вместо маркера места показывается ClusterMarker с числом, по
+    нажатию на него вызывается on_cluster(lat, lon). Все методы
+    вызываются из UI-потока.
+    """
+
+    def __init__(self, map_view, fetch, limit=300, margin=0.5, on_cluster=None):
+        self.map_view = map_view
+        self.fetch = fetch
+        self.limit = limit
+        self.margin = margin
+        self.on_cluster = on_cluster
+        self.filters = {}
+        # Показанные маркеры по id места и свободные маркеры
+        self.markers = {}
+        self._pool = []
+        # Кластеры по (lat, lon, число) и свободные кружки
+        self.cluster_markers = {}
+        self._cluster_pool = []
+        # Загруженная область и масштаб
+        self._loaded = None
+        self._fixed = False
+        self._generation = 0
+        self._cond = threading.Condition()
+        self._pending = None
+        self._thread = None
+        self._trigger = Clock.create_trigger(self._check_viewport)
+        map_view.bind(on_map_relocated=self._on_map_relocated, size=self._on_map_relocated)
+
+    def refresh(self, **filters):
+        """Перезапросить места области (например, после смены фильтров или правки мест)."""
+        if filters:
+            self.filters = filters
+        self._fixed = False
+        self._generation += 1
+        self._loaded = None
+        self._trigger()
+
+    def show_places(self, places):
+        """Показать только эти места, не следя за областью карты (маршрут), до refresh()."""
+        self._fixed = True
+        self._generation += 1
+        self._apply(places)
+
+    def _on_map_relocated(self, *args):
+        if not self._fixed:
+            self._trigger()
+
+    def _check_viewport(self, dt):
+        map_view = self.map_view
+        if self._fixed or map_view.width <= 0 or map_view.height <= 0:
+            return
+        bbox = tuple(map_view.get_bbox())
+        zoom = map_view.zoom
+        if self._loaded is not None:
+            loaded_bbox, loaded_zoom = self._loaded
+            # Другой масштаб — другие кластеры и другая выборка лучших мест
+            if _contains(loaded_bbox, bbox) and zoom == loaded_zoom:
+                return
+        self._submit((self._generation, _expand(bbox, self.margin), zoom, dict(self.filters)))
+
+    def _submit(self, request):
+        with self._cond:
+            self._pending = request
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="markers", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                request = self._pending
+                self._pending = None
+            generation, bbox, zoom, filters = request
+            try:
+                places = self.fetch(bbox, zoom, self.limit, **filters)
+            except Exception:
+                # Остаются прежние маркеры; следующий сдвиг карты запросит область снова
+                Logger.exception("MarkerLayer: unable to load places for the map area")
+                continue
+            Clock.schedule_once(lambda dt, r=request, p=places: self._deliver(r, p))
+
+    def _deliver(self, request, places):
+        generation, bbox, zoom, _filters = request
+        # Пока шёл запрос, могли сменить фильтры или показать маршрут
+        if generation != self._generation or self._fixed:
+            return
+        self._loaded = (bbox, zoom)
+        self._apply(places)
+
+    def _apply(self, places):
+        map_view = self.map_view
+        places = [place for place in places if place.get("lat") is not None and place.get("lon") is not None]
+        self._apply_clusters([place for place in places if (place.get("count") or 1) > 1])
+        wanted = {place["id"]: place for place in places if (place.get("count") or 1) == 1}
+        for place_id in [place_id for place_id in self.markers if place_id not in wanted]:
+            marker = self.markers.pop(place_id)
+            map_view.remove_widget(marker)
+            if len(self._pool) < self.limit:
+                self._pool.append(marker)
+        for place_id, place in wanted.items():
+            marker = self.markers.get(place_id)
+            if marker is not None:
+                if (marker.lat, marker.lon) != (place["lat"], place["lon"]):
+                    # Место передвинули: переставляем маркер заново
+                    map_view.remove_widget(marker)
+                    marker.lat, marker.lon = place["lat"], place["lon"]
+                    map_view.add_widget(marker)
+                continue
+            if self._pool:
+                marker = self._pool.pop()
+                marker.lat, marker.lon = place["lat"], place["lon"]
+            else:
+                marker = MapMarker(lat=place["lat"], lon=place["lon"])
+            marker.place_id = place_id
+            map_view.add_widget(marker)
+            self.markers[place_id] = marker
+
+    def _apply_clusters(self, clusters):
+        """Кружки кластеров: совпавшие по центру и числу остаются на месте."""
+        map_view = self.map_view
+        wanted = {(cluster["lat"], cluster["lon"], cluster["count"]) for cluster in clusters}
+        for key in [key for key in self.cluster_markers if key not in wanted]:
+            marker = self.cluster_markers.pop(key)
+            map_view.remove_widget(marker)
+            if len(self._cluster_pool) < self.limit:
+                self._cluster_pool.append(marker)
+        for key in wanted:
+            if key in self.cluster_markers:
+                continue
+            lat, lon, count = key
+            if self._cluster_pool:
+                marker = self._cluster_pool.pop()
+                marker.lat, marker.lon, marker.count = lat, lon, count
+            else:
+                marker = ClusterMarker(lat=lat, lon=lon, count=count)
+                marker.bind(on_release=self._on_cluster_release)
+            map_view.add_widget(marker)
+            self.cluster_markers[key] = marker
+
+    def _on_cluster_release(self, marker):
+        if self.on_cluster is not None:
+            self.on_cluster(marker.lat, marker.lon)
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+def _expand(bbox, margin):
+    """bbox, расширенный на margin своего размера с каждой стороны, в пределах карты мира."""
+    min_lat, min_lon, max_lat, max_lon = bbox
+    lat_pad = (max_lat - min_lat) * margin
+    lon_pad = (max_lon - min_lon) * margin
+    return (
+        max(min_lat - lat_pad, -90.0),
+        max(min_lon - lon_pad, -180.0),
+        min(max_lat + lat_pad, 90.0),
+        min(max_lon + lon_pad, 180.0),
+    )
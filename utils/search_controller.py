@@ -0,0 +1,99 @@
+"""Фоновый поиск для полей ввода: debounce, поток-исполнитель, отмена устаревших запросов."""
+import threading
+
+from kivy.clock import Clock
+
+
+class SearchController:
+    """Выполняет поиск по мере набора текста, не блокируя кадры.
+
+    submit(request) откладывает запрос на delay секунд, каждый следующий
+    вызов переносит срок (debounce). Затем search_func(request) выполняется
+    в фоновом потоке, а результат передаётся в on_results(request, result)
+    через Clock.schedule_once — только если за это время не пришёл более
+    новый запрос и не было cancel(). Устаревший запрос, ещё не начавший
+    выполняться, заменяется новым; уже выполняющийся прерывается через
+    interrupt(thread) (например, DataManager.interrupt_reads), а без него
+    дорабатывает, но его результат отбрасывается.
+
+    submit и cancel вызываются из UI-потока.
+    """
+
+    def __init__(self, search_func, on_results, delay=0.25, on_error=None, interrupt=None):
+        self.search_func = search_func
+        self.on_results = on_results
+        self.on_error = on_error
+        self.interrupt = interrupt
+        self.delay = delay
+        self._generation = 0
+        # Поколение запроса, который сейчас выполняет поток, или None
+        self._running = None
+        self._pending = None
+        self._event = None
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, request):
+        generation = self._next_generation()
+        self._event = Clock.schedule_once(
+            lambda dt: self._enqueue(generation, request), self.delay
+        )
+
+    def cancel(self):
+        """Отменяет отложенный и выполняющийся запросы (например, при смене фильтра)."""
+        self._next_generation()
+
+    def _next_generation(self):
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+            if self._running is not None and self.interrupt is not None:
+                self.interrupt(self._thread)
+            return self._generation
+
+    def _is_current(self, generation):
+        with self._cond:
+            return generation == self._generation
+
+    def _enqueue(self, generation, request):
+        self._event = None
+        with self._cond:
+            if generation != self._generation:
+                return
+            self._pending = (generation, request)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="search", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None:
+                    self._cond.wait()
+                generation, request = self._pending
+                self._pending = None
+                self._running = generation
+            try:
+                result, error = self.search_func(request), None
+            except Exception as exc:
+                result, error = None, exc
+            with self._cond:
+                self._running = None
+            if self._is_current(generation):
+                Clock.schedule_once(
+                    lambda dt, g=generation, r=request, res=result, err=error: self._deliver(g, r, res, err)
+                )
+
+    def _deliver(self, generation, request, result, error):
+        # Пока результат ждал кадра, мог прийти новый запрос
+        if not self._is_current(generation):
+            return
+        if error is not None:
+            if self.on_error is not None:
+                self.on_error(error)
+            return
+        self.on_results(request, result)
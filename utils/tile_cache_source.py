@@ -0,0 +1,60 @@
+"""Сетевой источник тайлов MapView с ограниченным кэшем (data/tile_cache.py)."""
+from random import choice
+
+import requests
+from kivy_garden.mapview import MapSource
+from kivy_garden.mapview.downloader import USER_AGENT, Downloader
+
+from data.tile_cache import TileCache
+from data.tile_packs import city_bbox
+
+
+class CachedMapSource(MapSource):
+    """MapSource, который скачивает тайлы в кэш TileCache.
+
+    Как и у MapSource, тайлы загружаются в потоках Downloader и лежат
+    файлами в cache_dir, но каждое обращение учитывается в индексе кэша:
+    попадания продлевают жизнь тайла, новые тайлы могут вытеснить давно
+    не использованные, если кэш превысил квоту.
+    """
+
+    def __init__(self, cache=None, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache or TileCache.get_instance(self.cache_dir)
+
+    def fill_tile(self, tile):
+        if tile.state == "done":
+            return
+        Downloader.instance(self.cache_dir).submit(self._load_cached_tile, tile)
+
+    def _load_cached_tile(self, tile):
+        # Поток Downloader
+        if tile.state == "done":
+            return None
+        cache_fn = tile.cache_fn
+        if self.cache.lookup(cache_fn):
+            return tile.set_source, (cache_fn,)
+        # В url строка тайла считается сверху вниз, а tile_y у MapView — по TMS
+        uri = self.url.format(
+            z=tile.zoom,
+            x=tile.tile_x,
+            y=self.get_row_count(tile.zoom) - tile.tile_y - 1,
+            s=choice(self.subdomains),
+        )
+        try:
+            response = requests.get(uri, headers={"User-agent": USER_AGENT}, timeout=5)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None
+        data = response.content
+        with open(cache_fn, "wb") as fd:
+            fd.write(data)
+        self.cache.add(cache_fn, len(data), tile.zoom, tile.tile_x, tile.tile_y)
+        return tile.set_source, (cache_fn,)
+
+
+def pin_downloaded_cities(data_manager):
+    """Закрепляет в кэше тайлы скачанных городов (область — как у пакета тайлов города)."""
+    TileCache.get_instance().set_pins(
+        {city_id: city_bbox(lat, lon) for city_id, lat, lon in data_manager.get_downloaded_cities()}
+    )
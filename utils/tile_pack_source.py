@@ -0,0 +1,67 @@
+"""Источник тайлов MapView из офлайн-пакета города (data/tile_packs.py)."""
+import io
+import os
+
+from kivy.core.image import Image as CoreImage
+from kivy_garden.mapview.downloader import Downloader
+
+from data.tile_packs import TilePack
+from utils.tile_cache_source import CachedMapSource
+
+
+class TilePackMapSource(CachedMapSource):
+    """MapSource, который берёт тайлы из пакета MBTiles вместо сети.
+
+    Чтение тайла из пакета и декодирование картинки выполняются в потоках
+    Downloader, а в UI-потоке (тем же Downloader, не дольше отведённого
+    на кадр времени) только создаётся текстура. Тайлы вне прямоугольника
+    или масштабов пакета по online_fallback загружаются как у
+    CachedMapSource — по url, через ограниченный кэш; без сети они
+    остаются пустыми.
+    """
+
+    def __init__(self, path, online_fallback=True, **kwargs):
+        self.pack = TilePack(path)
+        kwargs.setdefault("attribution", self.pack.metadata.get("attribution", "© OpenStreetMap contributors"))
+        super().__init__(image_ext=self.pack.format, **kwargs)
+        self.path = path
+        self.online_fallback = online_fallback
+        if not online_fallback:
+            self.min_zoom = self.pack.min_zoom
+            self.max_zoom = self.pack.max_zoom
+        if self.pack.bounds:
+            min_lon, min_lat, max_lon, max_lat = self.pack.bounds
+            self.bounds = (min_lon, min_lat, max_lon, max_lat)
+            self.default_lat = (min_lat + max_lat) / 2
+            self.default_lon = (min_lon + max_lon) / 2
+            self.default_zoom = self.pack.min_zoom
+
+    def fill_tile(self, tile):
+        if tile.state == "done":
+            return
+        Downloader.instance(self.cache_dir).submit(self._load_tile, tile)
+
+    def _load_tile(self, tile):
+        # Поток Downloader: tile_y у MapView — строка по TMS, как в MBTiles
+        data = None
+        if self.pack.min_zoom <= tile.zoom <= self.pack.max_zoom:
+            data = self.pack.get_tile(tile.zoom, tile.tile_x, tile.tile_y)
+        if data is None:
+            if self.online_fallback:
+                return self._load_online, (tile,)
+            tile.state = "done"
+            return None
+        image = CoreImage(
+            io.BytesIO(data),
+            ext=self.image_ext,
+            filename=f"{os.path.basename(self.path)}.{tile.zoom}.{tile.tile_x}.{tile.tile_y}.{self.image_ext}",
+            nocache=True,
+        )
+        return self._load_tile_done, (tile, image)
+
+    def _load_tile_done(self, tile, image):
+        tile.texture = image.texture
+        tile.state = "need-animation"
+
+    def _load_online(self, tile):
+        CachedMapSource.fill_tile(self, tile)